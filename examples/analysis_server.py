@@ -0,0 +1,47 @@
+from birdnetlib.analyzer import Analyzer
+from birdnetlib.server import AnalysisServer
+from datetime import datetime
+
+"""
+Example of an analysis server for many recorders. Unlike simple_tcp_server.py, the model
+instances are shared by all clients, and the windows of concurrent streams are analyzed
+together in batches. To test the example:
+
+Start the server in one terminal:
+
+python analysis_server.py
+
+In a second terminal, send a Wav file (or several) to the server using netcat; a JSON line is
+returned per detection as soon as each 3-second window has been analyzed:
+
+cat 2022-08-15-21-05-51.wav | nc -q 0 127.0.0.1 9988
+
+Or stream from a sound card and microphone using arecord:
+
+arecord -r 48000 -f FLOAT_LE | nc 127.0.0.1 9988
+
+Or POST a file, with the location and date of the recording, and receive all the detections:
+
+curl --data-binary @2022-08-15-21-05-51.wav "http://127.0.0.1:9988/analyze?lat=35.4244&lon=-120.7463&date=2022-08-15"
+
+Server metrics (batch sizes, latencies, clients) are available at http://127.0.0.1:9988/metrics
+
+To simulate many recorders, see server_load.py.
+"""
+
+if __name__ == "__main__":
+    server = AnalysisServer(
+        # Each analyzer runs one batch at a time; use one or two per available CPU core.
+        analyzers=[Analyzer(num_threads=2) for _ in range(2)],
+        host="127.0.0.1",
+        port=9988,
+        lat=35.4244,
+        lon=-120.7463,
+        date=datetime(year=2022, month=5, day=10),  # use date or week_48
+        min_conf=0.25,
+        max_batch_size=32,
+        max_clients=64,
+        client_quota=2.0,  # seconds of audio per second (twice realtime)
+    )
+    print("Birdnetlib forever!")
+    server.run()
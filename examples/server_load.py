@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import json
+import struct
+import time
+
+import librosa
+import numpy as np
+
+"""
+Load test for analysis_server.py. Simulates N recorders that each stream a recording to the
+server in realtime (like arecord piped to netcat), and reports the detection latencies and the
+server metrics. To test the example:
+
+Start the server in one terminal:
+
+python analysis_server.py
+
+In a second terminal, simulate 50 recorders streaming for 60 seconds:
+
+python server_load.py ../tests/test_files/soundscape.wav --recorders 50 --duration 60
+
+The latency of a detection runs from the end of its window being sent to the detection being
+received. Use --speed to send audio faster than realtime (e.g. to find the maximum throughput).
+"""
+
+
+def return_streaming_wav_header(rate):
+    # Mono float32 WAV header with a streaming data size, as written by arecord.
+    return (
+        b"RIFF"
+        + struct.pack("<I", 0xFFFFFFFF)
+        + b"WAVEfmt "
+        + struct.pack("<IHHIIHH", 16, 3, 1, rate, rate * 4, 4, 32)
+        + b"data"
+        + struct.pack("<I", 0xFFFFFFFF)
+    )
+
+
+async def run_recorder(host, port, samples, rate, duration, speed, block_secs):
+    reader, writer = await asyncio.open_connection(host, port)
+    start = time.monotonic()
+    latencies = []
+    errors = []
+
+    async def send():
+        writer.write(return_streaming_wav_header(rate))
+        block_size = int(block_secs * rate)
+        sent = 0
+        while sent < duration * rate:
+            position = sent % len(samples)
+            block = samples[position : position + block_size]
+            # Wait until the block would have been recorded.
+            delay = start + (sent + len(block)) / rate / speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            writer.write(block.astype("<f4").tobytes())
+            await writer.drain()
+            sent += len(block)
+        writer.write_eof()
+
+    async def receive():
+        async for line in reader:
+            detection = json.loads(line)
+            if "error" in detection:
+                errors.append(detection["error"])
+                continue
+            sent_time = start + detection["end_time"] / speed
+            latencies.append(time.monotonic() - max(sent_time, start))
+
+    try:
+        await asyncio.gather(send(), receive())
+    except ConnectionError as error:
+        errors.append(str(error))
+    finally:
+        writer.close()
+    return latencies, errors
+
+
+async def return_server_metrics(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+
+async def main(args):
+    samples, rate = librosa.load(args.path, sr=48000, mono=True)
+    print(f"Starting {args.recorders} recorders for {args.duration} seconds")
+    start = time.monotonic()
+    results = await asyncio.gather(
+        *(
+            run_recorder(
+                args.host,
+                args.port,
+                # Start each recorder at a different point of the recording.
+                np.roll(samples, i * rate),
+                rate,
+                args.duration,
+                args.speed,
+                args.block_secs,
+            )
+            for i in range(args.recorders)
+        )
+    )
+    elapsed = time.monotonic() - start
+
+    latencies = np.array([latency for result in results for latency in result[0]])
+    errors = [error for result in results for error in result[1]]
+    print(f"Elapsed: {elapsed:.1f} s")
+    print(
+        f"Audio analyzed: {args.recorders * args.duration / elapsed:.1f} seconds per second"
+    )
+    print(f"Detections: {len(latencies)}")
+    if len(latencies):
+        print(
+            f"Latency: mean {latencies.mean():.3f} s, "
+            f"p95 {np.percentile(latencies, 95):.3f} s, max {latencies.max():.3f} s"
+        )
+    print(f"Errors: {len(errors)} {sorted(set(errors))}")
+    print("Server metrics:", await return_server_metrics(args.host, args.port))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test for analysis_server.py")
+    parser.add_argument("path", help="Recording streamed (in a loop) by each recorder")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9988)
+    parser.add_argument("--recorders", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=60, help="Seconds of audio")
+    parser.add_argument("--speed", type=float, default=1.0, help="1.0 is realtime")
+    parser.add_argument("--block-secs", type=float, default=0.5)
+    asyncio.run(main(parser.parse_args()))
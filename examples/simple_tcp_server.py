@@ -22,6 +22,8 @@ arecord -r 48000 -f FLOAT_LE --max-file-time 10 | nc 127.0.0.1 9988
 
 If you want to stream from somewhere other than the localhost,
 change the TCPServer address from 127.0.0.1 to 0.0.0.0 
+
+This example loads a model for each connection. To serve many recorders, see analysis_server.py.
 """
 
 
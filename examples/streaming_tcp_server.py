@@ -0,0 +1,65 @@
+from birdnetlib import RecordingStream
+from birdnetlib.analyzer import Analyzer
+from birdnetlib.streaming import StreamingAnalyzer
+import birdnetlib.wavutils as wavutils
+from datetime import datetime
+from pprint import pprint
+import socketserver
+
+"""
+Example of analyzing a continuous audio stream, with detections reported as soon as each
+3-second window has been received (rather than after each WAV file). To test the example:
+
+Start the server in one terminal:
+
+python streaming_tcp_server.py
+
+In a second terminal, stream audio from a sound card and microphone using arecord:
+
+arecord -r 48000 -f FLOAT_LE | nc 127.0.0.1 9988
+
+Other rates and sample formats (e.g. arecord -r 44100 -f S16_LE -c 2) are converted to 48 kHz
+mono float32 as they arrive.
+"""
+
+analyzer = Analyzer()
+
+
+def on_analyze_complete(recording):
+    pprint(recording.detections)
+
+
+class StreamingTCPHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        recording = None
+
+        # arecord writes a WAV header with an unknown data size; the samples are read in
+        # blocks of 0.5 seconds until the stream ends.
+        for rate, data in wavutils.bufferwavs(self.rfile, stream_block_duration=0.5):
+            if recording is None:
+                recording = RecordingStream(
+                    analyzer,
+                    rate=rate,
+                    lat=35.4244,
+                    lon=-120.7463,
+                    date=datetime(year=2022, month=5, day=10),  # use date or week_48
+                    min_conf=0.25,
+                    overlap=1.5,
+                )
+                streaming_analyzer = StreamingAnalyzer(recording)
+                streaming_analyzer.on_analyze_complete = on_analyze_complete
+                streaming_analyzer.start()
+            recording.write(data)
+
+        if recording is not None:
+            streaming_analyzer.stop()
+            print(recording.return_metrics())
+
+
+if __name__ == "__main__":
+    try:
+        with socketserver.TCPServer(("127.0.0.1", 9988), StreamingTCPHandler) as server:
+            print("Birdnetlib forever!")
+            server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -1,8 +1,10 @@
 from birdnetlib.main import (
     Recording,
     Detection,
+    DetectionTable,
     MultiProcessRecording,
     RecordingBuffer,
+    RecordingStream,
     RecordingFileObject,
     LargeRecording,
     IncompatibleAnalyzerError,
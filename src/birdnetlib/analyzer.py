@@ -5,19 +5,21 @@ from datetime import datetime
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
 os.environ["CUDA_VISIBLE_DEVICES"] = ""
 
-try:
-    import tflite_runtime.interpreter as tflite
-except:
-    from tensorflow import lite as tflite
-
 import numpy as np
-import operator
 import requests
 from pathlib import Path
+from collections.abc import Sequence
 import json
 
-from birdnetlib.species import SpeciesList
-from birdnetlib.utils import read_audio_segments
+from birdnetlib.species import return_shared_species_class
+from birdnetlib.utils import (
+    LRUCache,
+    ScoreWriter,
+    load_interpreter,
+    load_scores,
+    return_dequantized_scores,
+    return_scores_above_threshold,
+)
 from pprint import pprint
 
 # TODO: Update these values on every new model release.
@@ -33,6 +35,7 @@ LABEL_PATH = os.path.join(
 
 
 LOCATION_FILTER_THRESHOLD = 0.03
+SPECIES_LIST_CACHE_SIZE = 256
 
 
 class AnalyzerConfigurationError(Exception):
@@ -60,6 +63,40 @@ class Detection:
         }
 
 
+class DetectionList(Sequence):
+    # Detections stored as arrays (one row per detection).
+    # Detection objects are only created when items are accessed.
+    def __init__(
+        self, start_times, end_times, label_indices, confidences, labels, label_names
+    ):
+        self.start_times = start_times
+        self.end_times = end_times
+        self.label_indices = label_indices
+        self.confidences = confidences
+        self.labels = labels
+        self.label_names = label_names
+
+    def __len__(self):
+        return len(self.label_indices)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        label_index = self.label_indices[index]
+        d = Detection(self.start_times[index].item(), self.end_times[index].item())
+        d.scientific_name, d.common_name = self.label_names[label_index]
+        d.confidence = self.confidences[index].item()
+        d.label = self.labels[label_index]
+        return d
+
+    def return_allowed_mask(self, allow_set):
+        # Boolean mask of detections whose label is in allow_set, via a mask over the labels.
+        label_mask = np.fromiter(
+            (label in allow_set for label in self.labels), dtype=bool, count=len(self.labels)
+        )
+        return label_mask[self.label_indices]
+
+
 class Analyzer:
     def __init__(
         self,
@@ -68,6 +105,12 @@ class Analyzer:
         classifier_model_path=None,
         classifier_labels_path=None,
         version=None,
+        batch_size=1,
+        num_threads=1,
+        use_xnnpack=True,
+        delegates=None,
+        species_grid_path=None,
+        species_grid_mode="snap",
     ):
         self.name = "Analyzer"
         self.model_name = "BirdNET-Analyzer"
@@ -76,15 +119,31 @@ class Analyzer:
         self.output_details = None
         self.input_layer_index = None
         self.output_layer_index = None
+        self.input_shape = None
 
         self.custom_interpreter = None
         self.custom_input_details = None
         self.custom_output_details = None
         self.custom_input_layer_index = None
         self.custom_output_layer_index = None
+        self.custom_input_shape = None
+
+        # Number of chunks passed to the interpreter in a single invocation.
+        self.batch_size = max(1, int(batch_size))
+
+        # Interpreter options.
+        self.num_threads = num_threads
+        self.use_xnnpack = use_xnnpack
+        self.delegates = delegates
 
         self.labels = []
-        self.results = []
+        self.label_names = []
+        # Results of the last analysis, one row per chunk and one row per detection.
+        self.result_start_times = np.zeros(0)
+        self.result_end_times = np.zeros(0)
+        self.result_chunk_indices = np.zeros(0, dtype="int32")
+        self.result_label_indices = np.zeros(0, dtype="int32")
+        self.result_confidences = np.zeros(0, dtype="float32")
         self.embeddings = []
         self.custom_species_list = []
 
@@ -121,11 +180,20 @@ class Analyzer:
         self.load_labels()
         self.load_model()
 
-        self.cached_species_lists = {}
+        # Location-based species lists, least recently used lists are dropped first.
+        self.cached_species_lists = LRUCache(max_size=SPECIES_LIST_CACHE_SIZE)
         self.custom_species_list_path = None
         self.has_custom_species_list = False
 
-        self.species_class = SpeciesList()
+        # A precomputed SpeciesGrid replaces the species list model for location lookups.
+        # species_grid_mode is "snap" (nearest grid point) or "interpolate".
+        if species_grid_mode not in ("snap", "interpolate"):
+            raise AnalyzerConfigurationError(
+                "species_grid_mode must be 'snap' or 'interpolate'."
+            )
+        self.species_grid_path = species_grid_path
+        self.species_grid_mode = species_grid_mode
+        self._species_class = None
 
         if custom_species_list_path:
             self.has_custom_species_list = True
@@ -136,6 +204,60 @@ class Analyzer:
             self.has_custom_species_list = True
             self.custom_species_list = custom_species_list
 
+    @property
+    def species_class(self):
+        # Only loaded when a recording has lon/lat, and shared with the other analyzers.
+        if self._species_class is None:
+            self._species_class = return_shared_species_class(
+                num_threads=self.num_threads,
+                use_xnnpack=self.use_xnnpack,
+                species_grid_path=self.species_grid_path,
+                species_grid_mode=self.species_grid_mode,
+            )
+        return self._species_class
+
+    @species_class.setter
+    def species_class(self, species_class):
+        self._species_class = species_class
+
+    @property
+    def custom_species_list(self):
+        return self._custom_species_list
+
+    @custom_species_list.setter
+    def custom_species_list(self, species_list):
+        self._custom_species_list = species_list
+        self._custom_species_set_source = None
+
+    @property
+    def custom_species_set(self):
+        # Set of allowed labels, used when filtering detections.
+        # Rebuilt when the list is replaced or edited in place.
+        if self._custom_species_set_source != self._custom_species_list:
+            self._custom_species_set_source = list(self._custom_species_list)
+            self._custom_species_set = frozenset(self._custom_species_list)
+        return self._custom_species_set
+
+    def return_init_args(self):
+        # Keyword arguments to create a copy of this analyzer, e.g. in a worker process.
+        # Delegates given as objects rather than library paths can't be sent to other processes.
+        return {
+            "custom_species_list_path": self.custom_species_list_path,
+            # A list passed in memory rather than loaded from custom_species_list_path.
+            "custom_species_list": list(self.custom_species_list)
+            if self.has_custom_species_list and not self.custom_species_list_path
+            else None,
+            "classifier_model_path": self.classifier_model_path,
+            "classifier_labels_path": self.classifier_labels_path,
+            "version": self.version,
+            "batch_size": self.batch_size,
+            "num_threads": self.num_threads,
+            "use_xnnpack": self.use_xnnpack,
+            "delegates": self.delegates,
+            "species_grid_path": self.species_grid_path,
+            "species_grid_mode": self.species_grid_mode,
+        }
+
     def check_for_model_files(self):
         # Check if the models have already been downloaded.
         version_model_path = os.path.join(
@@ -237,40 +359,50 @@ class Analyzer:
 
     @property
     def detections(self):
-        detections = []
-        for key, value in self.results.items():
-            # print(f"{key} -----")
-            start_time = float(key.split("-")[0])
-            end_time = float(key.split("-")[1])
-            for c in value:
-                confidence = float(c[1])
-                label = c[0]
-                scientific_name = label.split("_")[0]
-                common_name = label.split("_")[1]
-                # print(c[0], f"{c[1]:1.4f}")
-                d = Detection(start_time, end_time)
-                d.common_name = common_name
-                d.scientific_name = scientific_name
-                d.confidence = confidence
-                d.label = label
-                # print(d.as_dict)
-                detections.append(d)
-
-        return detections
+        chunk_indices = self.result_chunk_indices
+        return DetectionList(
+            self.result_start_times[chunk_indices],
+            self.result_end_times[chunk_indices],
+            self.result_label_indices,
+            self.result_confidences,
+            self.labels,
+            self.label_names,
+        )
+
+    @property
+    def results(self):
+        # Results keyed by "start-end", each a list of (label, score) tuples sorted by score.
+        results = {}
+        bounds = np.searchsorted(
+            self.result_chunk_indices, np.arange(len(self.result_start_times) + 1)
+        )
+        for chunk, (a, b) in enumerate(zip(bounds[:-1], bounds[1:])):
+            start = self.result_start_times[chunk].item()
+            if chunk == 0 and start == 0:
+                # Keys are formatted as when results were built during analysis, where the
+                # first chunk started at the integer 0 ("0-3.0", then "3.0-6.0", ...).
+                start = 0
+            key = f"{start}-{self.result_end_times[chunk].item()}"
+            results[key] = [
+                (self.labels[i], score)
+                for i, score in zip(
+                    self.result_label_indices[a:b], self.result_confidences[a:b]
+                )
+            ]
+        return results
 
     def predict(self, sample):
         # Prepare sample and pass through model
         data = np.array([sample], dtype="float32")
+        return self.predict_batch(data)
 
-        self.interpreter.resize_tensor_input(
-            self.input_layer_index, [len(data), *data[0].shape]
-        )
-        self.interpreter.allocate_tensors()
+    def predict_batch(self, data):
+        # Pass a [n, samples] batch of chunks through the model in one invocation.
+        data = np.ascontiguousarray(data, dtype="float32")
+        self.set_input_shape(data.shape)
 
         # Make a prediction (Audio only for now)
-        self.interpreter.set_tensor(
-            self.input_layer_index, np.array(data, dtype="float32")
-        )
+        self.interpreter.set_tensor(self.input_layer_index, data)
         self.interpreter.invoke()
         prediction = self.interpreter.get_tensor(self.output_layer_index)
 
@@ -284,6 +416,14 @@ class Analyzer:
 
         return prediction
 
+    def set_input_shape(self, shape):
+        # Resizing and re-allocating tensors is expensive, so only do it when the batch shape changes.
+        shape = tuple(shape)
+        if shape != self.input_shape:
+            self.interpreter.resize_tensor_input(self.input_layer_index, list(shape))
+            self.interpreter.allocate_tensors()
+            self.input_shape = shape
+
     def flat_sigmoid(self, x, sensitivity=-1):
         return 1 / (1.0 + np.exp(sensitivity * np.clip(x, -15, 15)))
 
@@ -304,10 +444,11 @@ class Analyzer:
         print("set_predicted_species_list_from_position")
 
         # Check to see if this species list has been previously cached.
-        list_key = f"list-{recording.lon}-{recording.lat}-{recording.week_48}"
+        list_key = (recording.lon, recording.lat, recording.week_48)
 
-        if list_key in self.cached_species_lists:
-            self.custom_species_list = self.cached_species_lists[list_key]
+        species_list = self.cached_species_lists.get(list_key)
+        if species_list is not None:
+            self.custom_species_list = species_list
             return
 
         species_list = self.return_predicted_species_list(
@@ -320,9 +461,7 @@ class Analyzer:
         # Save to analyzer's cache.
         self.cached_species_lists[list_key] = species_list
 
-    def analyze_recording(self, recording):
-        print("analyze_recording", recording.filename)
-
+    def set_species_list_for_recording(self, recording):
         if self.has_custom_species_list and recording.lon and recording.lat:
             raise ValueError(
                 "Recording lon/lat should not be used in conjunction with a custom species list or path."
@@ -333,58 +472,154 @@ class Analyzer:
             print("recording has lon/lat")
             self.set_predicted_species_list_from_position(recording)
 
+    def analyze_recording(self, recording):
+        print("analyze_recording", recording.filename)
+
+        self.set_species_list_for_recording(recording)
+
+        # Optionally save the full score matrix, so the results can be rebuilt with analyze_scores.
+        scores_path = getattr(recording, "scores_path", None)
+        score_writer = None
+        if scores_path:
+            score_writer = ScoreWriter(scores_path, dtype=recording.scores_dtype)
+
         start = 0
         end = recording.sample_secs
-        results = {}
-        for c in recording.chunks:
+        start_times = []
+        end_times = []
+        chunk_indices = []
+        label_indices = []
+        confidences = []
+        # Up to batch_size chunks as a single [n, samples] tensor.
+        # Slices of non-overlapping chunks are contiguous views and are not copied.
+        for batch in recording.iter_chunk_batches(self.batch_size):
             if self.use_custom_classifier:
-                pred = self.predict_with_custom_classifier(c)[0]
+                predictions = self.predict_with_custom_classifier_batch(batch)
             else:
-                pred = self.predict(c)[0]
+                predictions = self.predict_batch(batch)
 
-            # Assign scores to labels
-            p_labels = dict(zip(self.labels, pred))
+            if score_writer:
+                score_writer.append(predictions)
 
-            # Sort by score
-            p_sorted = sorted(
-                p_labels.items(), key=operator.itemgetter(1), reverse=True
+            # Filter by recording.minimum_confidence so not to needlessly store full 8K array for each chunk.
+            c, l, v = return_scores_above_threshold(
+                predictions, recording.minimum_confidence
+            )
+            chunk_indices.append(c + len(start_times))
+            label_indices.append(l)
+            confidences.append(v)
+
+            for _ in range(len(predictions)):
+                start_times.append(start)
+                end_times.append(end)
+
+                # Increment start and end
+                start += recording.sample_secs - recording.overlap
+                end = start + recording.sample_secs
+
+        if score_writer:
+            score_writer.close(
+                start_times=start_times,
+                end_times=end_times,
+                duration=recording.duration,
+                version=self.version,
+                classifier_model_path=self.classifier_model_path,
             )
 
-            # Filter by recording.minimum_confidence so not to needlessly store full 8K array for each chunk.
-            p_sorted = [i for i in p_sorted if i[1] >= recording.minimum_confidence]
+        self.set_results(
+            start_times, end_times, chunk_indices, label_indices, confidences
+        )
+        recording.detection_list = self.detections
+
+    def analyze_scores(self, recording):
+        # Rebuild the results from a score matrix saved by analyze_recording, without inference.
+        print("analyze_scores", recording.scores_path)
 
-            # Store results
-            results[str(start) + "-" + str(end)] = p_sorted
+        self.set_species_list_for_recording(recording)
 
-            # Increment start and end
-            start += recording.sample_secs - recording.overlap
-            end = start + recording.sample_secs
+        scores, metadata = load_scores(recording.scores_path)
+        if scores.shape[1] not in (0, len(self.labels)):
+            raise AnalyzerConfigurationError(
+                "Saved scores do not match the labels of this analyzer."
+            )
 
-        self.results = results
+        chunk_indices = []
+        label_indices = []
+        confidences = []
+        # Threshold a slab of chunks at a time to bound memory use.
+        for i in range(0, len(scores), 1024):
+            c, l, v = return_scores_above_threshold(
+                return_dequantized_scores(scores[i : i + 1024], metadata["dtype"]),
+                recording.minimum_confidence,
+            )
+            chunk_indices.append(c + i)
+            label_indices.append(l)
+            confidences.append(v)
+
+        if recording.duration is None:
+            recording.duration = metadata.get("duration")
+
+        self.set_results(
+            metadata["start_times"],
+            metadata["end_times"],
+            chunk_indices,
+            label_indices,
+            confidences,
+        )
         recording.detection_list = self.detections
 
+    def set_results(
+        self, start_times, end_times, chunk_indices, label_indices, confidences
+    ):
+        self.result_start_times = np.array(start_times, dtype="float64")
+        self.result_end_times = np.array(end_times, dtype="float64")
+        self.result_chunk_indices = np.concatenate(
+            chunk_indices or [np.zeros(0)]
+        ).astype("int32")
+        self.result_label_indices = np.concatenate(
+            label_indices or [np.zeros(0)]
+        ).astype("int32")
+        self.result_confidences = np.concatenate(confidences or [np.zeros(0)]).astype(
+            "float32"
+        )
+
+    def return_sorted_results(self, predictions, minimum_confidence):
+        # Returns a list of (label, score) tuples per chunk, sorted by score.
+        # Only scores at or above minimum_confidence are converted to Python objects.
+        chunk_indices, label_indices, scores = return_scores_above_threshold(
+            predictions, minimum_confidence
+        )
+        bounds = np.searchsorted(chunk_indices, np.arange(len(predictions) + 1))
+        labels = self.labels
+        return [
+            [(labels[i], score) for i, score in zip(label_indices[a:b], scores[a:b])]
+            for a, b in zip(bounds[:-1], bounds[1:])
+        ]
+
     def extract_embeddings_for_recording(self, recording):
         print("extract_embeddings_for_recording", recording.filename)
         start = 0
         end = recording.sample_secs
         results = []
-        for sample in recording.chunks:
-            data = np.array([sample], dtype="float32")
-            e = self._return_embeddings(data)[0].tolist()
-            results.append({"start_time": start, "end_time": end, "embeddings": e})
+        for batch in recording.iter_chunk_batches(self.batch_size):
+            for embeddings in self._return_embeddings(batch):
+                e = embeddings.tolist()
+                results.append({"start_time": start, "end_time": end, "embeddings": e})
 
-            # Increment start and end
-            start += recording.sample_secs - recording.overlap
-            end = start + recording.sample_secs
+                # Increment start and end
+                start += recording.sample_secs - recording.overlap
+                end = start + recording.sample_secs
 
         self.embeddings = results
 
     def load_model(self):
         print("load model", not self.use_custom_classifier)
         # Load TFLite model and allocate tensors.
-        num_threads = 1  # Default from BN-A config
-        self.interpreter = tflite.Interpreter(
-            model_path=self.model_path, num_threads=num_threads
+        self.interpreter = load_interpreter(
+            self.model_path,
+            num_threads=self.num_threads,
+            use_xnnpack=self.use_xnnpack,
+            delegates=self.delegates,
         )
         self.interpreter.allocate_tensors()
 
@@ -394,6 +629,7 @@ class Analyzer:
 
         # Get input tensor index
         self.input_layer_index = self.input_details[0]["index"]
+        self.input_shape = tuple(self.input_details[0]["shape"])
 
         # Get classification output or feature embeddings
         if self.use_custom_classifier:
@@ -413,6 +649,11 @@ class Analyzer:
             for line in lfile.readlines():
                 labels.append(line.replace("\n", ""))
         self.labels = labels
+        # Split "Scientific name_Common name" labels once.
+        self.label_names = []
+        for label in labels:
+            names = label.split("_")
+            self.label_names.append((names[0], names[1] if len(names) > 1 else names[0]))
         print("Labels loaded.")
 
     def load_custom_list(self):
@@ -428,14 +669,10 @@ class Analyzer:
 
     # Custom models.
     def _return_embeddings(self, data):
-        self.interpreter.resize_tensor_input(
-            self.input_layer_index, [len(data), *data[0].shape]
-        )
-        self.interpreter.allocate_tensors()
+        data = np.ascontiguousarray(data, dtype="float32")
+        self.set_input_shape(data.shape)
         # Extract feature embeddings
-        self.interpreter.set_tensor(
-            self.input_layer_index, np.array(data, dtype="float32")
-        )
+        self.interpreter.set_tensor(self.input_layer_index, data)
         self.interpreter.invoke()
 
         # Embeddings uses custom classifier output layer index.
@@ -448,19 +685,24 @@ class Analyzer:
 
     def predict_with_custom_classifier(self, sample):
         data = np.array([sample], dtype="float32")
+        return self.predict_with_custom_classifier_batch(data)
+
+    def predict_with_custom_classifier_batch(self, data):
         input_details = self.custom_interpreter.get_input_details()
         input_size = input_details[0]["shape"][-1]
         feature_vector = self._return_embeddings(data) if input_size != 144000 else data
-        self.custom_interpreter.resize_tensor_input(
-            self.custom_input_layer_index,
-            [len(feature_vector), *feature_vector[0].shape],
-        )
-        self.custom_interpreter.allocate_tensors()
+        feature_vector = np.ascontiguousarray(feature_vector, dtype="float32")
+
+        shape = tuple(feature_vector.shape)
+        if shape != self.custom_input_shape:
+            self.custom_interpreter.resize_tensor_input(
+                self.custom_input_layer_index, list(shape)
+            )
+            self.custom_interpreter.allocate_tensors()
+            self.custom_input_shape = shape
 
         # Make a prediction
-        self.custom_interpreter.set_tensor(
-            self.custom_input_layer_index, np.array(feature_vector, dtype="float32")
-        )
+        self.custom_interpreter.set_tensor(self.custom_input_layer_index, feature_vector)
         self.custom_interpreter.invoke()
         prediction = self.custom_interpreter.get_tensor(self.custom_output_layer_index)
 
@@ -477,9 +719,11 @@ class Analyzer:
         print("load_custom_models")
         # Load TFLite model and allocate tensors.
         model_path = self.classifier_model_path
-        num_threads = 1  # Default from BN-A config
-        self.custom_interpreter = tflite.Interpreter(
-            model_path=model_path, num_threads=num_threads
+        self.custom_interpreter = load_interpreter(
+            model_path,
+            num_threads=self.num_threads,
+            use_xnnpack=self.use_xnnpack,
+            delegates=self.delegates,
         )
         self.custom_interpreter.allocate_tensors()
 
@@ -489,12 +733,14 @@ class Analyzer:
 
         # Get input tensor index
         self.custom_input_layer_index = self.custom_input_details[0]["index"]
+        self.custom_input_shape = tuple(self.custom_input_details[0]["shape"])
         self.custom_output_layer_index = self.custom_output_details[0]["index"]
 
         print("Custom model loaded.")
 
 
 class LargeRecordingAnalyzer(Analyzer):
+    # Analysis is shared with Analyzer; LargeRecording streams its chunks from the file.
     def __init__(
         self,
         custom_species_list_path=None,
@@ -502,6 +748,12 @@ class LargeRecordingAnalyzer(Analyzer):
         classifier_model_path=None,
         classifier_labels_path=None,
         version=None,
+        batch_size=1,
+        num_threads=1,
+        use_xnnpack=True,
+        delegates=None,
+        species_grid_path=None,
+        species_grid_mode="snap",
     ):
         super().__init__(
             custom_species_list_path,
@@ -509,86 +761,10 @@ class LargeRecordingAnalyzer(Analyzer):
             classifier_model_path,
             classifier_labels_path,
             version,
+            batch_size,
+            num_threads,
+            use_xnnpack,
+            delegates,
+            species_grid_path,
+            species_grid_mode,
         )
-
-    def analyze_recording(self, recording):
-        # print("analyze_recording, large mode", recording.filename)
-
-        if self.has_custom_species_list and recording.lon and recording.lat:
-            raise ValueError(
-                "Recording lon/lat should not be used in conjunction with a custom species list or path."
-            )
-
-        # If recording has lon/lat, load cached list or predict a new species list.
-        if recording.lon and recording.lat and self.classifier_model_path is None:
-            print("recording has lon/lat")
-            self.set_predicted_species_list_from_position(recording)
-
-        start = 0
-        end = recording.sample_secs
-        results = {}
-
-        # Read segments via generator function so that the entire audio file is never loaded into RAM.
-        # TODO: Adapt this to be used by all Analyzers, assuming this works well with Canopy testing.
-
-        for segment in read_audio_segments(recording.path, sr=48000):
-            c = segment["segment"]
-            if len(c) < recording.sample_secs * 48000:
-                # If below the minimum segment duration, continue.
-                del c
-                continue
-            start = segment["start_sec"]
-            end = segment["end_sec"]
-            if self.use_custom_classifier:
-                pred = self.predict_with_custom_classifier(c)[0]
-            else:
-                pred = self.predict(c)[0]
-
-            # Assign scores to labels
-            p_labels = dict(zip(self.labels, pred))
-
-            # Sort by score
-            p_sorted = sorted(
-                p_labels.items(), key=operator.itemgetter(1), reverse=True
-            )
-
-            # Filter by recording.minimum_confidence so not to needlessly store full 8K array for each chunk.
-            p_sorted_filtered = [
-                i for i in p_sorted if i[1] >= recording.minimum_confidence
-            ]
-
-            # Store results
-            results[str(start) + "-" + str(end)] = p_sorted_filtered
-
-            # Clean up.
-            del pred
-            del p_labels
-            del p_sorted
-            del c
-
-        self.results = results
-        recording.detection_list = self.detections
-
-    def extract_embeddings_for_recording(self, recording):
-        print("extract_embeddings_for_recording", recording.filename)
-        start = 0
-        end = recording.sample_secs
-        results = []
-        for segment in read_audio_segments(recording.path, sr=48000):
-            c = segment["segment"]
-            if len(c) < recording.sample_secs * 48000:
-                # If below the minimum segment duration, continue.
-                del c
-                continue
-            start = segment["start_sec"]
-            end = segment["end_sec"]
-
-            data = np.array([c], dtype="float32")
-            e = self._return_embeddings(data)[0].tolist()
-            results.append({"start_time": start, "end_time": end, "embeddings": e})
-
-            # Increment start and end
-            start += recording.sample_secs - recording.overlap
-            end = start + recording.sample_secs
-
-        self.embeddings = results
@@ -5,18 +5,13 @@ import sys
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
 os.environ["CUDA_VISIBLE_DEVICES"] = ""
 
-try:
-    import tflite_runtime.interpreter as tflite
-except:
-    from tensorflow import lite as tflite
-
 import numpy as np
 import math
 import time
-import operator
 import requests
 
 from birdnetlib import Detection
+from birdnetlib.utils import load_interpreter, return_top_k_scores
 
 MODEL_PATH = os.path.join(
     os.path.dirname(__file__), "models/lite/BirdNET_6K_GLOBAL_MODEL.tflite"
@@ -29,7 +24,14 @@ LABEL_URL = "https://github.com/joeweiss/birdnetlib/raw/main/src/birdnetlib/mode
 
 
 class LiteAnalyzer:
-    def __init__(self, custom_species_list_path=None, custom_species_list=None):
+    def __init__(
+        self,
+        custom_species_list_path=None,
+        custom_species_list=None,
+        num_threads=None,
+        use_xnnpack=True,
+        delegates=None,
+    ):
         self.name = "LiteAnalyzer"
         self.model_name = "BirdNET-Lite"
         self.interpreter = None
@@ -42,6 +44,11 @@ class LiteAnalyzer:
         self.custom_species_list = []
         self.custom_species_list_path = custom_species_list_path
 
+        # Interpreter options (None uses the TFLite default thread count).
+        self.num_threads = num_threads
+        self.use_xnnpack = use_xnnpack
+        self.delegates = delegates
+
         self.model_download_was_required = False
         self.check_for_model_files()
 
@@ -52,6 +59,37 @@ class LiteAnalyzer:
         if custom_species_list:
             self.custom_species_list = custom_species_list
 
+    @property
+    def custom_species_list(self):
+        return self._custom_species_list
+
+    @custom_species_list.setter
+    def custom_species_list(self, species_list):
+        self._custom_species_list = species_list
+        self._custom_species_set_source = None
+
+    @property
+    def custom_species_set(self):
+        # Set of allowed labels, used when filtering detections.
+        # Rebuilt when the list is replaced or edited in place.
+        if self._custom_species_set_source != self._custom_species_list:
+            self._custom_species_set_source = list(self._custom_species_list)
+            self._custom_species_set = frozenset(self._custom_species_list)
+        return self._custom_species_set
+
+    def return_init_args(self):
+        # Keyword arguments to create a copy of this analyzer, e.g. in a worker process.
+        return {
+            "custom_species_list_path": self.custom_species_list_path,
+            # A list passed in memory rather than loaded from custom_species_list_path.
+            "custom_species_list": list(self.custom_species_list)
+            if not self.custom_species_list_path and self.custom_species_list
+            else None,
+            "num_threads": self.num_threads,
+            "use_xnnpack": self.use_xnnpack,
+            "delegates": self.delegates,
+        }
+
     def check_for_model_files(self):
         # Necessitated by PyPI's limit of 100MB per library.
         # This check will only download the file once.
@@ -77,7 +115,12 @@ class LiteAnalyzer:
                 print("Failed to download the file.")
 
     def load_lite_model(self):
-        self.interpreter = tflite.Interpreter(model_path=MODEL_PATH)
+        self.interpreter = load_interpreter(
+            MODEL_PATH,
+            num_threads=self.num_threads,
+            use_xnnpack=self.use_xnnpack,
+            delegates=self.delegates,
+        )
         self.interpreter.allocate_tensors()
 
         # Get input and output tensors.
@@ -142,11 +185,11 @@ class LiteAnalyzer:
         # Apply custom sigmoid
         p_sigmoid = self.custom_sigmoid(prediction, sensitivity)
 
-        # Get label and scores for pooled predictions
-        p_labels = dict(zip(self.classes, p_sigmoid))
-
-        # Sort by score
-        p_sorted = sorted(p_labels.items(), key=operator.itemgetter(1), reverse=True)
+        # Get the top ten labels and scores without sorting the full label list
+        label_indices, scores = return_top_k_scores(np.expand_dims(p_sigmoid, 0), 10)
+        p_sorted = [
+            (self.classes[i], score) for i, score in zip(label_indices[0], scores[0])
+        ]
 
         # Remove species that are on blacklist
         for i in range(min(10, len(p_sorted))):
@@ -154,7 +197,7 @@ class LiteAnalyzer:
                 p_sorted[i] = (p_sorted[i][0], 0.0)
 
         # Only return first the top ten results
-        return p_sorted[:10]
+        return p_sorted
 
     def analyze_recording(self, recording):
         print("analyze_recording", recording.path)
@@ -172,7 +215,7 @@ class LiteAnalyzer:
 
         # Parse every chunk
         pred_start = 0.0
-        for c in recording.chunks:
+        for c in recording.iter_chunks():
 
             # Prepare as input signal
             sig = np.expand_dims(c, 0)
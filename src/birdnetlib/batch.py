@@ -3,8 +3,8 @@ from birdnetlib import (
     MultiProcessRecording,
 )
 from pathlib import Path
-from multiprocessing import Pool, Manager
-import multiprocessing
+from multiprocessing import Pool
+from birdnetlib.utils import return_threads_per_worker
 import queue
 # from pprint import pprint
 
@@ -22,6 +22,7 @@ class DirectoryAnalyzer:
         min_conf=0.1,
         overlap=0.0,
         patterns=["*.mp3", "*.wav"],
+        cache=None,
     ):
         self.directory = directory
         if len(analyzers) > 0:
@@ -40,6 +41,8 @@ class DirectoryAnalyzer:
         self.lon = lon
         self.min_conf = min_conf
         self.overlap = overlap
+        # Optional ResultCache; files with cached results are not decoded or analyzed again.
+        self.cache = cache
         self.directory_recordings = []
         self.patterns = patterns
 
@@ -74,9 +77,13 @@ class DirectoryAnalyzer:
                     lon=self.lon,
                     min_conf=self.min_conf,
                     overlap=self.overlap,
+                    cache=self.cache,
                 )
                 # Preparse if method is available.
                 self.recording_preanalyze(recording)
+                if recordings:
+                    # Reuse the audio decoded for the previous analyzer.
+                    recording.share_audio_data(recordings[-1])
                 recording.analyze()
                 recordings.append(recording)
                 self.on_analyze_complete(recording)
@@ -98,6 +105,47 @@ class DirectoryAnalyzer:
         self.on_analyze_directory_complete(self.directory_recordings)
 
 
+# Analyzers built once per worker process by init_analyzer_worker.
+_worker_analyzers = None
+
+
+def return_analyzer_args(analyzers, num_threads=None, use_xnnpack=None):
+    # Picklable arguments to create copies of the analyzers, e.g. in worker processes.
+    # num_threads and use_xnnpack default to each analyzer's own options.
+    analyzer_args = []
+    for i in analyzers:
+        args = {"model_name": i.model_name, **i.return_init_args()}
+        if num_threads is not None:
+            args["num_threads"] = num_threads
+        if use_xnnpack is not None:
+            args["use_xnnpack"] = use_xnnpack
+        analyzer_args.append(args)
+    return analyzer_args
+
+
+def load_analyzers_from_args(analyzer_args):
+    # Init the analyzers themselves, pass required kwargs
+    analyzers = []
+    print("Initializing analyzer(s)")
+    for i in analyzer_args:
+        kwargs = {key: value for key, value in i.items() if key != "model_name"}
+        if i["model_name"] == "BirdNET-Lite":
+            from birdnetlib.analyzer_lite import LiteAnalyzer
+
+            analyzers.append(LiteAnalyzer(**kwargs))
+        else:
+            from birdnetlib.analyzer import Analyzer
+
+            analyzers.append(Analyzer(**kwargs))
+    return analyzers
+
+
+def init_analyzer_worker(analyzer_args):
+    # Pool initializer: load the models once per worker, then reuse them for every file.
+    global _worker_analyzers
+    _worker_analyzers = load_analyzers_from_args(analyzer_args)
+
+
 def process_from_queue(queue_item, analyzers=None):
     print("process_from_queue")
 
@@ -112,28 +160,12 @@ def process_from_queue(queue_item, analyzers=None):
     # pprint(recording_config)
 
     if not analyzers:
-        # Init the analyzers themselves, pass required kwargs
-        analyzers = []
-        print("Initializing analyzer(s)")
-        for i in analyzer_args:
-            if i["model_name"] == "BirdNET-Lite":
-                from birdnetlib.analyzer_lite import LiteAnalyzer
-
-                analyzers.append(
-                    LiteAnalyzer(custom_species_list_path=i["custom_species_list_path"])
-                )
-            else:
-                from birdnetlib.analyzer import Analyzer
-
-                analyzers.append(
-                    Analyzer(
-                        custom_species_list_path=i["custom_species_list_path"],
-                        classifier_model_path=i["classifier_model_path"],
-                        classifier_labels_path=i["classifier_labels_path"],
-                    )
-                )
+        # Use the worker's analyzers if the pool was initialized with init_analyzer_worker.
+        analyzers = _worker_analyzers or load_analyzers_from_args(analyzer_args)
 
     recordings = []
+    # The last successfully analyzed Recording, whose audio is shared with the next analyzer.
+    shared_recording = None
     for analyzer in analyzers:
         try:
             recording = Recording(
@@ -146,8 +178,12 @@ def process_from_queue(queue_item, analyzers=None):
                 lon=recording_config.get("lon", None),
                 min_conf=recording_config.get("minimum_confidence", 0.1),
                 overlap=recording_config.get("overlap", 0.0),
+                cache=recording_config.get("cache", None),
             )
+            if shared_recording:
+                recording.share_audio_data(shared_recording)
             recording.analyze()
+            shared_recording = recording
             recordings.append(recording.as_dict)
         except BaseException as error:
             print(recording, error)
@@ -178,6 +214,11 @@ class DirectoryMultiProcessingAnalyzer:
         overlap=0.0,
         patterns=["*.mp3", "*.wav"],
         processes=None,
+        num_threads=None,
+        use_xnnpack=True,
+        chunksize=1,
+        store_recordings=True,
+        cache=None,
     ):
         self.directory = directory
         if len(analyzers) > 0:
@@ -196,24 +237,27 @@ class DirectoryMultiProcessingAnalyzer:
         self.lon = lon
         self.min_conf = min_conf
         self.overlap = overlap
+        # Optional ResultCache; files with cached results are not decoded or analyzed again.
+        self.cache = cache
         self.directory_recordings = []
         self.patterns = patterns
         self.errors = []
         self.exceptions_raised = False
-        self.processes = processes
-        if not self.processes:
-            max_cpus = multiprocessing.cpu_count() - 1
-            self.processes = max_cpus
+        # Split CPUs between worker processes and interpreter threads per worker.
+        self.processes, self.num_threads = return_threads_per_worker(
+            processes=processes, num_threads=num_threads
+        )
+        self.use_xnnpack = use_xnnpack
+        # Number of files sent to a worker at a time.
+        self.chunksize = chunksize
+        # If False, recordings are only passed to the callbacks and not kept in directory_recordings.
+        self.store_recordings = store_recordings
 
     def on_analyze_complete(self, recording):
-        raise NotImplementedError(
-            "on_analyze_complete is not implemented in DirectoryMultiProcessingAnalyzer. Use DirectoryAnalyzer instead."
-        )
+        pass
 
     def on_analyze_file_complete(self, recordings):
-        raise NotImplementedError(
-            "on_analyze_file_complete is not implemented in DirectoryMultiProcessingAnalyzer. Use DirectoryAnalyzer instead."
-        )
+        pass
 
     def on_analyze_directory_complete(self, recordings):
         pass
@@ -234,28 +278,11 @@ class DirectoryMultiProcessingAnalyzer:
         for pattern in patterns:
             files.extend(Path(self.directory).glob(pattern))
 
-        # print("cpus", multiprocessing.cpu_count())
-
-        max_cpus = multiprocessing.cpu_count() - 1
-
-        with Manager() as manager:
-            # create the shared queue
-            shared_queue = manager.list()
-
-            analyzer_args = [
-                {
-                    "model_name": i.model_name,
-                    "classifier_labels_path": i.classifier_labels_path
-                    if hasattr(i, "classifier_labels_path")
-                    else None,
-                    "classifier_model_path": i.classifier_model_path
-                    if hasattr(i, "classifier_model_path")
-                    else None,
-                    "custom_species_list_path": i.custom_species_list_path,
-                }
-                for i in self.analyzers
-            ]
+        analyzer_args = return_analyzer_args(
+            self.analyzers, num_threads=self.num_threads, use_xnnpack=self.use_xnnpack
+        )
 
+        def queue_items():
             for file in files:
                 # Run preparsing here, then pass recording config to the process queue
                 recording = Recording(
@@ -268,39 +295,33 @@ class DirectoryMultiProcessingAnalyzer:
                     lon=self.lon,
                     min_conf=self.min_conf,
                     overlap=self.overlap,
+                    cache=self.cache,
                 )
-
-                shared_queue.append((recording.__dict__, analyzer_args))
-
-            with Pool(self.processes) as p:
-                # execute the tasks in parallel
-                results = p.map(
-                    process_from_queue,
-                    shared_queue,
-                )
-
-            # print("All done")
-
-        directory_recordings = []
-        for processor_results in results:
-            directory_recordings = directory_recordings + processor_results
-
-        for results in directory_recordings:
-            # Return as RecordingResults object
-            # pprint(
-            #     {
-            #         "path": results["path"],
-            #         "config": results["config"],
-            #         "detections": results["detections"],
-            #         "error": results.get("error", False),
-            #         "error_message": results.get("error_message", None),
-            #     }
-            # )
-            results = MultiProcessRecording(results=results)
-            self.directory_recordings.append(results)
+                yield (recording.__dict__, analyzer_args)
+
+        with Pool(
+            self.processes,
+            initializer=init_analyzer_worker,
+            initargs=(analyzer_args,),
+        ) as p:
+            # Results are handled in the parent as each file completes.
+            for processor_results in p.imap_unordered(
+                process_from_queue, queue_items(), chunksize=self.chunksize
+            ):
+                # Return as RecordingResults object
+                recordings = [
+                    MultiProcessRecording(results=results)
+                    for results in processor_results
+                ]
+                for recording in recordings:
+                    if recording.error:
+                        self.errors.append(recording)
+                    self.on_analyze_complete(recording)
+                self.on_analyze_file_complete(recordings)
+                if self.store_recordings:
+                    self.directory_recordings.extend(recordings)
 
         # Look for exceptions.
-        self.errors = [i for i in self.directory_recordings if i.error]
         self.exceptions_raised = len(self.errors) != 0
 
         self.on_analyze_directory_complete(self.directory_recordings)
@@ -0,0 +1,358 @@
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from birdnetlib.analyzer import DetectionList
+
+# Fraction of max_bytes kept when evicting, so that eviction doesn't run on every save.
+EVICTION_TARGET = 0.9
+
+
+class ResultCache:
+    """
+    Cache of analysis results, keyed by the audio file, the analyzer model and the recording config.
+
+    On a hit, Recording.analyze restores the detections without decoding the audio or running
+    inference. Entries are evicted least recently used first once the cache exceeds max_bytes,
+    down to EVICTION_TARGET of max_bytes. The total size is kept by each cache object (and
+    recounted on eviction), so saving doesn't scan the cache; when several processes share a
+    cache, it can exceed max_bytes until one of them evicts.
+    Use SQLiteResultCache or DirectoryResultCache.
+
+    :param max_bytes: Maximum total size of the cached entries.
+    :param key_mode: "content" to key files by a hash of their contents, or "stat" to key them by
+        path, size, modification time and inode (faster, but does not detect a file being replaced
+        with identical metadata).
+    """
+
+    def __init__(self, max_bytes=1024**3, key_mode="content"):
+        if key_mode not in ("content", "stat"):
+            raise ValueError("key_mode must be 'content' or 'stat'.")
+        self.max_bytes = max_bytes
+        self.key_mode = key_mode
+        self.hits = 0
+        self.misses = 0
+        self.file_digests = {}
+        # Total size of the entries, counted on the first save, then updated by save and evict.
+        self.total_bytes = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks and connections can not be shared with other processes; each process
+        # creates its own, and counts the entries again.
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state.pop("_local", None)
+        state["total_bytes"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def return_file_digest(self, path):
+        stat = os.stat(path)
+        file_id = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        if self.key_mode == "stat":
+            return json.dumps(file_id)
+
+        # Content hashes are memoized by file metadata, e.g. for multiple analyzers per file.
+        if file_id not in self.file_digests:
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+            if len(self.file_digests) > 1024:
+                self.file_digests.clear()
+            self.file_digests[file_id] = digest.hexdigest()
+        return self.file_digests[file_id]
+
+    def return_key(self, recording):
+        analyzer = recording.analyzer
+        config = {
+            "file": self.return_file_digest(recording.path),
+            "recording": type(recording).__name__,
+            "analyzer": type(analyzer).__name__,
+            "model_name": getattr(analyzer, "model_name", None),
+            "version": getattr(analyzer, "version", None),
+            "model_path": getattr(analyzer, "model_path", None),
+            "classifier_model_path": getattr(analyzer, "classifier_model_path", None),
+            "classifier_labels_path": getattr(analyzer, "classifier_labels_path", None),
+            "species_grid_path": getattr(analyzer, "species_grid_path", None),
+            "species_grid_mode": getattr(analyzer, "species_grid_mode", None),
+            "overlap": recording.overlap,
+            "sensitivity": recording.sensitivity,
+            "minimum_confidence": recording.minimum_confidence,
+            "sample_secs": recording.sample_secs,
+            "week_48": recording.week_48,
+            "lat": recording.lat,
+            "lon": recording.lon,
+        }
+        return hashlib.sha256(
+            json.dumps(config, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    def load(self, recording):
+        # Restore recording.detection_list and duration. Returns False on a miss.
+        recording.cache_key = self.return_key(recording)
+        value = self.get(recording.cache_key)
+        if value is None:
+            self.misses += 1
+            return False
+        self.hits += 1
+
+        # The analyzer's location-based species list is still needed to filter detections.
+        if hasattr(recording.analyzer, "set_species_list_for_recording"):
+            recording.analyzer.set_species_list_for_recording(recording)
+
+        with np.load(io.BytesIO(value), allow_pickle=False) as entry:
+            duration = float(entry["duration"])
+            recording.duration = None if np.isnan(duration) else duration
+            recording.detection_list = DetectionList(
+                entry["start_times"],
+                entry["end_times"],
+                entry["label_indices"],
+                entry["confidences"],
+                entry["labels"].tolist(),
+                list(
+                    zip(
+                        entry["scientific_names"].tolist(),
+                        entry["common_names"].tolist(),
+                    )
+                ),
+            )
+        return True
+
+    def save(self, recording):
+        key = getattr(recording, "cache_key", None) or self.return_key(recording)
+        detection_list = recording.detection_list
+        if hasattr(detection_list, "label_indices"):
+            # Only store the labels that occur in the detections.
+            used, label_indices = np.unique(
+                detection_list.label_indices, return_inverse=True
+            )
+            labels = [detection_list.labels[i] for i in used]
+            label_names = [detection_list.label_names[i] for i in used]
+            start_times = detection_list.start_times
+            end_times = detection_list.end_times
+            confidences = detection_list.confidences
+        else:
+            lookup = {}
+            label_names = []
+            rows = []
+            for d in detection_list:
+                detection = d.as_dict
+                if detection["label"] not in lookup:
+                    lookup[detection["label"]] = len(lookup)
+                    label_names.append(
+                        (detection["scientific_name"], detection["common_name"])
+                    )
+                rows.append(
+                    (
+                        detection["start_time"],
+                        detection["end_time"],
+                        lookup[detection["label"]],
+                        detection["confidence"],
+                    )
+                )
+            labels = list(lookup)
+            start_times, end_times, label_indices, confidences = (
+                list(zip(*rows)) or [[]] * 4
+            )
+
+        value = io.BytesIO()
+        np.savez(
+            value,
+            start_times=np.asarray(start_times, dtype="float64"),
+            end_times=np.asarray(end_times, dtype="float64"),
+            label_indices=np.asarray(label_indices, dtype="int32"),
+            confidences=np.asarray(confidences, dtype="float32"),
+            labels=np.array(labels, dtype=str),
+            scientific_names=np.array([i[0] for i in label_names], dtype=str),
+            common_names=np.array([i[1] for i in label_names], dtype=str),
+            duration=np.float64(
+                recording.duration if recording.duration is not None else np.nan
+            ),
+        )
+        size_change = self.put(key, value.getvalue())
+        with self._lock:
+            if self.total_bytes is None:
+                self.total_bytes = self.return_total_bytes()
+            else:
+                self.total_bytes += size_change
+            if self.total_bytes > self.max_bytes:
+                self.total_bytes = self.evict()
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def put(self, key, value):
+        # Returns the change of the total size (the size of a replaced entry is subtracted).
+        raise NotImplementedError
+
+    def return_total_bytes(self):
+        raise NotImplementedError
+
+    def evict(self):
+        # Returns the total size of the remaining entries.
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class SQLiteResultCache(ResultCache):
+    # Cache entries stored in a single SQLite database file.
+    def __init__(self, path, max_bytes=1024**3, key_mode="content"):
+        super().__init__(max_bytes=max_bytes, key_mode=key_mode)
+        self.path = path
+        # SQLite connections can only be used by the thread that opened them, so each thread
+        # (e.g. DirectoryWatcher workers) opens its own.
+        self._local = threading.local()
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        local = self._local
+        if getattr(local, "connection", None) is None or local.pid != os.getpid():
+            local.connection = sqlite3.connect(self.path, timeout=30)
+            local.pid = os.getpid()
+            with local.connection:
+                local.connection.execute(
+                    "CREATE TABLE IF NOT EXISTS results "
+                    "(key TEXT PRIMARY KEY, value BLOB, size INTEGER, accessed REAL)"
+                )
+        return local.connection
+
+    def get(self, key):
+        with self.connection as connection:
+            row = connection.execute(
+                "SELECT value FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+        return row[0]
+
+    def put(self, key, value):
+        with self.connection as connection:
+            row = connection.execute(
+                "SELECT size FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            connection.execute(
+                "REPLACE INTO results (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time()),
+            )
+        return len(value) - (row[0] if row else 0)
+
+    def return_total_bytes(self):
+        with self.connection as connection:
+            return connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()[0]
+
+    def evict(self):
+        with self.connection as connection:
+            rows = connection.execute(
+                "SELECT key, size FROM results ORDER BY accessed DESC"
+            ).fetchall()
+            total = 0
+            evicted = []
+            for key, size in rows:
+                if evicted or total + size > self.max_bytes * EVICTION_TARGET:
+                    evicted.append((key,))
+                else:
+                    total += size
+            connection.executemany("DELETE FROM results WHERE key = ?", evicted)
+        return total
+
+    def clear(self):
+        with self.connection as connection:
+            connection.execute("DELETE FROM results")
+        with self._lock:
+            self.total_bytes = 0
+
+
+class DirectoryResultCache(ResultCache):
+    # Cache entries stored as one file per entry; file modification times track access.
+    def __init__(self, directory, max_bytes=1024**3, key_mode="content"):
+        super().__init__(max_bytes=max_bytes, key_mode=key_mode)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def return_entry_path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key):
+        path = self.return_entry_path(key)
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return value
+
+    def put(self, key, value):
+        # Write to a temporary file first so readers never see a partial entry.
+        path = self.return_entry_path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(value)
+        try:
+            previous_size = os.stat(path).st_size
+        except FileNotFoundError:
+            previous_size = 0
+        os.replace(temp_path, path)
+        return len(value) - previous_size
+
+    def return_entries(self):
+        # (modification time, size, path) of each entry.
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".npz"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def return_total_bytes(self):
+        return sum(size for _, size, _ in self.return_entries())
+
+    def evict(self):
+        entries = sorted(self.return_entries(), reverse=True)
+        total = 0
+        evicted = []
+        for _, size, path in entries:
+            if evicted or total + size > self.max_bytes * EVICTION_TARGET:
+                evicted.append(path)
+            else:
+                total += size
+        for path in evicted:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        return total
+
+    def clear(self):
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".npz"):
+                    os.unlink(entry.path)
+        with self._lock:
+            self.total_bytes = 0
@@ -9,3 +9,7 @@ class AnalyzerRuntimeWarning(Warning):
 class IncompatibleAnalyzerError(Exception):
     def __init__(self, message):
         super().__init__(message)
+
+
+class QuotaExceededError(Exception):
+    pass
@@ -9,15 +9,39 @@ from birdnetlib.exceptions import (
 import warnings
 import audioread
 from os import path
-from birdnetlib.utils import return_week_48_from_datetime
+from birdnetlib.utils import (
+    StreamingResampler,
+    read_audio_blocks,
+    return_float32_audio,
+    return_resampled_audio,
+    return_week_48_from_datetime,
+    split_audio_blocks,
+)
 from pathlib import Path
-import matplotlib.pyplot as plt
-from collections import namedtuple
-from birdnetlib.analyzer import LargeRecordingAnalyzer
+from collections import deque, namedtuple
+import csv
+import threading
+import time
+from birdnetlib.analyzer import DetectionList, LargeRecordingAnalyzer
+from birdnetlib.spectrogram import SpectrogramEngine
 
 SAMPLE_RATE = 48000
 
 
+def return_padded_signal(signal, length, resize_in_place=False):
+    # Returns signal zero-padded at the end to length samples.
+    if resize_in_place and signal.flags.owndata and signal.flags.c_contiguous:
+        # Grow the buffer in place (realloc) to avoid a second copy of the signal.
+        try:
+            signal.resize(length, refcheck=False)
+            return signal
+        except ValueError:
+            pass
+    padded = np.zeros(length, dtype=signal.dtype)
+    padded[: len(signal)] = signal
+    return padded
+
+
 class RecordingBase:
     def __init__(
         self,
@@ -47,17 +71,17 @@ class RecordingBase:
         self.sample_secs = 3.0
         self.duration = None
         self.ndarray = None
+        self.chunks = None
+        self.streaming = False
+        self.audio_shared = False
         self.extracted_audio_paths = {}
         self.extracted_spectrogram_paths = {}
         self.return_all_detections = return_all_detections
+        self._detections_cache = None
+        # Optional ResultCache (see birdnetlib.cache); only used by file-based recordings.
+        self.cache = None
 
-    def analyze(self):
-        # Check that analyzer is not LargeRecordingAnalyzer
-        if isinstance(self.analyzer, LargeRecordingAnalyzer):
-            raise IncompatibleAnalyzerError(
-                "LargeRecordingAnalyzer can only be used with the LargeRecording class"
-            )
-
+    def set_week_48(self):
         # Compute date to week_48 format as required by current BirdNET analyzers.
         # TODO: Add a warning if both a date and week_48 value is provided. Currently, date would override explicit week_48.
         if self.week_48 != -1:
@@ -67,14 +91,33 @@ class RecordingBase:
             # Convert date to week_48 format for the Analyzer models.
             self.week_48 = return_week_48_from_datetime(self.date)
 
+    def analyze(self):
+        # Check that analyzer is not LargeRecordingAnalyzer
+        if isinstance(self.analyzer, LargeRecordingAnalyzer):
+            raise IncompatibleAnalyzerError(
+                "LargeRecordingAnalyzer can only be used with the LargeRecording class"
+            )
+
+        self.set_week_48()
+
+        # Restore the results from the cache, if available, without reading the audio.
+        if self.cache and self.cache.load(self):
+            self.analyzed = True
+            return
+
         # Read and analyze.
-        self.read_audio_data()
+        if not self.audio_shared:
+            self.read_audio_data()
         self.analyzer.analyze_recording(self)
         self.analyzed = True
 
+        if self.cache:
+            self.cache.save(self)
+
     def extract_embeddings(self):
         # Read and analyze.
-        self.read_audio_data()
+        if not self.audio_shared:
+            self.read_audio_data()
         self.analyzer.extract_embeddings_for_recording(self)
         self.embeddings_list = self.analyzer.embeddings
         self.embeddings_extracted = True
@@ -89,37 +132,80 @@ class RecordingBase:
         return self.embeddings_list
 
     @property
-    def detections(self):
+    def detection_table(self):
         if not self.analyzed:
             warnings.warn(
                 "'analyze' method has not been called. Call .analyze() before accessing detections.",
                 AnalyzerRuntimeWarning,
             )
-        qualified_detections = []
-        allow_list = self.analyzer.custom_species_list
-        for d in self.detection_list:
-            if self.return_all_detections:
-                if d.confidence > self.minimum_confidence:
-                    detection = self.return_detection_dict(d)
-                    detection["is_predicted_for_location_and_date"] = (
-                        f"{d.scientific_name}_{d.common_name}" in allow_list
-                    )
-                    qualified_detections.append(detection)
-            else:
-                if d.confidence > self.minimum_confidence and (
-                    f"{d.scientific_name}_{d.common_name}" in allow_list
-                    or len(allow_list) == 0
-                ):
-                    detection = self.return_detection_dict(d)
-                    qualified_detections.append(detection)
+        # Qualified detections are cached until the detections, allow list or config change.
+        allow_set = getattr(self.analyzer, "custom_species_set", None)
+        if allow_set is None:
+            allow_set = frozenset(self.analyzer.custom_species_list)
+        cache_key = (self.minimum_confidence, self.return_all_detections)
+        cache = self._detections_cache
+        if (
+            cache
+            and cache[0] is self.detection_list
+            and cache[1] is allow_set
+            and cache[2] == cache_key
+        ):
+            return cache[3]
+
+        path = getattr(self, "path", None)
+        detection_list = self.detection_list
+        if hasattr(detection_list, "return_allowed_mask"):
+            # Columnar detections: filter with masks, without creating Detection objects.
+            allowed = detection_list.return_allowed_mask(allow_set)
+            qualified = (
+                detection_list.confidences.astype("float64") > self.minimum_confidence
+            )
+            if not self.return_all_detections and len(allow_set) > 0:
+                qualified &= allowed
+            indices = np.flatnonzero(qualified)
+            table = DetectionTable(
+                start_times=detection_list.start_times[indices],
+                end_times=detection_list.end_times[indices],
+                label_indices=detection_list.label_indices[indices],
+                confidences=detection_list.confidences[indices],
+                labels=detection_list.labels,
+                label_names=detection_list.label_names,
+                paths=[path],
+                is_predicted=allowed[indices] if self.return_all_detections else None,
+            )
+        else:
+            table = DetectionTable.from_detections(
+                detection_list,
+                minimum_confidence=self.minimum_confidence,
+                allow_set=allow_set,
+                return_all_detections=self.return_all_detections,
+                path=path,
+            )
+
+        self._detections_cache = (self.detection_list, allow_set, cache_key, table, None)
+        return table
 
-        return qualified_detections
+    @property
+    def detections(self):
+        # List of detection dicts, built from (and cached with) detection_table.
+        # Callers get their own copies, so editing them doesn't change the cache.
+        table = self.detection_table
+        cache = self._detections_cache
+        if cache[4] is None:
+            qualified_detections = table.as_dicts()
+            if self.extracted_audio_paths or self.extracted_spectrogram_paths:
+                for detection in qualified_detections:
+                    self.add_extracted_paths(detection)
+            self._detections_cache = cache[:4] + (qualified_detections,)
+        return [dict(d) for d in self._detections_cache[4]]
 
     def return_detection_dict(self, detection_obj):
-        detection = detection_obj.as_dict
+        return self.add_extracted_paths(detection_obj.as_dict)
 
+    def add_extracted_paths(self, detection):
         # Add extraction paths if available.
         extraction_key = f"{detection['start_time']}_{detection['end_time']}"
+        is_predicted = detection.pop("is_predicted_for_location_and_date", None)
         audio_file_path = self.extracted_audio_paths.get(extraction_key, None)
         if audio_file_path:
             detection["extracted_audio_path"] = audio_file_path
@@ -128,6 +214,8 @@ class RecordingBase:
         )
         if spectrogram_file_path:
             detection["extracted_spectrogram_path"] = spectrogram_file_path
+        if is_predicted is not None:
+            detection["is_predicted_for_location_and_date"] = is_predicted
 
         return detection
 
@@ -145,33 +233,82 @@ class RecordingBase:
         }
         return {"path": self.path, "config": config, "detections": self.detections}
 
-    def process_audio_data(self, rate):
+    def process_audio_data(self, rate, resize_in_place=False):
         # Split audio into 3-second chunks
 
         # Split signal with overlap
         seconds = self.sample_secs
         minlen = 1.5
 
-        chunks = []
-        for i in range(0, len(self.ndarray), int((seconds - self.overlap) * rate)):
-            split = self.ndarray[i : i + int(seconds * rate)]
+        chunk_size = int(seconds * rate)
+        step = int((seconds - self.overlap) * rate)
+
+        signal = self.ndarray
+        if signal.dtype != np.float32:
+            signal = signal.astype("float32")
+            resize_in_place = True
+        length = len(signal)
 
-            # End of signal?
-            if len(split) < int(minlen * rate):
-                break
+        # Every chunk starting at least minlen seconds before the end of signal is analyzed.
+        count = len(range(0, length - int(minlen * rate) + 1, step))
 
-            # Signal chunk too short? Fill with zeros.
-            if len(split) < int(rate * seconds):
-                temp = np.zeros((int(rate * seconds)))
-                temp[: len(split)] = split
-                split = temp
+        # Signal chunk too short? Fill with zeros.
+        padded_length = (count - 1) * step + chunk_size if count else 0
+        if padded_length > length:
+            signal = return_padded_signal(signal, padded_length, resize_in_place)
 
-            chunks.append(split)
+        if count:
+            # Chunks are a read-only strided view of the signal rather than copies.
+            windows = np.lib.stride_tricks.sliding_window_view(signal, chunk_size)
+            self.chunks = windows[::step][:count]
+        else:
+            self.chunks = np.zeros((0, chunk_size), dtype="float32")
 
-        self.chunks = chunks
+        # Keep the unpadded signal for extraction.
+        self.ndarray = signal[:length]
 
         print("read_audio_data: complete, read ", str(len(self.chunks)), "chunks.")
 
+    def share_audio_data(self, recording):
+        # Use the audio already read by another recording of the same file (e.g. for a second analyzer),
+        # rather than decoding it again. Chunks are shared too if the overlap matches.
+        if recording.ndarray is None or recording.streaming or self.streaming:
+            return
+        self.ndarray = recording.ndarray
+        self.duration = recording.duration
+        if recording.overlap == self.overlap and recording.chunks is not None:
+            self.chunks = recording.chunks
+        else:
+            self.process_audio_data(SAMPLE_RATE)
+        self.audio_shared = True
+
+    def iter_chunks(self):
+        # Yields 3-second chunks, from memory or streamed from the source.
+        if self.streaming:
+            return self.stream_chunks()
+        return iter(self.chunks)
+
+    def iter_chunk_batches(self, batch_size=1):
+        # Yields [n, samples] float32 arrays of up to batch_size consecutive chunks.
+        if not self.streaming:
+            for i in range(0, len(self.chunks), batch_size):
+                yield self.chunks[i : i + batch_size]
+            return
+
+        batch = []
+        for chunk in self.stream_chunks():
+            batch.append(chunk)
+            if len(batch) == batch_size:
+                yield np.stack(batch)
+                batch = []
+        if batch:
+            yield np.stack(batch)
+
+    def stream_chunks(self):
+        raise NotImplementedError(
+            f"{self.__class__.__name__} objects do not support streaming."
+        )
+
     def get_extract_array(self, start_sec, end_sec):
         # Returns ndarray trimmed for start_sec:end_sec
         return self.ndarray[start_sec * SAMPLE_RATE : end_sec * SAMPLE_RATE]
@@ -227,10 +364,25 @@ class RecordingBase:
             extraction_key = f"{detection['start_time']}_{detection['end_time']}"
             self.extracted_audio_paths[extraction_key] = path
 
+        # Detections now include the extracted paths.
+        self._detections_cache = None
+
     def extract_detections_as_spectrogram(
-        self, directory, padding_secs=0, min_conf=0.0, top=14000, format="jpg", dpi=144
+        self,
+        directory,
+        padding_secs=0,
+        min_conf=0.0,
+        top=14000,
+        format="jpg",
+        dpi=144,
+        renderer="figure",
+        workers=1,
     ):
+        # Spectrograms are computed in batches by a SpectrogramEngine. renderer="figure" draws
+        # them with axes and a title on a matplotlib figure at dpi; renderer="image" writes plain
+        # images (much faster, dpi is ignored).
         self.extracted_spectrogram_paths = {}  # Clear paths before extraction.
+        segments = {}  # path: (audio, title), one per extracted span.
         for detection in self.detections:
             # Skip if detection is under min_conf parameter.
             # Useful for reducing the number of extracted detections.
@@ -248,15 +400,12 @@ class RecordingBase:
                 else self.duration
             )
 
-            extract_array = self.get_extract_array(start_sec, end_sec)
-
             path = f"{directory}/{self.filestem}_{start_sec}s-{end_sec}s.{format}"
-            plt.specgram(extract_array, Fs=SAMPLE_RATE)
-            plt.ylim(top=top)
-            plt.ylabel("frequency kHz")
-            plt.title(f"{self.filename} ({start_sec}s - {end_sec}s)", fontsize=10)
-            plt.savefig(path, dpi=dpi)
-            plt.close()
+            if path not in segments:
+                segments[path] = (
+                    self.get_extract_array(start_sec, end_sec),
+                    f"{self.filename} ({start_sec}s - {end_sec}s)",
+                )
 
             # Save path for detections list.
             extraction_spectrogram_key = (
@@ -264,6 +413,18 @@ class RecordingBase:
             )
             self.extracted_spectrogram_paths[extraction_spectrogram_key] = path
 
+        engine = SpectrogramEngine(
+            sample_rate=SAMPLE_RATE, top=top, renderer=renderer, dpi=dpi, workers=workers
+        )
+        engine.write(
+            [audio for audio, _ in segments.values()],
+            list(segments),
+            titles=[title for _, title in segments.values()],
+        )
+
+        # Detections now include the extracted paths.
+        self._detections_cache = None
+
 
 class Recording(RecordingBase):
     def __init__(
@@ -278,6 +439,10 @@ class Recording(RecordingBase):
         min_conf=0.1,
         overlap=0.0,
         return_all_detections=False,
+        streaming=False,
+        scores_path=None,
+        scores_dtype="float16",
+        cache=None,
     ):
         self.path = path
         p = Path(self.path)
@@ -293,6 +458,22 @@ class Recording(RecordingBase):
             overlap,
             return_all_detections,
         )
+        # In streaming mode, chunks are read from the file as they are analyzed.
+        self.streaming = streaming
+        self.streaming_block_secs = 60
+        # If set, the full score matrix is saved here during analysis (Analyzer only).
+        self.scores_path = scores_path
+        self.scores_dtype = scores_dtype
+        self.cache = cache
+
+    def analyze_from_scores(self):
+        # Rebuild detections from the scores saved by a previous analysis, with the current
+        # min_conf, location and species list; the audio is not read and no inference is run.
+        if not self.scores_path:
+            raise ValueError("analyze_from_scores requires a scores_path.")
+        self.set_week_48()
+        self.analyzer.analyze_scores(self)
+        self.analyzed = True
 
     @property
     def filename(self):
@@ -300,6 +481,10 @@ class Recording(RecordingBase):
 
     def read_audio_data(self):
         print("read_audio_data")
+        if self.streaming:
+            self.read_audio_duration()
+            return
+
         # Open file with librosa (uses ffmpeg or libav)
         try:
             self.ndarray, rate = librosa.load(
@@ -316,10 +501,56 @@ class Recording(RecordingBase):
             print(e)
             raise AudioFormatError("Generic audio read error occurred from librosa.")
 
-        self.process_audio_data(rate)
+        self.process_audio_data(rate, resize_in_place=True)
+
+    def read_audio_duration(self):
+        # Set the file duration (does not read full audio into memory)
+        try:
+            self.duration = librosa.get_duration(filename=self.path)
+        except audioread.exceptions.NoBackendError as e:
+            print(e)
+            raise AudioFormatError("Audio format could not be opened.")
+        except FileNotFoundError as e:
+            print(e)
+            raise e
+        except BaseException as e:
+            print(e)
+            raise AudioFormatError("Generic audio read error occurred from librosa.")
+
+    def stream_chunks(self):
+        # Only one block of audio (plus the carried-over overlap) is held in memory at a time.
+        blocks = read_audio_blocks(
+            self.path, block_duration=self.streaming_block_secs, sr=SAMPLE_RATE
+        )
+        return split_audio_blocks(
+            blocks, SAMPLE_RATE, seconds=self.sample_secs, overlap=self.overlap
+        )
+
+    def get_extract_array(self, start_sec, end_sec):
+        if not self.streaming and self.ndarray is not None:
+            return super().get_extract_array(start_sec, end_sec)
+
+        # Only read the requested span from the file, e.g. when streaming or when the results
+        # were restored from a cache without reading the audio.
+        audio_chunk, _ = librosa.load(
+            self.path,
+            sr=SAMPLE_RATE,
+            mono=True,
+            offset=start_sec,
+            duration=(end_sec - start_sec),
+            res_type="kaiser_fast",
+        )
+        return audio_chunk
 
 
 class RecordingBuffer(RecordingBase):
+    """
+    An in-memory array of samples at any rate, e.g. as read by wavutils.bufferwavs.
+
+    Integer PCM is scaled to [-1, 1], multichannel [n, channels] arrays are downmixed and other
+    rates are resampled to 48 kHz before the audio is split into chunks.
+    """
+
     def __init__(
         self,
         analyzer,
@@ -353,9 +584,258 @@ class RecordingBuffer(RecordingBase):
         return "buffer"
 
     def read_audio_data(self):
-        self.ndarray = self.buffer
-        self.duration = len(self.ndarray) / self.rate
-        self.process_audio_data(self.rate)
+        self.ndarray = return_resampled_audio(self.buffer, self.rate, SAMPLE_RATE)
+        self.duration = len(self.buffer) / self.rate
+        # The converted audio is a new array unless the buffer was already usable as is.
+        self.process_audio_data(
+            SAMPLE_RATE, resize_in_place=self.ndarray is not self.buffer
+        )
+
+
+class RecordingStream(RecordingBase):
+    """
+    Live audio, written in blocks of any size with write() (e.g. as it arrives from a socket).
+
+    Blocks are converted as for RecordingBuffer (integer PCM is scaled, channels are downmixed
+    and other rates are resampled to 48 kHz). Samples are kept in a float32 ring buffer of
+    buffer_secs seconds. Each call to analyze() analyzes the 3-second windows completed since
+    the previous call, and detections holds the detections of those windows, with times
+    relative to the start of the stream. Windows start every sample_secs - overlap seconds.
+
+    When the buffer is full, write() waits for analyze() to free space (overflow="block"), or
+    drops the oldest windows that have not been analyzed yet (overflow="drop").
+    """
+
+    def __init__(
+        self,
+        analyzer,
+        rate=SAMPLE_RATE,
+        week_48=-1,
+        date=None,
+        sensitivity=1.0,
+        lat=None,
+        lon=None,
+        min_conf=0.1,
+        overlap=0.0,
+        return_all_detections=False,
+        buffer_secs=60,
+        overflow="block",
+    ):
+        super().__init__(
+            analyzer,
+            week_48,
+            date,
+            sensitivity,
+            lat,
+            lon,
+            min_conf,
+            overlap,
+            return_all_detections,
+        )
+        if overflow not in ("block", "drop"):
+            raise ValueError("overflow must be 'block' or 'drop'.")
+        self.rate = rate
+        self.resampler = None
+        if rate != SAMPLE_RATE:
+            self.resampler = StreamingResampler(rate, SAMPLE_RATE)
+        self.streaming = True
+        self.overflow = overflow
+        self.window_size = int(self.sample_secs * SAMPLE_RATE)
+        self.window_step = int((self.sample_secs - self.overlap) * SAMPLE_RATE)
+        self.ring = np.zeros(
+            max(int(buffer_secs * SAMPLE_RATE), self.window_size + self.window_step),
+            dtype="float32",
+        )
+        self.samples_written = 0
+        self.next_window = 0  # Index of the next window to analyze.
+        self.first_window = 0  # Index of the first window of the last analysis.
+        self.closed = False
+        self.condition = threading.Condition()
+
+        # Metrics, see return_metrics.
+        self.windows_analyzed = 0
+        self.windows_dropped = 0
+        self.window_ready_times = deque()  # (window index, time the window was complete)
+        self.latencies = deque(maxlen=1000)
+
+    @property
+    def filename(self):
+        return "stream"
+
+    def read_audio_data(self):
+        pass
+
+    def return_ready_windows(self):
+        # Number of windows that can be analyzed now; after close(), the last windows are padded.
+        length = self.samples_written
+        if self.closed:
+            length -= int(1.5 * SAMPLE_RATE) - self.window_size
+        return max(0, (length - self.window_size) // self.window_step + 1 - self.next_window)
+
+    def write(self, samples, timeout=None):
+        if self.closed:
+            raise ValueError("Can not write to a closed RecordingStream.")
+        samples = return_float32_audio(samples)
+        if self.resampler is not None:
+            samples = self.resampler.process(samples)
+        self.write_samples(samples, timeout)
+
+    def write_samples(self, samples, timeout=None):
+        # Copy 48 kHz float32 samples into the ring buffer.
+        with self.condition:
+            if self.closed:
+                raise ValueError("Can not write to a closed RecordingStream.")
+            while len(samples):
+                if self.closed:
+                    # Cancelled while waiting for buffer space.
+                    raise ValueError("Can not write to a closed RecordingStream.")
+                # Samples before the start of the next window are no longer needed.
+                free = len(self.ring) - (
+                    self.samples_written - self.next_window * self.window_step
+                )
+                if free == 0:
+                    if self.overflow == "drop":
+                        self.next_window += 1
+                        self.windows_dropped += 1
+                        self.pop_window_ready_times()
+                        continue
+                    # Wake the analysis of the windows written so far, then wait for space.
+                    self.condition.notify_all()
+                    if not self.condition.wait_for(
+                        lambda: self.samples_written
+                        - self.next_window * self.window_step
+                        < len(self.ring)
+                        or self.closed,
+                        timeout,
+                    ):
+                        raise TimeoutError("RecordingStream buffer is full.")
+                    continue
+
+                start = self.samples_written % len(self.ring)
+                count = min(free, len(samples), len(self.ring) - start)
+                self.ring[start : start + count] = samples[:count]
+                samples = samples[count:]
+                self.samples_written += count
+
+                # Record when each window is complete, for the latency metrics.
+                completed = (self.samples_written - self.window_size) // self.window_step + 1
+                first = (
+                    self.window_ready_times[-1][0] + 1
+                    if self.window_ready_times
+                    else self.next_window
+                )
+                now = time.monotonic()
+                for window in range(max(first, self.next_window), completed):
+                    self.window_ready_times.append((window, now))
+            self.duration = self.samples_written / SAMPLE_RATE
+            self.condition.notify_all()
+
+    def close(self):
+        # No more samples; the remaining audio is analyzed by the next analyze() call.
+        if self.resampler is not None and not self.closed:
+            self.write_samples(self.resampler.flush())
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def cancel(self):
+        # Close the stream without analyzing the remaining audio, e.g. when analysis failed.
+        # Writers waiting for buffer space raise ValueError.
+        with self.condition:
+            self.closed = True
+            self.next_window += self.return_ready_windows()
+            self.pop_window_ready_times()
+            self.condition.notify_all()
+
+    def wait_for_windows(self, timeout=None):
+        # Wait until windows are ready to analyze. Returns False once the stream is closed and
+        # fully analyzed (or on timeout).
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: self.return_ready_windows() or self.closed, timeout
+            ) and bool(self.return_ready_windows())
+
+    def pop_window_ready_times(self):
+        # Remove and return the ready times of the windows before next_window.
+        ready_times = []
+        while (
+            self.window_ready_times
+            and self.window_ready_times[0][0] < self.next_window
+        ):
+            ready_times.append(self.window_ready_times.popleft())
+        return ready_times
+
+    def stream_chunks(self):
+        # Yields the consecutive windows that were ready when analysis started, freeing buffer
+        # space as it goes.
+        with self.condition:
+            count = self.return_ready_windows()
+            self.first_window = self.next_window
+            self.pop_window_ready_times()
+        for i in range(count):
+            with self.condition:
+                if self.next_window != self.first_window + i:
+                    # Windows were dropped meanwhile; the rest is analyzed by the next call.
+                    return
+                start = (self.next_window * self.window_step) % len(self.ring)
+                length = min(
+                    self.window_size,
+                    self.samples_written - self.next_window * self.window_step,
+                )
+                window = np.zeros(self.window_size, dtype="float32")
+                head = min(length, len(self.ring) - start)
+                window[:head] = self.ring[start : start + head]
+                window[head:length] = self.ring[: length - head]
+                self.next_window += 1
+                self.windows_analyzed += 1
+                self.condition.notify_all()
+            yield window
+
+    def analyze(self):
+        self.set_week_48()
+        self.analyzer.analyze_recording(self)
+        self.analyzed = True
+        offset = self.first_window * self.window_step / SAMPLE_RATE
+
+        # Detection times are relative to the analyzed windows; shift them to stream time.
+        detection_list = self.detection_list
+        if isinstance(detection_list, DetectionList):
+            self.detection_list = DetectionList(
+                detection_list.start_times + offset,
+                detection_list.end_times + offset,
+                detection_list.label_indices,
+                detection_list.confidences,
+                detection_list.labels,
+                detection_list.label_names,
+            )
+        else:
+            for detection in detection_list:
+                detection.start_time += offset
+                detection.end_time += offset
+
+        now = time.monotonic()
+        with self.condition:
+            for window, ready_time in self.pop_window_ready_times():
+                self.latencies.append(now - ready_time)
+
+    def return_metrics(self):
+        # Latencies (in seconds, over the last 1000 windows) run from a window being complete to
+        # its detections being available.
+        with self.condition:
+            latencies = np.array(self.latencies)
+            return {
+                "windows_analyzed": self.windows_analyzed,
+                "windows_dropped": self.windows_dropped,
+                "buffered_secs": max(
+                    0, self.samples_written - self.next_window * self.window_step
+                )
+                / SAMPLE_RATE,
+                "mean_latency": float(latencies.mean()) if len(latencies) else None,
+                "p95_latency": float(np.percentile(latencies, 95))
+                if len(latencies)
+                else None,
+                "max_latency": float(latencies.max()) if len(latencies) else None,
+            }
 
 
 class RecordingFileObject(RecordingBase):
@@ -407,7 +887,7 @@ class RecordingFileObject(RecordingBase):
             print(e)
             raise AudioFormatError("Generic audio read error occurred from librosa.")
 
-        self.process_audio_data(rate)
+        self.process_audio_data(rate, resize_in_place=True)
 
 
 class LargeRecording(Recording):
@@ -421,8 +901,11 @@ class LargeRecording(Recording):
         lat=None,
         lon=None,
         min_conf=0.1,
-        overlap=0,
+        overlap=0.0,
         return_all_detections=False,
+        scores_path=None,
+        scores_dtype="float16",
+        cache=None,
     ):
         super().__init__(
             analyzer,
@@ -435,7 +918,13 @@ class LargeRecording(Recording):
             min_conf,
             overlap,
             return_all_detections,
+            streaming=True,
+            scores_path=scores_path,
+            scores_dtype=scores_dtype,
+            cache=cache,
         )
+        # Decode up to 10 minutes of audio at a time.
+        self.streaming_block_secs = 60 * 10
 
     def analyze(self):
         # Check that analyzer is LargeRecordingAnalyzer
@@ -444,57 +933,29 @@ class LargeRecording(Recording):
                 "LargeRecording can only be used with the Analyzer class"
             )
 
-        # Compute date to week_48 format as required by current BirdNET analyzers.
-        # TODO: Add a warning if both a date and week_48 value is provided. Currently, date would override explicit week_48.
-        if self.week_48 != -1:
-            self.week_48 = max(1, min(self.week_48, 48))
+        self.set_week_48()
 
-        if self.date:
-            # Convert date to week_48 format for the Analyzer models.
-            self.week_48 = return_week_48_from_datetime(self.date)
+        if self.cache and self.cache.load(self):
+            self.analyzed = True
+            return
 
         # Set the file duration (does not read full audio into memory)
         # NOTE: This is the first opportunity for LR to read the file, so check for errors.
-        try:
-            self.duration = librosa.get_duration(filename=self.path)
-        except audioread.exceptions.NoBackendError as e:
-            print(e)
-            raise AudioFormatError("Audio format could not be opened.")
-        except FileNotFoundError as e:
-            print(e)
-            raise e
-        except BaseException as e:
-            print(e)
-            raise AudioFormatError("Generic audio read error occurred from librosa.")
-
-        # TODO: overlay is currently incompatible with LargeRecording. Implement this feature.
+        self.read_audio_duration()
 
         # Analyze, though do not read the file all at once.
+        # Overlapping windows are carried across decoded blocks by stream_chunks.
         self.analyzer.analyze_recording(self)
         self.analyzed = True
 
+        if self.cache:
+            self.cache.save(self)
+
     def extract_embeddings(self):
         self.analyzer.extract_embeddings_for_recording(self)
         self.embeddings_list = self.analyzer.embeddings
         self.embeddings_extracted = True
 
-    def get_extract_array(self, start_sec, end_sec):
-        # Returns ndarray trimmed for start_sec:end_sec
-        print(start_sec, end_sec)
-        sr = SAMPLE_RATE
-        audio_chunk, _ = librosa.load(
-            self.path,
-            sr=sr,
-            mono=True,
-            offset=start_sec,
-            duration=(end_sec - start_sec),
-            res_type="kaiser_fast",
-        )
-
-        return audio_chunk
-
-        # return self.ndarray[start_sec * SAMPLE_RATE : end_sec * SAMPLE_RATE]
-
 
 class MultiProcessRecording(RecordingBase):
     def __init__(
@@ -514,11 +975,14 @@ class MultiProcessRecording(RecordingBase):
         min_conf = results.get("config", {}).get("minimum_confidence", 0.1)
         overlap = results.get("config", {}).get("overlap", 0.1)
 
-        Analyzer = namedtuple("Analyzer", ["model_name", "custom_species_list"])
+        Analyzer = namedtuple(
+            "Analyzer", ["model_name", "custom_species_list", "custom_species_set"]
+        )
 
         analyzer = Analyzer(
             model_name=results.get("config", {}).get("model_name"),
             custom_species_list=[],
+            custom_species_set=frozenset(),
         )
 
         super().__init__(
@@ -576,15 +1040,23 @@ class MultiProcessRecording(RecordingBase):
         )
 
     def extract_detections_as_spectrogram(
-        self, directory, padding_secs=0, min_conf=0, top=14000, format="jpg", dpi=144
+        self,
+        directory,
+        padding_secs=0,
+        min_conf=0,
+        top=14000,
+        format="jpg",
+        dpi=144,
+        renderer="figure",
+        workers=1,
     ):
         if self.ndarray is None:
             self.read_audio_data()
         return super().extract_detections_as_spectrogram(
-            directory, padding_secs, min_conf, top, format, dpi
+            directory, padding_secs, min_conf, top, format, dpi, renderer, workers
         )
 
-    def process_audio_data(self, rate):
+    def process_audio_data(self, rate, resize_in_place=False):
         raise NotImplementedError(
             "MultiProcessRecording objects can not be re-processed from this interface."
         )
@@ -595,11 +1067,232 @@ class MultiProcessRecording(RecordingBase):
         )
 
 
+class DetectionTable:
+    # Columnar detections: one row per detection, stored as NumPy arrays.
+    # Paths and labels are stored once and referenced by index.
+    def __init__(
+        self,
+        start_times,
+        end_times,
+        label_indices,
+        confidences,
+        labels,
+        label_names=None,
+        paths=None,
+        path_indices=None,
+        is_predicted=None,
+    ):
+        self.start_times = np.asarray(start_times, dtype="float64")
+        self.end_times = np.asarray(end_times, dtype="float64")
+        self.label_indices = np.asarray(label_indices, dtype="int32")
+        self.confidences = np.asarray(confidences)
+        self.labels = labels
+        if label_names is None:
+            label_names = [tuple((label.split("_") * 2)[:2]) for label in labels]
+        self.label_names = label_names
+        self.paths = paths if paths is not None else [None]
+        if path_indices is None:
+            path_indices = np.zeros(len(self.label_indices), dtype="int32")
+        self.path_indices = np.asarray(path_indices, dtype="int32")
+        self.is_predicted = (
+            np.asarray(is_predicted, dtype=bool) if is_predicted is not None else None
+        )
+
+    def __len__(self):
+        return len(self.label_indices)
+
+    @classmethod
+    def from_detections(
+        cls,
+        detections,
+        minimum_confidence=0.0,
+        allow_set=frozenset(),
+        return_all_detections=False,
+        path=None,
+    ):
+        # Build a table from Detection objects, applying the same filtering as RecordingBase.
+        labels = {}
+        label_names = []
+        rows = []
+        for d in detections:
+            if d.confidence <= minimum_confidence:
+                continue
+            detection = d.as_dict
+            label = f"{detection['scientific_name']}_{detection['common_name']}"
+            is_allowed = label in allow_set
+            if not return_all_detections and len(allow_set) > 0 and not is_allowed:
+                continue
+            if detection["label"] not in labels:
+                labels[detection["label"]] = len(labels)
+                label_names.append(
+                    (detection["scientific_name"], detection["common_name"])
+                )
+            rows.append(
+                (
+                    detection["start_time"],
+                    detection["end_time"],
+                    labels[detection["label"]],
+                    detection["confidence"],
+                    is_allowed,
+                )
+            )
+        columns = list(zip(*rows)) or [[]] * 5
+        return cls(
+            start_times=columns[0],
+            end_times=columns[1],
+            label_indices=columns[2],
+            confidences=np.asarray(columns[3], dtype="float64"),
+            labels=list(labels),
+            label_names=label_names,
+            paths=[path],
+            is_predicted=columns[4] if return_all_detections else None,
+        )
+
+    @classmethod
+    def concatenate(cls, tables):
+        # Combine tables (e.g. one per file) into one, merging their path and label lists.
+        tables = list(tables)
+        paths = []
+        path_indices = []
+        labels = tables[0].labels if tables else []
+        label_names = tables[0].label_names if tables else []
+        shared_labels = all(t.labels is labels for t in tables)
+        label_lookup = {}
+        label_indices = []
+        if not shared_labels:
+            labels = []
+            label_names = []
+        for t in tables:
+            path_indices.append(t.path_indices + len(paths))
+            paths.extend(t.paths)
+            if shared_labels:
+                label_indices.append(t.label_indices)
+                continue
+            remap = np.zeros(len(t.labels), dtype="int32")
+            for i, label in enumerate(t.labels):
+                if label not in label_lookup:
+                    label_lookup[label] = len(labels)
+                    labels.append(label)
+                    label_names.append(t.label_names[i])
+                remap[i] = label_lookup[label]
+            label_indices.append(remap[t.label_indices])
+
+        def concat(arrays, dtype):
+            return np.concatenate(arrays) if arrays else np.zeros(0, dtype=dtype)
+
+        has_is_predicted = tables and all(t.is_predicted is not None for t in tables)
+        return cls(
+            start_times=concat([t.start_times for t in tables], "float64"),
+            end_times=concat([t.end_times for t in tables], "float64"),
+            label_indices=concat(label_indices, "int32"),
+            confidences=concat([t.confidences for t in tables], "float32"),
+            labels=labels,
+            label_names=label_names,
+            paths=paths or [None],
+            path_indices=concat(path_indices, "int32"),
+            is_predicted=concat([t.is_predicted for t in tables], bool)
+            if has_is_predicted
+            else None,
+        )
+
+    def as_dicts(self):
+        # Detections in the format returned by Recording.detections.
+        labels = self.labels
+        label_names = self.label_names
+        detections = []
+        for start_time, end_time, label_index, confidence in zip(
+            self.start_times.tolist(),
+            self.end_times.tolist(),
+            self.label_indices.tolist(),
+            self.confidences.tolist(),
+        ):
+            scientific_name, common_name = label_names[label_index]
+            detections.append(
+                {
+                    "common_name": common_name,
+                    "scientific_name": scientific_name,
+                    "start_time": start_time,
+                    "end_time": end_time,
+                    "confidence": confidence,
+                    "label": labels[label_index],
+                }
+            )
+        if self.is_predicted is not None:
+            for detection, is_predicted in zip(detections, self.is_predicted.tolist()):
+                detection["is_predicted_for_location_and_date"] = is_predicted
+        return detections
+
+    def to_arrow(self):
+        # pyarrow.Table; numeric columns are wrapped without copying.
+        # Paths and labels are dictionary-encoded.
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("DetectionTable.to_arrow requires pyarrow.")
+
+        label_indices = pa.array(self.label_indices)
+        columns = {
+            "path": pa.DictionaryArray.from_arrays(
+                pa.array(self.path_indices), pa.array(self.paths, type=pa.string())
+            ),
+            "start_time": pa.array(self.start_times),
+            "end_time": pa.array(self.end_times),
+            "scientific_name": pa.DictionaryArray.from_arrays(
+                label_indices, pa.array([i[0] for i in self.label_names], type=pa.string())
+            ),
+            "common_name": pa.DictionaryArray.from_arrays(
+                label_indices, pa.array([i[1] for i in self.label_names], type=pa.string())
+            ),
+            "label": pa.DictionaryArray.from_arrays(
+                label_indices, pa.array(self.labels, type=pa.string())
+            ),
+            "confidence": pa.array(self.confidences),
+        }
+        if self.is_predicted is not None:
+            columns["is_predicted_for_location_and_date"] = pa.array(self.is_predicted)
+        return pa.table(columns)
+
+    def to_parquet(self, path, **kwargs):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("DetectionTable.to_parquet requires pyarrow.")
+        pq.write_table(self.to_arrow(), path, **kwargs)
+
+    def to_csv(self, path):
+        header = [
+            "path",
+            "start_time",
+            "end_time",
+            "scientific_name",
+            "common_name",
+            "label",
+            "confidence",
+        ]
+        columns = [
+            [self.paths[i] for i in self.path_indices.tolist()],
+            self.start_times.tolist(),
+            self.end_times.tolist(),
+            [self.label_names[i][0] for i in self.label_indices.tolist()],
+            [self.label_names[i][1] for i in self.label_indices.tolist()],
+            [self.labels[i] for i in self.label_indices.tolist()],
+            self.confidences.tolist(),
+        ]
+        if self.is_predicted is not None:
+            header.append("is_predicted_for_location_and_date")
+            columns.append(self.is_predicted.tolist())
+        with open(path, "w", newline="") as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(header)
+            writer.writerows(zip(*columns))
+
+
 class Detection:
     def __init__(self, start_time, end_time, data):
         self.data = data or []
         self.start_time = start_time
         self.end_time = end_time
+        self._result_names = None
 
     @property
     def result(self):
@@ -612,13 +1305,21 @@ class Detection:
             return confidence.item()
         return confidence
 
+    @property
+    def result_names(self):
+        # Split the "Scientific name_Common name" result once.
+        result = self.result
+        if self._result_names is None or self._result_names[0] != result:
+            self._result_names = (result, result.split("_"))
+        return self._result_names[1]
+
     @property
     def scientific_name(self):
-        return self.result.split("_")[0]
+        return self.result_names[0]
 
     @property
     def common_name(self):
-        return self.result.split("_")[1]
+        return self.result_names[1]
 
     @property
     def as_dict(self):
@@ -0,0 +1,731 @@
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from birdnetlib.analyzer import LOCATION_FILTER_THRESHOLD
+from birdnetlib.exceptions import AudioFormatError, QuotaExceededError
+from birdnetlib.main import SAMPLE_RATE, DetectionTable, RecordingStream
+from birdnetlib.utils import return_scores_above_threshold
+from birdnetlib.wavutils import bufferwavs
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class _StreamReaderFile:
+    """
+    Blocking file-like view of an asyncio StreamReader, so bufferwavs can parse a connection in
+    a worker thread. Reads are run on the event loop. The body is optionally limited to length
+    bytes, or decoded from HTTP chunked transfer encoding.
+    """
+
+    def __init__(self, reader, loop, prefix=b"", length=None, chunked=False):
+        self.reader = reader
+        self.loop = loop
+        self.prefix = prefix
+        self.remaining = length
+        self.chunked = chunked
+        self.chunk_remaining = 0
+        self.eof = False
+
+    def read(self, n):
+        if self.prefix:
+            data, self.prefix = self.prefix[:n], self.prefix[n:]
+            return data
+        if self.eof or n <= 0:
+            return b""
+        return asyncio.run_coroutine_threadsafe(self._read(n), self.loop).result()
+
+    async def _read(self, n):
+        if self.chunked:
+            if self.chunk_remaining == 0:
+                size = (await self.reader.readline()).split(b";")[0].strip()
+                self.chunk_remaining = int(size or b"0", 16)
+                if self.chunk_remaining == 0:
+                    # Last chunk; skip any trailer headers.
+                    while (await self.reader.readline()).strip():
+                        pass
+                    self.eof = True
+                    return b""
+            data = await self.reader.read(min(n, self.chunk_remaining))
+            self.chunk_remaining -= len(data)
+            if self.chunk_remaining == 0:
+                await self.reader.readline()  # CRLF after the chunk data
+        elif self.remaining is not None:
+            data = await self.reader.read(min(n, self.remaining))
+            self.remaining -= len(data)
+            if self.remaining == 0:
+                self.eof = True
+        else:
+            data = await self.reader.read(n)
+        if not data:
+            self.eof = True
+        return data
+
+
+class _Batcher:
+    """
+    Groups the windows submitted by all clients into batched calls to a pool of analyzers.
+
+    A batch is started as soon as an analyzer is idle and windows are waiting, and is filled with
+    the windows that arrive within max_batch_delay seconds, up to max_batch_size. While every
+    analyzer is busy, windows queue up, so batches grow with the load.
+    """
+
+    def __init__(self, analyzers, max_batch_size=32, max_batch_delay=0.05):
+        self.analyzers = analyzers
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_batch_delay = max_batch_delay
+        self.executor = ThreadPoolExecutor(
+            max_workers=len(analyzers), thread_name_prefix="birdnetlib-analyzer"
+        )
+        self.queue = None
+        self.idle = None
+        self.carried = None  # Item that did not fit in the previous batch.
+        self.task = None
+        self.batch_tasks = set()
+        self.batch_sizes = deque(maxlen=1000)
+        self.windows_analyzed = 0
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.idle = asyncio.Queue()
+        for analyzer in self.analyzers:
+            self.idle.put_nowait(analyzer)
+        self.task = asyncio.ensure_future(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, *self.batch_tasks, return_exceptions=True)
+            self.task = None
+            while not self.queue.empty():
+                self.queue.get_nowait()[1].cancel()
+        self.executor.shutdown(wait=False)
+
+    async def predict(self, windows):
+        # Returns the [n, labels] scores of a [n, samples] array of windows.
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((windows, future))
+        return await future
+
+    async def get(self, timeout=None):
+        # Next item that is still wanted (its client may have disconnected meanwhile).
+        while True:
+            if self.carried is not None:
+                item, self.carried = self.carried, None
+            elif timeout is None:
+                item = await self.queue.get()
+            elif timeout <= 0:
+                item = self.queue.get_nowait()
+            else:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            if not item[1].done():
+                return item
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            analyzer = await self.idle.get()
+            items = [await self.get()]
+            count = len(items[0][0])
+            deadline = loop.time() + self.max_batch_delay
+            while count < self.max_batch_size:
+                try:
+                    item = await self.get(deadline - loop.time())
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                if count + len(item[0]) > self.max_batch_size:
+                    self.carried = item
+                    break
+                items.append(item)
+                count += len(item[0])
+            task = asyncio.ensure_future(self.run_batch(analyzer, items))
+            self.batch_tasks.add(task)
+            task.add_done_callback(self.batch_tasks.discard)
+
+    async def run_batch(self, analyzer, items):
+        loop = asyncio.get_running_loop()
+        try:
+            windows = np.concatenate([windows for windows, _ in items])
+            scores = await loop.run_in_executor(
+                self.executor, self.predict_batch, analyzer, windows
+            )
+        except Exception as error:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(error)
+        else:
+            self.batch_sizes.append(len(windows))
+            self.windows_analyzed += len(windows)
+            start = 0
+            for windows, future in items:
+                if not future.done():
+                    future.set_result(scores[start : start + len(windows)])
+                start += len(windows)
+        finally:
+            self.idle.put_nowait(analyzer)
+
+    def predict_batch(self, analyzer, windows):
+        # Batches are padded to a power of two, so each interpreter only sees a few input shapes
+        # and rarely has to reallocate its tensors.
+        count = len(windows)
+        size = min(1 << (count - 1).bit_length(), max(self.max_batch_size, count))
+        if size > count:
+            windows = np.concatenate(
+                [windows, np.zeros((size - count, windows.shape[1]), dtype="float32")]
+            )
+        if analyzer.use_custom_classifier:
+            scores = analyzer.predict_with_custom_classifier_batch(windows)
+        else:
+            scores = analyzer.predict_batch(windows)
+        return np.asarray(scores, dtype="float32")[:count]
+
+
+class _ClientSession:
+    # The audio stream, species filter and quota of one connection.
+
+    def __init__(
+        self,
+        server,
+        week_48=-1,
+        date=None,
+        lat=None,
+        lon=None,
+        min_conf=0.1,
+        overlap=0.0,
+        return_all_detections=False,
+    ):
+        self.server = server
+        self.config = {
+            "week_48": week_48,
+            "date": date,
+            "lat": lat,
+            "lon": lon,
+            "min_conf": min_conf,
+            "overlap": overlap,
+            "return_all_detections": return_all_detections,
+        }
+        self.recording = None
+        self.label_mask = None
+        self.pending_windows = 0
+        self.detection_count = 0
+        self.latencies = deque(maxlen=1000)
+
+        # Token bucket of audio seconds, refilled at client_quota seconds per second.
+        self.quota_tokens = server.client_quota_burst
+        self.quota_time = time.monotonic()
+
+    def set_species_filter(self):
+        # Labels allowed for the session's location and week, or the analyzers' custom list.
+        analyzer = self.server.analyzers[0]
+        recording = self.recording
+        if analyzer.has_custom_species_list and recording.lon and recording.lat:
+            raise ValueError(
+                "Recording lon/lat should not be used in conjunction with a custom species list or path."
+            )
+        if recording.lon and recording.lat and analyzer.classifier_model_path is None:
+            allow_set = frozenset(
+                analyzer.species_class.return_list_for_analyzer(
+                    lat=recording.lat,
+                    lon=recording.lon,
+                    week_48=recording.week_48,
+                    threshold=LOCATION_FILTER_THRESHOLD,
+                )
+            )
+        elif analyzer.has_custom_species_list:
+            allow_set = frozenset(analyzer.custom_species_list)
+        else:
+            allow_set = frozenset()
+        if allow_set:
+            self.label_mask = np.fromiter(
+                (label in allow_set for label in analyzer.labels),
+                dtype=bool,
+                count=len(analyzer.labels),
+            )
+
+    def check_quota(self, seconds):
+        quota = self.server.client_quota
+        if quota is None:
+            return
+        now = time.monotonic()
+        self.quota_tokens = min(
+            self.server.client_quota_burst,
+            self.quota_tokens + (now - self.quota_time) * quota,
+        )
+        self.quota_time = now
+        self.quota_tokens -= seconds
+        if self.quota_tokens < 0:
+            raise QuotaExceededError(
+                f"Client exceeded its quota of {quota} seconds of audio per second."
+            )
+
+    def iter_windows(self, f):
+        """
+        Parse the WAV stream from f and yield (first window index, [n, samples] windows) as soon
+        as windows are complete. Runs in a worker thread.
+        """
+        for rate, data in bufferwavs(f, stream_block_duration=self.server.block_duration):
+            if self.recording is None:
+                self.recording = RecordingStream(
+                    self.server.analyzers[0],
+                    rate=rate,
+                    week_48=self.config["week_48"],
+                    date=self.config["date"],
+                    lat=self.config["lat"],
+                    lon=self.config["lon"],
+                    min_conf=self.config["min_conf"],
+                    overlap=self.config["overlap"],
+                    return_all_detections=self.config["return_all_detections"],
+                )
+                self.recording.set_week_48()
+                self.set_species_filter()
+            elif rate != self.recording.rate:
+                raise AudioFormatError(
+                    f"Sample rate changed from {self.recording.rate} to {rate} within a stream."
+                )
+
+            # Write a second at a time, so the ring buffer never fills up.
+            for i in range(0, len(data), rate):
+                block = data[i : i + rate]
+                self.check_quota(len(block) / rate)
+                self.recording.write(block)
+                windows = list(self.recording.stream_chunks())
+                if windows:
+                    yield self.recording.first_window, np.stack(windows)
+
+        if self.recording is not None:
+            # Pad and analyze the final partial window, as for Recording.
+            self.recording.close()
+            windows = list(self.recording.stream_chunks())
+            if windows:
+                yield self.recording.first_window, np.stack(windows)
+
+    def return_detections(self, first_window, scores):
+        # Detection dicts for the scores of consecutive windows, in the format of Recording.detections.
+        recording = self.recording
+        analyzer = self.server.analyzers[0]
+        chunk_indices, label_indices, confidences = return_scores_above_threshold(
+            scores, recording.minimum_confidence
+        )
+        qualified = confidences.astype("float64") > recording.minimum_confidence
+        allowed = None
+        if self.label_mask is not None:
+            allowed = self.label_mask[label_indices]
+            if not recording.return_all_detections:
+                qualified &= allowed
+        indices = np.flatnonzero(qualified)
+        start_times = (
+            (first_window + chunk_indices[indices]) * recording.window_step / SAMPLE_RATE
+        )
+        is_predicted = None
+        if recording.return_all_detections:
+            is_predicted = (
+                allowed[indices]
+                if allowed is not None
+                else np.zeros(len(indices), dtype=bool)
+            )
+        table = DetectionTable(
+            start_times=start_times,
+            end_times=start_times + recording.sample_secs,
+            label_indices=label_indices[indices],
+            confidences=confidences[indices],
+            labels=analyzer.labels,
+            label_names=analyzer.label_names,
+            is_predicted=is_predicted,
+        )
+        self.detection_count += len(table)
+        return table.as_dicts()
+
+    def return_metrics(self):
+        latencies = np.array(self.latencies)
+        return {
+            "duration": self.recording.duration if self.recording else 0.0,
+            "windows_analyzed": self.recording.windows_analyzed if self.recording else 0,
+            "detections": self.detection_count,
+            "mean_latency": float(latencies.mean()) if len(latencies) else None,
+            "max_latency": float(latencies.max()) if len(latencies) else None,
+        }
+
+
+class AnalysisServer:
+    """
+    asyncio server that analyzes WAV streams from many clients with a shared pool of analyzers.
+
+    Clients send one or more WAVs (or a WAV with a streaming data size, e.g. from arecord) over a
+    raw TCP connection, and receive a JSON line per detection as soon as each 3-second window has
+    been analyzed. Alternatively, POST the audio to /analyze, with optional lat, lon, date,
+    week_48, min_conf and overlap query parameters, and receive the detections and metrics as a
+    JSON object once the upload ends. GET /metrics returns the server metrics.
+
+    The windows of all clients are grouped into batched interpreter calls (see max_batch_size and
+    max_batch_delay). Latency is bounded by admission control: at most max_clients connections
+    are served (others are refused), at most max_pending_windows windows (and client_max_pending
+    per client) wait for analysis before the server stops reading from the sockets, and clients
+    sending more than client_quota seconds of audio per second (with bursts of up to
+    client_quota_burst seconds) are disconnected with a QuotaExceededError.
+
+    :param analyzers: Analyzer, or list of Analyzer instances with the same model and labels.
+        Each analyzer runs one batch at a time, in its own thread.
+    :param host: Address to listen on. Use "0.0.0.0" to accept connections from other hosts.
+    :param port: Port to listen on (0 picks a free port, see the port attribute after start).
+    """
+
+    def __init__(
+        self,
+        analyzers=[],
+        host="127.0.0.1",
+        port=9988,
+        week_48=-1,
+        date=None,
+        lat=None,
+        lon=None,
+        min_conf=0.1,
+        overlap=0.0,
+        max_batch_size=32,
+        max_batch_delay=0.05,
+        max_clients=64,
+        max_pending_windows=None,
+        client_max_pending=None,
+        client_quota=None,
+        client_quota_burst=60.0,
+        block_duration=0.5,
+    ):
+        if not isinstance(analyzers, (list, tuple)):
+            analyzers = [analyzers]
+        if len(analyzers) > 0:
+            self.analyzers = list(analyzers)
+        else:
+            from birdnetlib.analyzer import Analyzer
+
+            self.analyzers = [Analyzer()]
+        self.host = host
+        self.port = port
+
+        # Default configuration of TCP clients; HTTP clients can override it per request.
+        self.week_48 = week_48
+        self.date = date
+        self.lat = lat
+        self.lon = lon
+        self.min_conf = min_conf
+        self.overlap = overlap
+
+        self.batcher = _Batcher(self.analyzers, max_batch_size, max_batch_delay)
+        self.max_clients = max_clients
+        self.max_pending_windows = max_pending_windows or 4 * max_batch_size * len(
+            self.analyzers
+        )
+        self.client_max_pending = client_max_pending or max_batch_size
+        self.client_quota = client_quota
+        self.client_quota_burst = client_quota_burst
+        self.block_duration = block_duration
+
+        # Threads that parse and resample the incoming streams, one per client.
+        self.stream_executor = ThreadPoolExecutor(
+            max_workers=max_clients, thread_name_prefix="birdnetlib-stream"
+        )
+        self.server = None
+        self.capacity = None
+        self.pending_windows = 0
+        self.sessions = set()
+        self.writers = set()
+        self.clients_served = 0
+        self.clients_refused = 0
+        self.latencies = deque(maxlen=1000)
+
+    def on_error(self, session, exception):
+        # Called with errors of a client stream (the client is also sent the error). Override to log them.
+        pass
+
+    async def start(self):
+        self.capacity = asyncio.Condition()
+        self.batcher.start()
+        self.server = await asyncio.start_server(
+            self.handle_connection, self.host, self.port
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            for writer in list(self.writers):
+                writer.close()
+            await self.server.wait_closed()
+            self.server = None
+        await self.batcher.stop()
+        self.stream_executor.shutdown(wait=False)
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    def run(self):
+        # Serve until interrupted.
+        try:
+            asyncio.run(self.serve_forever())
+        except KeyboardInterrupt:
+            pass
+
+    def return_metrics(self):
+        batch_sizes = np.array(self.batcher.batch_sizes)
+        latencies = np.array(self.latencies)
+        return {
+            "clients_active": len(self.sessions),
+            "clients_served": self.clients_served,
+            "clients_refused": self.clients_refused,
+            "pending_windows": self.pending_windows,
+            "windows_analyzed": self.batcher.windows_analyzed,
+            "mean_batch_size": float(batch_sizes.mean()) if len(batch_sizes) else None,
+            "mean_latency": float(latencies.mean()) if len(latencies) else None,
+            "p95_latency": float(np.percentile(latencies, 95))
+            if len(latencies)
+            else None,
+            "max_latency": float(latencies.max()) if len(latencies) else None,
+        }
+
+    async def handle_connection(self, reader, writer):
+        self.writers.add(writer)
+        try:
+            try:
+                head = await reader.readexactly(4)
+            except asyncio.IncompleteReadError as error:
+                head = error.partial
+            if head in (b"POST", b"GET "):
+                await self.handle_http(head, reader, writer)
+            else:
+                await self.handle_tcp(head, reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.writers.discard(writer)
+            if not reader.at_eof() and not writer.is_closing():
+                # The response was sent before the client finished sending (e.g. a refusal or an
+                # error). Read the rest for a moment, so closing does not reset the connection
+                # before the client has read the response.
+                try:
+                    writer.write_eof()
+                    await asyncio.wait_for(self.discard_input(reader), 1.0)
+                except (ConnectionError, OSError, asyncio.TimeoutError):
+                    pass
+            writer.close()
+
+    async def discard_input(self, reader):
+        while await reader.read(64 * 1024):
+            pass
+
+    async def handle_tcp(self, head, reader, writer):
+        async def on_detections(detections):
+            writer.write(
+                "".join(json.dumps(detection) + "\n" for detection in detections).encode()
+            )
+            await writer.drain()
+
+        if len(self.sessions) >= self.max_clients:
+            self.clients_refused += 1
+            await on_detections([{"error": "Server busy."}])
+            return
+
+        session = _ClientSession(
+            self,
+            week_48=self.week_48,
+            date=self.date,
+            lat=self.lat,
+            lon=self.lon,
+            min_conf=self.min_conf,
+            overlap=self.overlap,
+        )
+        f = _StreamReaderFile(reader, asyncio.get_running_loop(), prefix=head)
+        try:
+            await self.analyze_stream(session, f, on_detections)
+        except ConnectionError:
+            raise
+        except Exception as error:
+            self.on_error(session, error)
+            await on_detections([{"error": str(error)}])
+
+    async def handle_http(self, head, reader, writer):
+        async def respond(status, body):
+            content = json.dumps(body).encode()
+            writer.write(
+                (
+                    f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(content)}\r\n"
+                    "Connection: close\r\n\r\n"
+                ).encode()
+                + content
+            )
+            await writer.drain()
+
+        request = (head + await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+        request_line, *header_lines = request.split("\r\n")
+        method, target = request_line.split(" ")[:2]
+        headers = {}
+        for line in header_lines:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        url = urlsplit(target)
+
+        if method == "GET" and url.path == "/metrics":
+            await respond(200, self.return_metrics())
+            return
+        if method != "POST" or url.path != "/analyze":
+            await respond(404, {"error": "Not found."})
+            return
+        if len(self.sessions) >= self.max_clients:
+            self.clients_refused += 1
+            await respond(503, {"error": "Server busy."})
+            return
+
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            session = _ClientSession(
+                self,
+                week_48=int(params.get("week_48", self.week_48)),
+                date=datetime.fromisoformat(params["date"])
+                if "date" in params
+                else self.date,
+                lat=float(params["lat"]) if "lat" in params else self.lat,
+                lon=float(params["lon"]) if "lon" in params else self.lon,
+                min_conf=float(params.get("min_conf", self.min_conf)),
+                overlap=float(params.get("overlap", self.overlap)),
+            )
+        except ValueError as error:
+            await respond(400, {"error": str(error)})
+            return
+
+        if headers.get("expect", "").lower() == "100-continue":
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        f = _StreamReaderFile(
+            reader,
+            asyncio.get_running_loop(),
+            length=int(headers["content-length"])
+            if "content-length" in headers
+            else None,
+            chunked="chunked" in headers.get("transfer-encoding", "").lower(),
+        )
+        detections = []
+
+        async def on_detections(window_detections):
+            detections.extend(window_detections)
+
+        try:
+            await self.analyze_stream(session, f, on_detections)
+        except ConnectionError:
+            raise
+        except QuotaExceededError as error:
+            self.on_error(session, error)
+            await respond(429, {"error": str(error)})
+        except (AudioFormatError, ValueError) as error:
+            self.on_error(session, error)
+            await respond(400, {"error": str(error)})
+        except Exception as error:
+            self.on_error(session, error)
+            await respond(500, {"error": str(error)})
+        else:
+            await respond(
+                200, {"detections": detections, "metrics": session.return_metrics()}
+            )
+
+    async def analyze_stream(self, session, f, on_detections):
+        """
+        Analyze the WAV stream of a client, passing the detections of each group of windows to
+        on_detections (a coroutine function) in stream order.
+        """
+        loop = asyncio.get_running_loop()
+        self.sessions.add(session)
+        self.clients_served += 1
+        windows_iter = session.iter_windows(f)
+        results = asyncio.Queue()
+        emitter = asyncio.ensure_future(self.emit_results(session, results, on_detections))
+        error = None
+        try:
+            while not emitter.done():
+                try:
+                    item = await loop.run_in_executor(
+                        self.stream_executor, next, windows_iter, None
+                    )
+                except Exception as exception:
+                    # Send the detections of the windows received so far before failing.
+                    error = exception
+                    break
+                if item is None:
+                    break
+                first_window, windows = item
+                ready_time = time.monotonic()
+                await self.acquire_capacity(session, len(windows))
+                prediction = asyncio.ensure_future(self.batcher.predict(windows))
+                results.put_nowait((first_window, len(windows), ready_time, prediction))
+            results.put_nowait(None)
+            await emitter
+            if error is not None:
+                raise error
+        finally:
+            self.sessions.discard(session)
+            if not emitter.done():
+                emitter.cancel()
+            # Cancel the windows that were not analyzed, and free their capacity.
+            while not results.empty():
+                item = results.get_nowait()
+                if item is not None:
+                    item[3].cancel()
+                    await self.release_capacity(session, item[1])
+            try:
+                windows_iter.close()
+            except ValueError:
+                # Still running in its thread (the connection was dropped); it ends with the stream.
+                pass
+
+    async def emit_results(self, session, results, on_detections):
+        while True:
+            item = await results.get()
+            if item is None:
+                return
+            first_window, count, ready_time, prediction = item
+            try:
+                scores = await prediction
+            finally:
+                await self.release_capacity(session, count)
+            await on_detections(session.return_detections(first_window, scores))
+            latency = time.monotonic() - ready_time
+            session.latencies.append(latency)
+            self.latencies.append(latency)
+
+    async def acquire_capacity(self, session, count):
+        # Wait until the client and the server can queue count more windows (or have none queued).
+        async with self.capacity:
+            await self.capacity.wait_for(
+                lambda: (
+                    session.pending_windows == 0
+                    or session.pending_windows + count <= self.client_max_pending
+                )
+                and (
+                    self.pending_windows == 0
+                    or self.pending_windows + count <= self.max_pending_windows
+                )
+            )
+            session.pending_windows += count
+            self.pending_windows += count
+
+    async def release_capacity(self, session, count):
+        async with self.capacity:
+            session.pending_windows -= count
+            self.pending_windows -= count
+            self.capacity.notify_all()
@@ -1,12 +1,14 @@
 import os
-
-try:
-    import tflite_runtime.interpreter as tflite
-except:
-    from tensorflow import lite as tflite
+import threading
 
 import numpy as np
-from birdnetlib.utils import return_week_48_from_datetime
+from birdnetlib.utils import (
+    ScoreWriter,
+    load_interpreter,
+    load_scores,
+    return_dequantized_scores,
+    return_week_48_from_datetime,
+)
 
 
 SPECIES_MODEL_PATH = os.path.join(
@@ -17,9 +19,33 @@ LABEL_PATH = os.path.join(
     os.path.dirname(__file__), "models/analyzer/BirdNET_GLOBAL_6K_V2.4_Labels.txt"
 )
 
+# SpeciesList and SpeciesGrid instances shared by all analyzers in a process.
+_shared_species_classes = {}
+_shared_species_classes_lock = threading.Lock()
+
+
+def return_shared_species_class(
+    num_threads=1, use_xnnpack=True, species_grid_path=None, species_grid_mode="snap"
+):
+    # Load the species list model (or grid) on first use, once per process and configuration.
+    if species_grid_path:
+        key = (os.getpid(), "grid", species_grid_path, species_grid_mode)
+    else:
+        key = (os.getpid(), "model", num_threads, use_xnnpack)
+    with _shared_species_classes_lock:
+        if key not in _shared_species_classes:
+            if species_grid_path:
+                species_class = SpeciesGrid(species_grid_path, mode=species_grid_mode)
+            else:
+                species_class = SpeciesList(
+                    num_threads=num_threads, use_xnnpack=use_xnnpack
+                )
+            _shared_species_classes[key] = species_class
+        return _shared_species_classes[key]
+
 
 class SpeciesList:
-    def __init__(self):
+    def __init__(self, num_threads=1, use_xnnpack=True, delegates=None):
         self.lon = None
         self.lat = None
         self.date = None
@@ -31,11 +57,20 @@ class SpeciesList:
         self.load_labels()
 
         # Model init
+        self.num_threads = num_threads
+        self.use_xnnpack = use_xnnpack
+        self.delegates = delegates
         self.meta_interpreter = None
         self.meta_input_details = None
         self.meta_output_details = None
         self.meta_input_layer_index = None
         self.meta_output_layer_index = None
+        self.meta_input_shape = None
+        # The interpreter can be shared by analyzers in several threads.
+        self.lock = threading.Lock()
+
+        # Largest number of locations passed to the meta model in one invocation.
+        self.max_batch_size = 1024
 
         self.load_species_list_model()
 
@@ -43,37 +78,37 @@ class SpeciesList:
         # Returns the list in the format preferred by BirdNET Analyzers.
         # ['Haemorhous mexicanus_House Finch', 'Aphelocoma californica_California Scrub-Jay']
 
-        self.lon = lon
-        self.lat = lat
-        self.date = date
-        self.week_48 = week_48
-        self.threshold = threshold
-
         # Compute date to week_48 format as required by current BirdNET analyzers.
         # TODO: Add a warning if both a date and week_48 value is provided. Currently, date would override explicit week_48.
-        if self.week_48 != -1:
-            self.week_48 = max(1, min(self.week_48, 48))
+        if week_48 != -1:
+            week_48 = max(1, min(week_48, 48))
 
-        if self.date:
+        if date:
             # Convert date to week_48 format for the Analyzer models.
-            self.week_48 = return_week_48_from_datetime(self.date)
+            week_48 = return_week_48_from_datetime(date)
 
-        print(self.week_48)
+        print(week_48)
 
         sample = np.expand_dims(
             np.array(
-                [self.lat, self.lon, self.week_48],
+                [lat, lon, week_48],
                 dtype="float32",
             ),
             0,
         )
-        self.meta_interpreter.set_tensor(self.meta_input_layer_index, sample)
-        self.meta_interpreter.invoke()
+        l_filter = self.predict_batch(sample)[0]
 
-        l_filter = self.meta_interpreter.get_tensor(self.meta_output_layer_index)[0]
+        # The query above only uses local variables, so lists for different locations can be
+        # requested from several threads at once; the last query is recorded for callers.
+        with self.lock:
+            self.lon = lon
+            self.lat = lat
+            self.date = date
+            self.week_48 = week_48
+            self.threshold = threshold
 
         # Apply thresho ld
-        l_filter = np.where(l_filter >= self.threshold, l_filter, 0)
+        l_filter = np.where(l_filter >= threshold, l_filter, 0)
 
         # Zip with labels
         l_filter = list(zip(l_filter, self.labels))
@@ -84,7 +119,7 @@ class SpeciesList:
         species_list = []
 
         for s in l_filter:
-            if s[0] >= self.threshold:
+            if s[0] >= threshold:
                 split_name = s[1].split("_")
                 item = {
                     "scientific_name": split_name[0],
@@ -96,13 +131,59 @@ class SpeciesList:
         print(len(species_list), "species loaded.")
         return species_list
 
+    def return_lists_batch(self, coords, weeks=-1, threshold=0.3, return_indices=False):
+        # Predict species lists for many locations at once.
+        # coords is a sequence of (lat, lon) pairs; weeks is a single week_48 value or one per
+        # location (-1 for the whole year). Returns a boolean [locations, labels] mask over
+        # self.labels, or, with return_indices, an array of label indices per location, sorted
+        # by score (highest first) like return_list.
+        coords = np.asarray(coords, dtype="float32").reshape(-1, 2)
+        weeks = np.broadcast_to(np.asarray(weeks, dtype="float32"), (len(coords),))
+        weeks = np.where(weeks != -1, np.clip(weeks, 1, 48), weeks)
+
+        samples = np.column_stack([coords, weeks]).astype("float32")
+        mask = np.zeros((len(samples), len(self.labels)), dtype=bool)
+        indices = []
+        for start in range(0, len(samples), self.max_batch_size):
+            scores = self.predict_batch(samples[start : start + self.max_batch_size])
+            mask[start : start + len(scores)] = scores >= threshold
+            if return_indices:
+                for row, row_mask in zip(scores, mask[start : start + len(scores)]):
+                    selected = np.flatnonzero(row_mask)
+                    indices.append(selected[np.argsort(-row[selected], kind="stable")])
+
+        if return_indices:
+            return indices
+        return mask
+
+    def predict_batch(self, samples):
+        # Pass a [n, 3] batch of (lat, lon, week_48) samples through the meta model.
+        samples = np.ascontiguousarray(samples, dtype="float32")
+        with self.lock:
+            self.set_input_shape(samples.shape)
+            self.meta_interpreter.set_tensor(self.meta_input_layer_index, samples)
+            self.meta_interpreter.invoke()
+            return self.meta_interpreter.get_tensor(self.meta_output_layer_index)
+
+    def set_input_shape(self, shape):
+        # Only resize and re-allocate the tensors when the batch shape changes.
+        shape = tuple(shape)
+        if shape != self.meta_input_shape:
+            self.meta_interpreter.resize_tensor_input(
+                self.meta_input_layer_index, list(shape)
+            )
+            self.meta_interpreter.allocate_tensors()
+            self.meta_input_shape = shape
+
     def load_species_list_model(self):
         print("load_species_list_model")
 
         model_path = SPECIES_MODEL_PATH
-        num_threads = 1  # Default from BN-A config
-        self.meta_interpreter = tflite.Interpreter(
-            model_path=model_path, num_threads=num_threads
+        self.meta_interpreter = load_interpreter(
+            model_path,
+            num_threads=self.num_threads,
+            use_xnnpack=self.use_xnnpack,
+            delegates=self.delegates,
         )
         self.meta_interpreter.allocate_tensors()
 
@@ -113,6 +194,7 @@ class SpeciesList:
         # Get input tensor index
         self.meta_input_layer_index = self.meta_input_details[0]["index"]
         self.meta_output_layer_index = self.meta_output_details[0]["index"]
+        self.meta_input_shape = tuple(self.meta_input_details[0]["shape"])
 
         print("Meta model loaded.")
 
@@ -133,3 +215,164 @@ class SpeciesList:
         )
         species_split = [f'{i["scientific_name"]}_{i["common_name"]}' for i in species]
         return species_split
+
+
+class SpeciesGrid:
+    """
+    SpeciesList scores precomputed on a lat/lon grid for every week, memory-mapped from disk.
+
+    Looking up a species list does not invoke the model, and processes that open the same grid
+    share its pages. Create the grid once with SpeciesGrid.create. Coordinates are snapped to the
+    nearest grid point, or with mode="interpolate" the scores of the four surrounding points are
+    interpolated bilinearly.
+
+    :param path: Path to a grid written by SpeciesGrid.create.
+    :param mode: "snap" or "interpolate".
+    """
+
+    def __init__(self, path, mode="snap"):
+        if mode not in ("snap", "interpolate"):
+            raise ValueError("SpeciesGrid mode must be 'snap' or 'interpolate'.")
+        self.path = path
+        self.mode = mode
+        self._scores = None
+        metadata = self.load_grid()
+        self.labels = metadata["labels"]
+        self.dtype = metadata["dtype"]
+        self.lat_min = metadata["lat_min"]
+        self.lon_min = metadata["lon_min"]
+        self.step = metadata["step"]
+
+    @classmethod
+    def create(
+        cls,
+        path,
+        lat_range=(-90, 90),
+        lon_range=(-180, 180),
+        step=1.0,
+        dtype="uint8",
+        species=None,
+    ):
+        """
+        Compute the scores of every label for each grid point and week, and save them to path.
+
+        The grid has one slice for the whole year (week_48=-1) and one for each of the 48 weeks,
+        so its size is 49 * lat points * lon points * labels bytes for uint8 (about 20 GB for the
+        whole world at 1 degree). Limit lat_range and lon_range to the area of interest.
+        """
+        species = species or SpeciesList()
+        lats = np.linspace(
+            lat_range[0],
+            lat_range[1],
+            int(round((lat_range[1] - lat_range[0]) / step)) + 1,
+            dtype="float32",
+        )
+        lons = np.linspace(
+            lon_range[0],
+            lon_range[1],
+            int(round((lon_range[1] - lon_range[0]) / step)) + 1,
+            dtype="float32",
+        )
+        points = np.stack(np.meshgrid(lats, lons, indexing="ij"), axis=-1).reshape(-1, 2)
+
+        writer = ScoreWriter(path, dtype)
+        for week_48 in [-1] + list(range(1, 49)):
+            print("SpeciesGrid week", week_48)
+            samples = np.column_stack(
+                [points, np.full(len(points), week_48, dtype="float32")]
+            )
+            for start in range(0, len(samples), species.max_batch_size):
+                writer.append(
+                    species.predict_batch(samples[start : start + species.max_batch_size])
+                )
+        writer.close(
+            labels=species.labels,
+            lat_min=float(lats[0]),
+            lon_min=float(lons[0]),
+            step=float(step),
+            lat_count=len(lats),
+            lon_count=len(lons),
+        )
+        return cls(path)
+
+    def __getstate__(self):
+        # Reopen the memmap after unpickling rather than copying the scores.
+        state = self.__dict__.copy()
+        state["_scores"] = None
+        return state
+
+    def load_grid(self):
+        scores, metadata = load_scores(self.path)
+        # [weeks, lats, lons, labels]; week index 0 is the whole year.
+        self._scores = scores.reshape(
+            49, metadata["lat_count"], metadata["lon_count"], len(metadata["labels"])
+        )
+        return metadata
+
+    @property
+    def scores(self):
+        if self._scores is None:
+            self.load_grid()
+        return self._scores
+
+    @property
+    def lat_count(self):
+        return self.scores.shape[1]
+
+    @property
+    def lon_count(self):
+        return self.scores.shape[2]
+
+    def return_scores(self, lat, lon, week_48=-1):
+        # Scores of every label at lat/lon for week_48 (-1 for the whole year).
+        week_index = 0 if week_48 == -1 else max(1, min(week_48, 48))
+        lat_position = (lat - self.lat_min) / self.step
+        lon_position = (lon - self.lon_min) / self.step
+        if not (
+            -0.5 <= lat_position <= self.lat_count - 0.5
+            and -0.5 <= lon_position <= self.lon_count - 0.5
+        ):
+            raise ValueError(f"lat/lon {lat}, {lon} is outside of the species grid.")
+
+        week_scores = self.scores[week_index]
+        if self.mode == "snap":
+            i = min(int(round(lat_position)), self.lat_count - 1)
+            j = min(int(round(lon_position)), self.lon_count - 1)
+            return return_dequantized_scores(week_scores[i, j], self.dtype)
+
+        i = min(max(int(np.floor(lat_position)), 0), max(self.lat_count - 2, 0))
+        j = min(max(int(np.floor(lon_position)), 0), max(self.lon_count - 2, 0))
+        di = min(max(lat_position - i, 0.0), 1.0)
+        dj = min(max(lon_position - j, 0.0), 1.0)
+        corners = return_dequantized_scores(week_scores[i : i + 2, j : j + 2], self.dtype)
+        weights = np.outer([1 - di, di][: corners.shape[0]], [1 - dj, dj][: corners.shape[1]])
+        return np.tensordot(weights / weights.sum(), corners, axes=2).astype("float32")
+
+    def return_list(self, lon=None, lat=None, date=None, week_48=-1, threshold=0.3):
+        # Same format as SpeciesList.return_list.
+        if date:
+            week_48 = return_week_48_from_datetime(date)
+        scores = self.return_scores(lat, lon, week_48)
+        selected = np.flatnonzero(scores >= threshold)
+        selected = selected[np.argsort(-scores[selected], kind="stable")]
+
+        species_list = []
+        for i in selected:
+            split_name = self.labels[i].split("_")
+            species_list.append(
+                {
+                    "scientific_name": split_name[0],
+                    "common_name": split_name[1],
+                    "threshold": scores[i],
+                }
+            )
+        print(len(species_list), "species loaded.")
+        return species_list
+
+    def return_list_for_analyzer(
+        self, lon=None, lat=None, date=None, week_48=-1, threshold=0.3
+    ):
+        species = self.return_list(
+            lon=lon, lat=lat, date=date, week_48=week_48, threshold=threshold
+        )
+        return [f'{i["scientific_name"]}_{i["common_name"]}' for i in species]
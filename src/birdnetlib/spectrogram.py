@@ -0,0 +1,246 @@
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    from scipy import fft as _fft
+except ImportError:
+    _fft = np.fft
+
+SAMPLE_RATE = 48000
+
+# Viridis (matplotlib's default colormap) at 9 evenly spaced points, interpolated to 256 colors.
+VIRIDIS_POINTS = [
+    (68, 1, 84),
+    (72, 40, 120),
+    (62, 73, 137),
+    (49, 104, 142),
+    (38, 130, 142),
+    (31, 158, 137),
+    (53, 183, 121),
+    (110, 206, 88),
+    (253, 231, 37),
+]
+
+
+def return_colormap_lut(cmap=None):
+    """
+    Return a [256, 3] uint8 color lookup table.
+
+    :param cmap: None for the built-in viridis table, a matplotlib colormap name (requires
+        matplotlib), or a [n, 3] array of RGB colors (0-255) that is interpolated to 256 colors.
+    """
+    if isinstance(cmap, str):
+        try:
+            import matplotlib
+        except ImportError:
+            raise ImportError("Colormaps by name require matplotlib.")
+        colors = matplotlib.colormaps[cmap](np.linspace(0, 1, 256))[:, :3] * 255
+    else:
+        colors = np.asarray(VIRIDIS_POINTS if cmap is None else cmap, dtype="float64")
+    positions = np.linspace(0, 1, len(colors))
+    steps = np.linspace(0, 1, 256)
+    lut = np.stack(
+        [np.interp(steps, positions, colors[:, channel]) for channel in range(3)], axis=1
+    )
+    return np.round(lut).astype("uint8")
+
+
+def write_png(path, pixels, palette=None, compress_level=1):
+    """
+    Write an image as an 8-bit PNG, without an imaging library.
+
+    :param pixels: [height, width, 3] uint8 RGB array, or [height, width] uint8 palette indices.
+    :param palette: [256, 3] uint8 colors of the palette indices.
+    """
+    height, width = pixels.shape[:2]
+    channels = 3 if pixels.ndim == 3 else 1
+    rows = np.zeros((height, width * channels + 1), dtype="uint8")  # Filter type 0 per row.
+    rows[:, 1:] = pixels.reshape(height, width * channels)
+
+    def chunk(chunk_type, data):
+        return (
+            struct.pack(">I", len(data))
+            + chunk_type
+            + data
+            + struct.pack(">I", zlib.crc32(chunk_type + data))
+        )
+
+    color_type = 2 if channels == 3 else 3
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(
+            chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0))
+        )
+        if color_type == 3:
+            f.write(chunk(b"PLTE", np.asarray(palette, dtype="uint8").tobytes()))
+        f.write(chunk(b"IDAT", zlib.compress(rows.tobytes(), compress_level)))
+        f.write(chunk(b"IEND", b""))
+
+
+class SpectrogramEngine:
+    """
+    Computes and writes the spectrograms of many audio segments (e.g. detections) at once.
+
+    The STFTs of segments of the same length are computed together, in batches of batch_size,
+    as a strided view of frames through one FFT call. Spectra are power spectral densities in dB,
+    as returned by matplotlib's specgram (Hann window of nfft samples, noverlap samples overlap),
+    cropped to frequencies up to top.
+
+    With renderer="image", each spectrogram is mapped through a color lookup table straight to
+    an image (low frequencies at the bottom, one column per frame, stretched to height pixels).
+    PNG files are written without an imaging library; other formats require Pillow. With
+    renderer="figure", each spectrogram is drawn with axes and a title on a matplotlib Agg figure
+    (without pyplot) and saved at dpi.
+
+    No global state is used, so engines can be used from several threads; workers sets the number
+    of threads used by write.
+    """
+
+    def __init__(
+        self,
+        sample_rate=SAMPLE_RATE,
+        nfft=256,
+        noverlap=128,
+        top=14000,
+        height=256,
+        cmap=None,
+        renderer="image",
+        dpi=144,
+        batch_size=16,
+        workers=1,
+    ):
+        if renderer not in ("image", "figure"):
+            raise ValueError("renderer must be 'image' or 'figure'.")
+        self.sample_rate = sample_rate
+        self.nfft = nfft
+        self.step = nfft - noverlap
+        self.top = top
+        self.height = height
+        self.cmap = cmap
+        self.lut = return_colormap_lut(cmap) if renderer == "image" else None
+        self.renderer = renderer
+        self.dpi = dpi
+        self.batch_size = max(1, int(batch_size))
+        self.workers = max(1, int(workers))
+
+        self.window = np.hanning(nfft).astype("float32")
+        # PSD scaling of matplotlib's specgram; one-sided bins other than DC and Nyquist are doubled.
+        self.scale = np.full(nfft // 2 + 1, 1.0 / (sample_rate * (self.window**2).sum()))
+        self.scale[1 : (nfft + 1) // 2] *= 2
+        self.freqs = np.fft.rfftfreq(nfft, 1 / sample_rate)
+        self.bins = int(np.searchsorted(self.freqs, top, side="right")) if top else len(self.freqs)
+
+    def return_times(self, length):
+        # Center time of each frame of a segment of length samples.
+        frames = max(1, (length - self.nfft) // self.step + 1)
+        return (np.arange(frames) * self.step + self.nfft / 2) / self.sample_rate
+
+    def compute(self, segments):
+        """
+        Return a list of [bins, frames] float32 arrays of the spectra (in dB) of equal-length
+        segments, computed in one pass.
+        """
+        segments = np.asarray(segments, dtype="float32")
+        if segments.shape[1] < self.nfft:
+            segments = np.pad(segments, ((0, 0), (0, self.nfft - segments.shape[1])))
+        frames = np.lib.stride_tricks.sliding_window_view(segments, self.nfft, axis=1)
+        frames = frames[:, :: self.step] * self.window
+        spectra = _fft.rfft(frames, axis=2)[:, :, : self.bins]
+        power = spectra.real**2 + spectra.imag**2
+        power *= self.scale[: self.bins]
+        db = 10 * np.log10(np.maximum(power, 1e-20), dtype="float32")
+        return list(db.transpose(0, 2, 1))
+
+    def render_indices(self, db):
+        # [height, frames] uint8 color indices, low frequencies at the bottom.
+        vmin, vmax = float(db.min()), float(db.max())
+        indices = ((db - vmin) * (255 / max(vmax - vmin, 1e-6))).astype("uint8")[::-1]
+        if self.height:
+            rows = np.linspace(0, len(indices) - 1, self.height).round().astype(int)
+            indices = indices[rows]
+        return indices
+
+    def render_image(self, db):
+        # [height, frames, 3] uint8 RGB image.
+        return self.lut[self.render_indices(db)]
+
+    def save_image(self, db, path):
+        if path.lower().endswith(".png"):
+            # Palette PNGs are a third of the size of RGB, and compress faster.
+            write_png(path, self.render_indices(db), palette=self.lut)
+            return
+        try:
+            from PIL import Image
+        except ImportError:
+            raise ImportError("Spectrogram formats other than png require Pillow.")
+        Image.fromarray(self.render_image(db)).save(path)
+
+    def save_figure(self, db, path, title=None, length=None):
+        try:
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+        except ImportError:
+            raise ImportError('renderer="figure" requires matplotlib.')
+        times = self.return_times(length or self.nfft)
+        half_step = self.step / self.sample_rate / 2
+        figure = Figure()
+        FigureCanvasAgg(figure)
+        axes = figure.add_subplot()
+        axes.imshow(
+            db,
+            origin="lower",
+            aspect="auto",
+            cmap=self.cmap if isinstance(self.cmap, str) else "viridis",
+            extent=(
+                times[0] - half_step,
+                times[-1] + half_step,
+                self.freqs[0],
+                self.freqs[self.bins - 1],
+            ),
+        )
+        axes.set_ylabel("frequency kHz")
+        if title:
+            axes.set_title(title, fontsize=10)
+        figure.savefig(path, dpi=self.dpi)
+
+    def write_batch(self, segments, paths, titles):
+        for db, path, title, segment in zip(
+            self.compute(segments), paths, titles, segments
+        ):
+            if self.renderer == "figure":
+                self.save_figure(db, path, title, len(segment))
+            else:
+                self.save_image(db, path)
+
+    def write(self, segments, paths, titles=None):
+        """
+        Compute the spectrograms of audio segments and write them to paths.
+
+        :param segments: List of 1D float32 arrays (of any lengths).
+        :param paths: Output path of each segment; the extension sets the image format.
+        :param titles: Optional title of each segment (only drawn by renderer="figure").
+        """
+        if titles is None:
+            titles = [None] * len(paths)
+
+        # Batches of segments with the same length.
+        groups = {}
+        for segment, path, title in zip(segments, paths, titles):
+            groups.setdefault(len(segment), []).append((segment, path, title))
+        batches = []
+        for items in groups.values():
+            for i in range(0, len(items), self.batch_size):
+                batch = items[i : i + self.batch_size]
+                batches.append([list(column) for column in zip(*batch)])
+
+        if self.workers == 1:
+            for batch in batches:
+                self.write_batch(*batch)
+            return
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # Re-raise the first error, if any.
+            for _ in executor.map(lambda batch: self.write_batch(*batch), batches):
+                pass
@@ -0,0 +1,47 @@
+import threading
+
+
+class StreamingAnalyzer:
+    """
+    Analyzes a RecordingStream on a background thread, as soon as each window is complete.
+
+    Write audio to the stream from any thread (e.g. a socket handler); on_analyze_complete is
+    called with the stream after each analysis, and its detections are those of the windows
+    analyzed since the previous call.
+    """
+
+    def __init__(self, recording_stream):
+        self.recording = recording_stream
+        self.thread = None
+
+    def on_analyze_complete(self, recording):
+        pass
+
+    def on_error(self, recording, exception):
+        # If not overridden, raise the exception. Analysis stops and the stream is cancelled,
+        # so writes raise ValueError instead of waiting for buffer space.
+        raise exception
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        # Close the stream and wait for the remaining audio to be analyzed.
+        self.recording.close()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        try:
+            while self.recording.wait_for_windows():
+                try:
+                    self.recording.analyze()
+                    self.on_analyze_complete(self.recording)
+                except BaseException as error:
+                    self.on_error(self.recording, error)
+        except BaseException:
+            # Nothing frees buffer space anymore; don't leave writers blocked.
+            self.recording.cancel()
+            raise
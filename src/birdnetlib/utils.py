@@ -1,6 +1,12 @@
 import calendar
+import functools
+import json
 import math
+import os
+import warnings
+from collections import OrderedDict
 import librosa
+import numpy as np
 
 
 def return_week_48_from_datetime(dt):
@@ -10,39 +16,598 @@ def return_week_48_from_datetime(dt):
     return week_48
 
 
-def read_audio_segments(
-    file_path, chunk_duration=60 * 10, segment_duration=3, sr=48000
-):
+def load_interpreter(model_path, num_threads=1, use_xnnpack=True, delegates=None):
     """
-    Process an audio file, yielding 3-second segments from each 2-minute chunk along with start and end times.
-    Includes the last chunk and segment even if they are shorter than the specified durations.
+    Initialize a TFLite interpreter with the given threading and delegate options.
 
-    :param file_path: Path to the audio file.
-    :param chunk_duration: Duration of each chunk to read (in seconds).
-    :param segment_duration: Duration of each segment to yield (in seconds).
-    :param sr: Sampling rate for audio loading.
-    :return: Yields dictionaries containing segments of audio and their start/end times.
+    :param model_path: Path to the .tflite model.
+    :param num_threads: Number of CPU threads used by the interpreter (None for the runtime default).
+    :param use_xnnpack: Apply the default XNNPACK delegate. Set to False to use the builtin kernels only.
+    :param delegates: Optional list of delegates, or paths to delegate libraries, to apply to the model.
+    :return: tflite Interpreter (tensors are not allocated).
     """
+    try:
+        import tflite_runtime.interpreter as tflite
 
-    chunk_samples = chunk_duration * sr
-    segment_samples = segment_duration * sr
+        load_delegate = tflite.load_delegate
+        resolver_types = tflite.OpResolverType
+    except:
+        from tensorflow import lite as tflite
+
+        load_delegate = tflite.experimental.load_delegate
+        resolver_types = tflite.experimental.OpResolverType
+
+    experimental_delegates = [
+        load_delegate(i) if isinstance(i, str) else i for i in (delegates or [])
+    ]
+
+    if use_xnnpack:
+        op_resolver_type = resolver_types.AUTO
+    else:
+        op_resolver_type = resolver_types.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+
+    return tflite.Interpreter(
+        model_path=model_path,
+        num_threads=num_threads,
+        experimental_delegates=experimental_delegates or None,
+        experimental_op_resolver_type=op_resolver_type,
+    )
+
+
+def return_threads_per_worker(processes=None, num_threads=None, cpu_count=None):
+    """
+    Split the available CPUs between worker processes and interpreter threads so that
+    processes * num_threads does not oversubscribe the machine.
+
+    :param processes: Number of worker processes, or None to derive it from num_threads.
+    :param num_threads: Interpreter threads per worker, or None to derive it from processes. If
+        both are given and processes * num_threads exceeds the CPU count, num_threads is reduced
+        (with a warning).
+    :param cpu_count: Number of available CPUs (defaults to os.cpu_count()).
+    :return: Tuple of (processes, num_threads).
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+
+    if not processes and not num_threads:
+        # Default to one single-threaded worker per CPU, leaving one CPU for the parent process.
+        return max(1, cpu_count - 1), 1
+
+    if not processes:
+        return max(1, cpu_count // num_threads), num_threads
+
+    if not num_threads:
+        return processes, max(1, cpu_count // processes)
+
+    if processes * num_threads > cpu_count:
+        threads = max(1, cpu_count // processes)
+        warnings.warn(
+            f"{processes} processes with {num_threads} threads each would oversubscribe "
+            f"{cpu_count} CPUs; using {threads} threads per process.",
+            RuntimeWarning,
+        )
+        return processes, threads
+
+    return processes, num_threads
+
+
+def return_scores_above_threshold(scores, threshold):
+    """
+    Filter a [chunks, labels] score matrix without building per-label Python objects.
+
+    Entries are ordered by chunk, then by descending score. Ties keep label order, matching a stable
+    sort of each chunk's scores.
+
+    :param scores: 2D array of scores.
+    :param threshold: Minimum score (inclusive) for an entry to be returned.
+    :return: Tuple of (chunk_indices, label_indices, scores) arrays.
+    """
+    scores = np.asarray(scores)
+    chunk_indices, label_indices = np.nonzero(scores >= threshold)
+    values = scores[chunk_indices, label_indices]
+    order = np.lexsort((label_indices, -values, chunk_indices))
+    return chunk_indices[order], label_indices[order], values[order]
+
+
+def return_top_k_scores(scores, k):
+    """
+    Return the k highest scores of each row of a [chunks, labels] score matrix.
+
+    Uses argpartition so only the surviving candidates are sorted. Ties keep label order, matching a
+    stable sort of each row's scores.
+
+    :param scores: 2D array of scores.
+    :param k: Number of entries to return per row.
+    :return: Tuple of (label_indices, scores) arrays, each shaped [chunks, k].
+    """
+    scores = np.asarray(scores)
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        partition = np.argpartition(scores, -k, axis=1)[:, -k:]
+        kth_scores = np.take_along_axis(scores, partition, axis=1).min(
+            axis=1, keepdims=True
+        )
+        # Candidates include every entry tied with the kth score so the tie order is deterministic.
+        candidates = scores >= kth_scores
+    else:
+        candidates = np.ones(scores.shape, dtype=bool)
+
+    chunk_indices, label_indices = np.nonzero(candidates)
+    values = scores[chunk_indices, label_indices]
+    order = np.lexsort((label_indices, -values, chunk_indices))
+    chunk_indices = chunk_indices[order]
+
+    # Keep the first k candidates of every row.
+    row_starts = np.searchsorted(chunk_indices, np.arange(scores.shape[0]))
+    rank = np.arange(len(chunk_indices)) - row_starts[chunk_indices]
+    keep = order[rank < k]
+    return (
+        label_indices[keep].reshape(-1, k),
+        values[keep].reshape(-1, k),
+    )
+
+
+class LRUCache:
+    """
+    Mapping with at most max_size entries; the least recently used entry is removed first.
+
+    get counts cache hits and misses in hits and misses.
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        if key not in self.entries:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def __setitem__(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+
+
+SCORE_DTYPES = ("float32", "float16", "uint8")
+
+
+def return_quantized_scores(scores, dtype):
+    # Sigmoid scores are in [0, 1]; uint8 stores them in steps of 1/255.
+    if dtype == "uint8":
+        return np.round(scores * 255).astype("uint8")
+    return scores.astype(dtype)
+
+
+def return_dequantized_scores(scores, dtype):
+    if dtype == "uint8":
+        return scores.astype("float32") / np.float32(255)
+    return scores.astype("float32")
+
+
+class ScoreWriter:
+    """
+    Write a [chunks, labels] score matrix to disk, one batch of chunks at a time.
+
+    Scores are stored as raw (optionally quantized) values in `path`, with the shape, dtype and
+    any other metadata in `path + ".json"`. Use load_scores to memory-map the matrix.
+    """
+
+    def __init__(self, path, dtype="float16"):
+        if dtype not in SCORE_DTYPES:
+            raise ValueError(f"Score dtype must be one of {', '.join(SCORE_DTYPES)}.")
+        self.path = path
+        self.dtype = dtype
+        self.rows = 0
+        self.columns = 0
+        self.file = open(path, "wb")
+
+    def append(self, scores):
+        return_quantized_scores(np.asarray(scores), self.dtype).tofile(self.file)
+        self.rows += scores.shape[0]
+        self.columns = scores.shape[1]
+
+    def close(self, **metadata):
+        self.file.close()
+        metadata.update({"dtype": self.dtype, "shape": [self.rows, self.columns]})
+        with open(self.path + ".json", "w") as f:
+            json.dump(metadata, f)
+
+
+def load_scores(path):
+    """
+    Load a score matrix written by ScoreWriter.
+
+    :param path: Path to the score file.
+    :return: (scores, metadata); scores is a read-only memmap of the stored (quantized) values.
+    """
+    with open(path + ".json", "r") as f:
+        metadata = json.load(f)
+    shape = tuple(metadata["shape"])
+    if shape[0] == 0:
+        return np.zeros(shape, dtype=metadata["dtype"]), metadata
+    return np.memmap(path, dtype=metadata["dtype"], mode="r", shape=shape), metadata
+
+
+@functools.lru_cache(maxsize=16)
+def _return_resampling_window(up, down):
+    # Same filter as resample_poly's default kaiser window, designed once per rate pair.
+    from scipy.signal import firwin
+
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    window = firwin(2 * half_len + 1, 1.0 / max_rate, window=("kaiser", 5.0))
+    window.flags.writeable = False
+    return window
+
+
+class StreamingResampler:
+    """
+    Polyphase resampler for consecutive blocks of a signal.
+
+    Output is identical to scipy.signal.resample_poly (with a kaiser window) over the concatenated
+    signal. The FIR filter is designed once, and only the input samples within reach of the filter
+    are carried between blocks.
+    """
+
+    def __init__(self, orig_sr, target_sr):
+        g = math.gcd(int(orig_sr), int(target_sr))
+        self.up = int(target_sr) // g
+        self.down = int(orig_sr) // g
+        self.window = _return_resampling_window(self.up, self.down)
+
+        # Number of input samples on either side of an output sample that affect its value.
+        self.reach = (len(self.window) // 2) // self.up + 2
+
+        self.buffer = np.zeros(0, dtype="float32")
+        self.offset = 0  # Input index of buffer[0], always a multiple of self.down.
+        self.input_samples = 0
+        self.output_samples = 0
+
+    def _resample_buffer(self, end):
+        from scipy.signal import resample_poly
 
+        if self.up == self.down:
+            out = self.buffer
+        else:
+            out = resample_poly(self.buffer, self.up, self.down, window=self.window)
+        first = self.output_samples - self.offset * self.up // self.down
+        out = np.asarray(out[first : end - self.offset * self.up // self.down])
+        self.output_samples = max(end, self.output_samples)
+        return out.astype("float32", copy=False)
+
+    def process(self, block):
+        # Returns the resampled output that no longer depends on future input.
+        block = np.asarray(block, dtype="float32")
+        self.buffer = np.concatenate((self.buffer, block))
+        self.input_samples += len(block)
+
+        end = max(0, (self.input_samples - self.reach) * self.up // self.down)
+        if end <= self.output_samples:
+            return np.zeros(0, dtype="float32")
+
+        out = self._resample_buffer(end)
+
+        # Drop input that is out of reach of the next output sample.
+        keep_from = self.output_samples * self.down // self.up - self.reach
+        keep_from = max(self.offset, keep_from - keep_from % self.down)
+        self.buffer = self.buffer[keep_from - self.offset :]
+        self.offset = keep_from
+        return out
+
+    def flush(self):
+        # Returns the remaining output at the end of the signal.
+        end = -(-self.input_samples * self.up // self.down)
+        if end <= self.output_samples:
+            return np.zeros(0, dtype="float32")
+        return self._resample_buffer(end)
+
+
+def return_float32_audio(samples, out=None):
+    """
+    Convert PCM samples to mono float32 audio in the range [-1, 1].
+
+    Integer samples are scaled by their full range (24-bit audio in the upper bytes of int32, as
+    read by wavutils, is scaled correctly), and [n, channels] arrays are downmixed to their mean.
+    The conversion writes directly to a single float32 array; mono float32 input is returned as
+    is unless out is given.
+
+    :param samples: [n] or [n, channels] array of integer or float samples.
+    :param out: Optional float32 array of n samples to write the audio to.
+    :return: [n] float32 array.
+    """
+    samples = np.asarray(samples)
+    if samples.ndim not in (1, 2):
+        raise ValueError("samples must be a [n] or [n, channels] array.")
+    if out is None:
+        if samples.ndim == 1 and samples.dtype == np.float32:
+            return samples
+        out = np.empty(len(samples), dtype="float32")
+
+    channels = 1
+    if samples.ndim == 2:
+        channels = samples.shape[1]
+        np.sum(samples, axis=1, dtype="float32", out=out)
+    else:
+        out[:] = samples
+
+    if samples.dtype.kind == "u":
+        out -= channels * 2.0 ** (samples.dtype.itemsize * 8 - 1)
+    scale = 1.0 / channels
+    if samples.dtype.kind in "iu":
+        scale /= 2.0 ** (samples.dtype.itemsize * 8 - 1)
+    if scale != 1.0:
+        out *= np.float32(scale)
+    return out
+
+
+def return_resampled_audio(samples, orig_sr, target_sr, block_size=480000):
+    """
+    Convert PCM samples to mono float32 audio (see return_float32_audio) at target_sr.
+
+    Blocks of block_size input samples are converted into a reused scratch buffer and passed
+    through a StreamingResampler, which writes straight into the output array. The output is the
+    only full-length allocation, and matches scipy.signal.resample_poly.
+
+    :return: [ceil(n * target_sr / orig_sr)] float32 array.
+    """
+    samples = np.asarray(samples)
+    if int(orig_sr) == int(target_sr):
+        return return_float32_audio(samples)
+
+    resampler = StreamingResampler(orig_sr, target_sr)
+    out = np.empty(
+        -(-len(samples) * resampler.up // resampler.down), dtype="float32"
+    )
+    scratch = np.empty(min(block_size, len(samples)), dtype="float32")
+    position = 0
+    for start in range(0, len(samples), block_size):
+        block = samples[start : start + block_size]
+        block = return_float32_audio(block, out=scratch[: len(block)])
+        resampled = resampler.process(block)
+        out[position : position + len(resampled)] = resampled
+        position += len(resampled)
+    resampled = resampler.flush()
+    out[position : position + len(resampled)] = resampled
+    return out
+
+
+def _rebuffer_blocks(pieces, block_samples):
+    # Regroups consecutive arrays into blocks of exactly block_samples (the last may be shorter).
+    buffer = []
+    buffered = 0
+    for piece in pieces:
+        if not buffered and len(piece) == block_samples:
+            # Already the right size, avoid a copy.
+            yield piece
+            continue
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered < block_samples:
+            continue
+        joined = np.concatenate(buffer)
+        end = 0
+        while end + block_samples <= len(joined):
+            yield joined[end : end + block_samples]
+            end += block_samples
+        buffer = [joined[end:]]
+        buffered = len(joined) - end
+    if buffered:
+        yield np.concatenate(buffer)
+
+
+def _read_soundfile_blocks(file_path, block_duration, sr):
+    # Decodes WAV/FLAC (and any other format supported by libsndfile) in a single pass.
+    import soundfile
+
+    with soundfile.SoundFile(file_path) as f:
+        resampler = None
+        if f.samplerate != sr:
+            resampler = StreamingResampler(f.samplerate, sr)
+
+        for block in f.blocks(
+            blocksize=int(block_duration * f.samplerate),
+            dtype="float32",
+            always_2d=True,
+        ):
+            block = block[:, 0] if block.shape[1] == 1 else block.mean(axis=1)
+            if resampler:
+                block = resampler.process(block)
+            yield block
+
+        if resampler:
+            yield resampler.flush()
+
+
+def _read_ffmpeg_blocks(file_path, block_duration, sr):
+    # Decodes, downmixes and resamples compressed formats with a single ffmpeg process.
+    import subprocess
+
+    process = subprocess.Popen(
+        [
+            "ffmpeg",
+            "-nostdin",
+            "-v",
+            "error",
+            "-i",
+            str(file_path),
+            "-f",
+            "f32le",
+            "-ac",
+            "1",
+            "-ar",
+            str(sr),
+            "pipe:1",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    buffer = bytearray(int(block_duration * sr) * 4)
+    view = memoryview(buffer)
+    try:
+        while True:
+            filled = 0
+            while filled < len(buffer):
+                n = process.stdout.readinto(view[filled:])
+                if not n:
+                    break
+                filled += n
+            filled -= filled % 4
+            if filled:
+                yield np.frombuffer(buffer, dtype="<f4", count=filled // 4).copy()
+            if filled < len(buffer):
+                break
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+        if process.returncode not in (0, -9) and process.stderr:
+            raise ValueError(process.stderr.read().decode(errors="ignore"))
+        process.stderr.close()
+
+
+def _read_librosa_blocks(file_path, block_duration, sr):
+    # Fallback that re-opens the file for every block.
+    block_samples = block_duration * sr
     start_sample = 0
 
     while True:
         try:
-            audio_chunk, _ = librosa.load(
+            audio_block, _ = librosa.load(
                 file_path,
                 sr=sr,
                 mono=True,
                 offset=start_sample / sr,
-                duration=chunk_duration,
+                duration=block_duration,
                 res_type="kaiser_fast",
             )
         except ValueError:
             # Specifically to catch "ValueError: Input signal length=0 is too small to resample"
             break
 
+        if len(audio_block) == 0:
+            break
+
+        yield audio_block
+
+        start_sample += block_samples
+
+        # Break if the last block was shorter than the expected block size
+        if len(audio_block) < block_samples:
+            break
+
+
+def read_audio_blocks(file_path, block_duration=60 * 10, sr=48000):
+    """
+    Read an audio file in consecutive mono blocks, so that the entire file is never loaded into RAM.
+
+    The file is opened and decoded once: with soundfile (libsndfile) where the format is supported,
+    otherwise through a single ffmpeg pipe. If neither is available, each block is loaded separately
+    with librosa.
+
+    :param file_path: Path to the audio file.
+    :param block_duration: Duration of each block to read (in seconds).
+    :param sr: Sampling rate for audio loading.
+    :return: Yields float32 arrays of block_duration * sr samples (the last block may be shorter).
+    """
+
+    block_samples = int(block_duration * sr)
+
+    try:
+        import soundfile
+
+        soundfile.info(str(file_path))
+        pieces = _read_soundfile_blocks(file_path, block_duration, sr)
+    except FileNotFoundError:
+        raise
+    except Exception:
+        # Format not supported by libsndfile (e.g. MP3 with libsndfile < 1.1.0).
+        import shutil
+
+        if shutil.which("ffmpeg"):
+            pieces = _read_ffmpeg_blocks(file_path, block_duration, sr)
+        else:
+            pieces = _read_librosa_blocks(file_path, block_duration, sr)
+
+    for block in _rebuffer_blocks(pieces, block_samples):
+        if len(block):
+            yield block
+
+
+def split_audio_blocks(blocks, rate, seconds=3.0, overlap=0.0, minlen=1.5):
+    """
+    Split consecutive audio blocks into (overlapping) chunks without holding the full signal.
+
+    Chunks match those of RecordingBase.process_audio_data: a chunk starts every (seconds - overlap)
+    seconds, and the final partial chunks with at least minlen seconds of signal are zero-padded.
+    Only the tail of each block that is needed for the next chunk is carried over.
+
+    :param blocks: Iterable of consecutive 1D audio arrays.
+    :param rate: Sampling rate of the blocks.
+    :param seconds: Chunk duration (in seconds).
+    :param overlap: Overlap between chunks (in seconds).
+    :param minlen: Minimum duration of signal in the final chunks (in seconds).
+    :return: Yields float32 arrays of seconds * rate samples.
+    """
+
+    chunk_size = int(seconds * rate)
+    step = int((seconds - overlap) * rate)
+    min_size = int(minlen * rate)
+
+    buffer = np.zeros(0, dtype="float32")
+    # Position of the next chunk start, relative to the start of buffer.
+    position = 0
+
+    for block in blocks:
+        buffer = np.concatenate((buffer[position:], np.asarray(block, dtype="float32")))
+        position = 0
+        while position + chunk_size <= len(buffer):
+            yield buffer[position : position + chunk_size]
+            position += step
+
+    # Zero-pad the remaining chunks with enough signal.
+    while len(buffer) - position >= min_size:
+        chunk = np.zeros(chunk_size, dtype="float32")
+        split = buffer[position : position + chunk_size]
+        chunk[: len(split)] = split
+        yield chunk
+        position += step
+
+
+def read_audio_segments(
+    file_path, chunk_duration=60 * 10, segment_duration=3, sr=48000
+):
+    """
+    Process an audio file, yielding 3-second segments from each 2-minute chunk along with start and end times.
+    Includes the last chunk and segment even if they are shorter than the specified durations.
+
+    :param file_path: Path to the audio file.
+    :param chunk_duration: Duration of each chunk to read (in seconds).
+    :param segment_duration: Duration of each segment to yield (in seconds).
+    :param sr: Sampling rate for audio loading.
+    :return: Yields dictionaries containing segments of audio and their start/end times.
+    """
+
+    chunk_samples = chunk_duration * sr
+    segment_samples = segment_duration * sr
+
+    start_sample = 0
+
+    for audio_chunk in read_audio_blocks(file_path, chunk_duration, sr):
         # Check if the chunk is empty, indicating the end of the file
         if not audio_chunk.any():
             break
@@ -1,13 +1,29 @@
-from collections import namedtuple
+from collections import deque, namedtuple
+from multiprocessing import Pool
 from watchdog.observers import Observer
 from watchdog.events import PatternMatchingEventHandler
 import time
-from birdnetlib import Recording
+from birdnetlib import MultiProcessRecording, Recording
+from birdnetlib.batch import (
+    init_analyzer_worker,
+    load_analyzers_from_args,
+    process_from_queue,
+    return_analyzer_args,
+)
+import fnmatch
 import glob
+import numpy as np
 import os
+import queue
+import struct
+import threading
 from time import sleep
 import hashlib
 
+DROP_POLICIES = ("block", "drop_newest", "drop_oldest")
+
+PollingEvent = namedtuple("PollingEvent", ["src_path"])
+
 
 class DirectoryWatcher:
     def __init__(
@@ -22,6 +38,13 @@ class DirectoryWatcher:
         min_conf=0.1,
         overlap=0.0,
         use_polling=False,
+        cache=None,
+        polling_interval=2,
+        stable_polls=2,
+        workers=0,
+        queue_size=100,
+        drop_policy="block",
+        use_processes=False,
     ):
         self.directory = directory
         if len(analyzers) > 0:
@@ -40,7 +63,39 @@ class DirectoryWatcher:
         self.lon = lon
         self.min_conf = min_conf
         self.overlap = overlap
+        # Optional ResultCache; files with cached results are not decoded or analyzed again.
+        self.cache = cache
         self.use_polling = use_polling
+        self.patterns = ["*.mp3", "*.wav"]
+
+        # Polling: a new file is analyzed once its size and modification time are unchanged for
+        # stable_polls polls, or once its WAV header matches its size.
+        self.polling_interval = polling_interval
+        self.stable_polls = stable_polls
+        self.seen_files = set()
+        self.pending_files = {}
+
+        # With workers > 0, new files are put on a bounded queue and analyzed by worker threads
+        # (or worker processes, with use_processes), instead of on the watchdog/polling thread.
+        # When the queue is full, "block" waits for space, "drop_newest" drops the new file and
+        # "drop_oldest" drops the file that has been waiting the longest.
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"drop_policy must be one of {', '.join(DROP_POLICIES)}.")
+        self.workers = workers
+        self.drop_policy = drop_policy
+        self.use_processes = use_processes
+        self.file_queue = queue.Queue(maxsize=queue_size) if workers else None
+        self.worker_threads = []
+        self.pool = None
+
+        # Metrics, see return_metrics.
+        self.metrics_lock = threading.Lock()
+        self.files_queued = 0
+        self.files_processed = 0
+        self.files_dropped = 0
+        self.max_queue_depth = 0
+        self.queue_wait_times = deque(maxlen=1000)
+        self.latencies = deque(maxlen=1000)
 
     def on_analyze_complete(self, recording):
         pass
@@ -55,15 +110,25 @@ class DirectoryWatcher:
     def recording_preanalyze(self, recording):
         pass
 
+    def on_file_dropped(self, path):
+        # Called when a file is dropped because the queue is full.
+        pass
+
     def _on_closed(self, event):
         # Detect for this file.
         print(f"New file created: {event.src_path}")
+        if self.workers:
+            self.queue_file(event.src_path)
+        else:
+            self.analyze_file(event.src_path)
+
+    def analyze_file(self, path, analyzers=None):
         recordings = []
-        for analyzer in self.analyzers:
+        for analyzer in analyzers or self.analyzers:
             try:
                 recording = Recording(
                     analyzer,
-                    event.src_path,
+                    path,
                     week_48=self.week_48,
                     date=self.date,
                     sensitivity=self.sensitivity,
@@ -71,9 +136,13 @@ class DirectoryWatcher:
                     lon=self.lon,
                     min_conf=self.min_conf,
                     overlap=self.overlap,
+                    cache=self.cache,
                 )
                 # Preparse if method is available.
                 self.recording_preanalyze(recording)
+                if recordings:
+                    # Reuse the audio decoded for the previous analyzer.
+                    recording.share_audio_data(recordings[-1])
                 recording.analyze()
                 recordings.append(recording)
                 self.on_analyze_complete(recording)
@@ -81,10 +150,150 @@ class DirectoryWatcher:
                 self.on_error(recording, error)
         self.on_analyze_file_complete(recordings)
 
+    def analyze_file_in_pool(self, path, analyzer_args):
+        # Preparse in this process, then analyze in a worker process.
+        recording = Recording(
+            None,
+            path,
+            week_48=self.week_48,
+            date=self.date,
+            sensitivity=self.sensitivity,
+            lat=self.lat,
+            lon=self.lon,
+            min_conf=self.min_conf,
+            overlap=self.overlap,
+            cache=self.cache,
+        )
+        self.recording_preanalyze(recording)
+        processor_results = self.pool.apply(
+            process_from_queue, ((recording.__dict__, analyzer_args),)
+        )
+        recordings = [
+            MultiProcessRecording(results=results) for results in processor_results
+        ]
+        for recording in recordings:
+            if recording.error:
+                self.on_error(recording, recording.error_message)
+            else:
+                self.on_analyze_complete(recording)
+        self.on_analyze_file_complete(recordings)
+
+    def queue_file(self, path):
+        item = (path, time.monotonic())
+        if self.drop_policy == "block":
+            self.file_queue.put(item)
+        else:
+            while True:
+                try:
+                    self.file_queue.put_nowait(item)
+                    break
+                except queue.Full:
+                    if self.drop_policy == "drop_newest":
+                        self.drop_file(path)
+                        return
+                    try:
+                        dropped_path, _ = self.file_queue.get_nowait()
+                        self.file_queue.task_done()
+                        self.drop_file(dropped_path)
+                    except queue.Empty:
+                        pass
+        with self.metrics_lock:
+            self.files_queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.file_queue.qsize())
+
+    def drop_file(self, path):
+        print(f"Queue full, dropping: {path}")
+        with self.metrics_lock:
+            self.files_dropped += 1
+        self.on_file_dropped(path)
+
+    def start_workers(self):
+        if not self.workers or self.worker_threads:
+            return
+        analyzer_args = return_analyzer_args(self.analyzers)
+        if self.use_processes:
+            # Each worker process loads its analyzers once.
+            self.pool = Pool(
+                self.workers,
+                initializer=init_analyzer_worker,
+                initargs=(analyzer_args,),
+            )
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self.worker, args=(i, analyzer_args), daemon=True
+            )
+            thread.start()
+            self.worker_threads.append(thread)
+
+    def stop_workers(self):
+        # Wait for the queued files to be analyzed, then stop the workers.
+        for _ in self.worker_threads:
+            self.file_queue.put(None)
+        for thread in self.worker_threads:
+            thread.join()
+        self.worker_threads = []
+        if self.pool:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def worker(self, index, analyzer_args):
+        # Interpreters can not be shared between threads, so each thread has its own analyzers.
+        analyzers = None
+        if not self.use_processes:
+            if index == 0:
+                analyzers = self.analyzers
+            else:
+                analyzers = load_analyzers_from_args(analyzer_args)
+
+        while True:
+            item = self.file_queue.get()
+            if item is None:
+                self.file_queue.task_done()
+                return
+            path, queued_time = item
+            started_time = time.monotonic()
+            try:
+                if self.use_processes:
+                    self.analyze_file_in_pool(path, analyzer_args)
+                else:
+                    self.analyze_file(path, analyzers)
+            except BaseException as error:
+                print(f"Error analyzing {path}: {error}")
+            finally:
+                self.file_queue.task_done()
+            with self.metrics_lock:
+                self.files_processed += 1
+                self.queue_wait_times.append(started_time - queued_time)
+                self.latencies.append(time.monotonic() - queued_time)
+
+    def return_metrics(self):
+        # Queue and latency metrics for the workers; latencies (in seconds) cover the last 1000
+        # files, from the file being queued to its analysis being complete.
+        with self.metrics_lock:
+            latencies = np.array(self.latencies)
+            queue_wait_times = np.array(self.queue_wait_times)
+            return {
+                "queue_depth": self.file_queue.qsize() if self.file_queue else 0,
+                "max_queue_depth": self.max_queue_depth,
+                "files_queued": self.files_queued,
+                "files_processed": self.files_processed,
+                "files_dropped": self.files_dropped,
+                "mean_queue_wait": float(queue_wait_times.mean())
+                if len(queue_wait_times)
+                else None,
+                "mean_latency": float(latencies.mean()) if len(latencies) else None,
+                "p95_latency": float(np.percentile(latencies, 95))
+                if len(latencies)
+                else None,
+                "max_latency": float(latencies.max()) if len(latencies) else None,
+            }
+
     def watch(self):
+        self.start_workers()
         if self.use_polling:
             self.watch_via_polling()  # Doesn't return.
-        patterns = ["*.mp3", "*.wav"]
+        patterns = self.patterns
         ignore_patterns = None
         ignore_directories = False
         case_sensitive = True
@@ -103,9 +312,10 @@ class DirectoryWatcher:
         except KeyboardInterrupt:
             my_observer.stop()
             my_observer.join()
+            self.stop_workers()
 
     def return_file_list(self):
-        patterns = ["*.mp3", "*.wav"]
+        patterns = self.patterns
         files = []
         for ext in patterns:
             files.extend(glob.glob(os.path.join(self.directory, ext)))
@@ -118,25 +328,72 @@ class DirectoryWatcher:
             return hashlib.md5(file_contents).hexdigest()
         return False
 
+    def return_file_stats(self):
+        # Size and modification time of each audio file, from a single directory listing.
+        file_stats = {}
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not any(fnmatch.fnmatchcase(entry.name, i) for i in self.patterns):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                file_stats[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return file_stats
+
+    def is_complete_wav(self, path, size):
+        # WAV writers set the RIFF chunk size when the file is closed (streaming writers use 0
+        # or 0xFFFFFFFF until then), so a matching size means the file is complete.
+        if not path.lower().endswith(".wav"):
+            return False
+        try:
+            with open(path, "rb") as f:
+                header = f.read(12)
+        except OSError:
+            return False
+        return (
+            len(header) == 12
+            and header[:4] == b"RIFF"
+            and header[8:] == b"WAVE"
+            and struct.unpack("<I", header[4:8])[0] + 8 == size
+        )
+
+    def return_stable_files(self):
+        # Scan the directory once and return all new files that have finished recording.
+        file_stats = self.return_file_stats()
+
+        # Forget files that were removed.
+        self.seen_files.intersection_update(file_stats)
+        for path in [i for i in self.pending_files if i not in file_stats]:
+            del self.pending_files[path]
+
+        stable_files = []
+        for path, file_stat in file_stats.items():
+            if path in self.seen_files:
+                continue
+            last_stat, unchanged_polls = self.pending_files.get(path, (None, 0))
+            unchanged_polls = unchanged_polls + 1 if file_stat == last_stat else 0
+            self.pending_files[path] = (file_stat, unchanged_polls)
+            if unchanged_polls >= self.stable_polls or self.is_complete_wav(
+                path, file_stat[0]
+            ):
+                stable_files.append(path)
+
+        for path in stable_files:
+            self.seen_files.add(path)
+            del self.pending_files[path]
+        stable_files.sort()
+        return stable_files
+
     def watch_via_polling(self):
-        seen_files = self.return_file_list()
-        last_hash = ""
+        # Files already in the directory are not analyzed.
+        self.seen_files = set(self.return_file_stats())
+        self.pending_files = {}
+        print("Starting watcher (polling) ...")
         while True:
-            new_files = self.return_file_list()
-            files = [x for x in new_files if x not in seen_files]
-            if len(files) > 0:
-                path = os.path.join(self.directory, files[0])
-                h = self.get_file_md5(path)
-                # Compare file hash to last hash (to confirm file is not being recorded)
-                # Clumsy, but works as a fallback to watchdog.
-                if h and h == last_hash:
-                    Event = namedtuple("Event", ["src_path"])
-                    event = Event(path)
-                    self._on_closed(event)
-                    seen_files.append(files[0])
-                    # Remove any seen_files no longer in directory.
-                    current_list = self.return_file_list()
-                    seen_files = [x for x in seen_files if x in current_list]
-                else:
-                    last_hash = h
-            sleep(2)
+            for path in self.return_stable_files():
+                self._on_closed(PollingEvent(path))
+            sleep(self.polling_interval)
@@ -40,15 +40,14 @@ Modifed from scipy.io.wavfile.py to not rely on a file object having a seek meth
 Module to read wav buffers using NumPy arrays
 Functions
 ---------
-'pipewav': Yield the sample rate (in samples/sec) and data from a named pipe containing multiple WAVS.
-`bufferwav`: Yield the sample rate (in samples/sec) and data from a file like object containing multiple WAVs.
+'pipewavs': Yield the sample rate (in samples/sec) and data from a named pipe containing multiple WAVS.
+`bufferwavs`: Yield the sample rate (in samples/sec) and data from a file like object containing multiple WAVs.
 """
 
 
 import struct
 import warnings
 import numpy
-import io
 from enum import IntEnum
 
 class WAVE_FORMAT(IntEnum):
@@ -446,13 +445,10 @@ def _read_fmt_chunk(fid, is_big_endian):
     return (size, format_tag, channels, fs, bytes_per_second, block_align,
             bit_depth)
 
-def _read_data_chunk(fid, format_tag, channels, bit_depth, is_big_endian,
-                     block_align):
+def _return_data_dtype(format_tag, bit_depth, bytes_per_sample, is_big_endian):
     """
     Notes
     -----
-    Assumes file pointer is immediately after the 'data' id
-
     It's possible to not use all available bits in a container, or to store
     samples in a container bigger than necessary, so bytes_per_sample uses
     the actual reported container size (nBlockAlign / nChannels).  Real-world
@@ -477,13 +473,6 @@ def _read_data_chunk(fid, format_tag, channels, bit_depth, is_big_endian,
     else:
         fmt = '<'
 
-    # Size of the data subchunk in bytes
-    size = struct.unpack(fmt+'I', fid.read(4))[0]
-
-    # Number of bytes per sample (sample container size)
-    bytes_per_sample = block_align // channels
-    n_samples = size // bytes_per_sample
-
     if format_tag == WAVE_FORMAT.PCM:
         if 1 <= bit_depth <= 8:
             dtype = 'u1'  # WAV of 8-bit integer or less are unsigned
@@ -504,83 +493,201 @@ def _read_data_chunk(fid, format_tag, channels, bit_depth, is_big_endian,
                              f"has {bit_depth}-bit floating-point data.")
     else:
         _raise_bad_format(format_tag)
+    return dtype
 
-    start = 0 #fid.tell()
-    try:
-        count = size if dtype == 'V1' else n_samples
-        data = numpy.frombuffer(fid.read(size), dtype=dtype)
-    except io.UnsupportedOperation:  # not a C-like file
-        fid.seek(start, 0)  # just in case it seeked, though it shouldn't
-        data = numpy.frombuffer(fid.read(size), dtype=dtype)
-
+def _decode_samples(raw, dtype, channels, bytes_per_sample, is_big_endian):
+    # raw is a uint8 array of whole frames; the samples are a view of it, not a copy.
     if dtype == 'V1':
         # Rearrange raw bytes into smallest compatible numpy dtype
+        fmt = '>' if is_big_endian else '<'
         dt = f'{fmt}i4' if bytes_per_sample == 3 else f'{fmt}i8'
-        a = numpy.zeros((len(data) // bytes_per_sample, numpy.dtype(dt).itemsize),
+        a = numpy.zeros((len(raw) // bytes_per_sample, numpy.dtype(dt).itemsize),
                         dtype='V1')
+        raw = raw.view('V1')
         if is_big_endian:
-            a[:, :bytes_per_sample] = data.reshape((-1, bytes_per_sample))
+            a[:, :bytes_per_sample] = raw.reshape((-1, bytes_per_sample))
         else:
-            a[:, -bytes_per_sample:] = data.reshape((-1, bytes_per_sample))
+            a[:, -bytes_per_sample:] = raw.reshape((-1, bytes_per_sample))
         data = a.view(dt).reshape(a.shape[:-1])
-
-    _handle_pad_byte(fid, size)
+    else:
+        data = raw.view(dtype)
 
     if channels > 1:
         data = data.reshape(-1, channels)
     return data
 
-def pipewavs(pipe):
+
+# data chunk sizes written by streaming recorders (e.g. arecord) that do not know the final size.
+STREAMING_DATA_SIZES = {0, 0xFFFFFFFF}
+
+
+class _WavStreamReader:
+    """
+    Buffered reader for a file-like object or pipe.
+
+    Headers are read through a reusable buffer with readinto1, so a read never waits for more
+    bytes than the stream has available. Sample data is read with readinto directly into the
+    array that is returned.
+    """
+
+    def __init__(self, f, buffer_size=64 * 1024):
+        self.f = f
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.start = 0  # First unread byte in the buffer.
+        self.end = 0  # End of the buffered bytes.
+        self.eof = False
+        self._readinto1 = getattr(f, 'readinto1', None) or self._readinto
+
+    def _readinto(self, view):
+        if hasattr(self.f, 'readinto'):
+            return self.f.readinto(view)
+        data = self.f.read(len(view))
+        view[:len(data)] = data
+        return len(data)
+
+    def _fill(self, n):
+        # Buffer at least n unread bytes, unless the stream ends first.
+        if self.end - self.start >= n or self.eof:
+            return
+        if self.start:
+            remaining = self.end - self.start
+            self.view[:remaining] = self.view[self.start:self.end]
+            self.start, self.end = 0, remaining
+        if n > len(self.buffer):
+            buffer = bytearray(max(n, 2 * len(self.buffer)))
+            buffer[:self.end] = self.view[:self.end]
+            self.view.release()
+            self.buffer, self.view = buffer, memoryview(buffer)
+        while self.end < n:
+            count = self._readinto1(self.view[self.end:])
+            if not count:
+                self.eof = True
+                return
+            self.end += count
+
+    def peek(self, n):
+        self._fill(n)
+        return bytes(self.view[self.start:min(self.start + n, self.end)])
+
+    def read(self, n):
+        data = self.peek(n)
+        self.start += len(data)
+        return data
+
+    def find(self, pattern):
+        # Skip to the next occurrence of pattern; returns False at the end of the stream.
+        while True:
+            index = self.buffer.find(pattern, self.start, self.end)
+            if index != -1:
+                self.start = index
+                return True
+            if self.eof:
+                return False
+            # Keep a possible partial match at the end of the buffer.
+            self.start = max(self.start, self.end - len(pattern) + 1)
+            self._fill(self.end - self.start + 1)
+
+    def read_array(self, n):
+        # Read up to n bytes into a new uint8 array.
+        raw = numpy.empty(n, dtype='u1')
+        view = memoryview(raw)
+        buffered = min(n, self.end - self.start)
+        view[:buffered] = self.view[self.start:self.start + buffered]
+        self.start += buffered
+        count = buffered
+        while count < n and not self.eof:
+            read = self._readinto(view[count:])
+            if not read:
+                self.eof = True
+                break
+            count += read
+        view.release()
+        return raw[:count]
+
+
+def _read_data_chunks(reader, fs, format_tag, channels, bit_depth, block_align,
+                      is_big_endian, stream_block_duration):
+    """
+    Yield the samples of a data chunk; chunks with a streaming size are read until the end of
+    the stream, in blocks of stream_block_duration seconds.
+
+    Notes
+    -----
+    Assumes file pointer is immediately after the 'data' id
+    """
+    fmt = '>I' if is_big_endian else '<I'
+    size = struct.unpack(fmt, reader.read(4))[0]
+
+    bytes_per_sample = block_align // channels
+    dtype = _return_data_dtype(format_tag, bit_depth, bytes_per_sample,
+                               is_big_endian)
+
+    streaming = size in STREAMING_DATA_SIZES
+    if streaming:
+        block_frames = max(1, int(stream_block_duration * fs))
+        block_size = block_frames * block_align
+    else:
+        block_size = size
+
+    while True:
+        raw = reader.read_array(block_size)
+        # Drop a partial frame at the end of a truncated stream.
+        raw = raw[:len(raw) - len(raw) % block_align]
+        if len(raw):
+            yield (fs, _decode_samples(raw, dtype, channels, bytes_per_sample,
+                                       is_big_endian))
+        if not streaming:
+            _handle_pad_byte(reader, size)
+            return
+        if len(raw) < block_size:
+            return
+
+def pipewavs(pipe, stream_block_duration=10):
     f = open(pipe,"rb")
-    for fs,data in bufferwavs(f):
+    for fs,data in bufferwavs(f, stream_block_duration=stream_block_duration):
         yield (fs,data)
 
-def bufferwavs(f):
-    buffer = b''
-    while(True):
-        if buffer[-4:]==b'RIFF':
-            is_big_endian = False
-            fmt = '<I'
-            fmt_chunk_received = False
-            data_chunk_received = False
-            file_size = struct.unpack(fmt, f.read(4))[0] + 8
-            str2 = f.read(4)
-            if str2 != b'WAVE':
-                raise ValueError(f"Not a WAV file. RIFF form type is {repr(str2)}.")
-            chunk_id = None
-            while(chunk_id!=b'RIFF'):
-                chunk_id = f.read(4)
-                if chunk_id == b'fact':
-                    _skip_unknown_chunk(f, is_big_endian)
-                elif chunk_id == b'LIST':
-                    # Someday this could be handled properly but for now skip it
-                    _skip_unknown_chunk(f, is_big_endian)
-                elif chunk_id in {b'JUNK', b'Fake'}:
-                    # Skip alignment chunks without warning
-                    _skip_unknown_chunk(f, is_big_endian)
-                elif chunk_id == b'fmt ':
-                    fmt_chunk_received = True
-                    fmt_chunk = _read_fmt_chunk(f, is_big_endian)
-                    format_tag, channels, fs = fmt_chunk[1:4]
-                    bit_depth = fmt_chunk[6]
-                    block_align = fmt_chunk[5]
-                elif chunk_id == b'data':
-                    if fmt_chunk_received:
-                        data_chunk_received = True
-                        data = _read_data_chunk(f, format_tag, channels, bit_depth,
-                                        is_big_endian, block_align)
-                elif chunk_id == b'RIFF':
-                    yield (fs,data)
-                elif chunk_id== b'':
-                    if fmt_chunk_received and data_chunk_received:
-                        fmt_chunk_received = data_chunk_received = False
-                        yield (fs,data)
-                    else:
-                        return
-                else:
-                    warnings.warn("Chunk (non-data) not understood, skipping it.",
-                                WavFileWarning, stacklevel=2)
-                    _skip_unknown_chunk(f, is_big_endian)
-            buffer = chunk_id
-        else:
-            buffer += f.read(4)
+def bufferwavs(f, stream_block_duration=10):
+    """
+    Yield the sample rate and data of each WAV in a file-like object or pipe that contains one
+    or more WAVs (e.g. from a socket). Each WAV is yielded as soon as its data chunk has been read.
+    WAVs with a streaming data size (0 or 0xFFFFFFFF) are read until the end of the stream and
+    yielded in blocks of stream_block_duration seconds, so an endless stream can be analyzed as
+    it arrives.
+    """
+    reader = _WavStreamReader(f)
+    is_big_endian = False
+    while reader.find(b'RIFF'):
+        reader.read(8)  # RIFF id and size (unused, may be a streaming size)
+        str2 = reader.read(4)
+        if str2 != b'WAVE':
+            raise ValueError(f"Not a WAV file. RIFF form type is {repr(str2)}.")
+        fmt_chunk = None
+        while True:
+            if reader.peek(4) == b'RIFF':
+                # Next WAV, without a data chunk in this one.
+                break
+            chunk_id = reader.read(4)
+            if len(chunk_id) < 4:
+                return
+            if chunk_id == b'fmt ':
+                fmt_chunk = _read_fmt_chunk(reader, is_big_endian)
+            elif chunk_id == b'data' and fmt_chunk:
+                format_tag, channels, fs = fmt_chunk[1:4]
+                bit_depth = fmt_chunk[6]
+                block_align = fmt_chunk[5]
+                yield from _read_data_chunks(reader, fs, format_tag, channels,
+                                             bit_depth, block_align,
+                                             is_big_endian,
+                                             stream_block_duration)
+                # Any chunks after the data chunk are skipped by the search for the next WAV.
+                break
+            elif chunk_id in {b'fact', b'LIST', b'JUNK', b'Fake', b'data'}:
+                # Someday LIST could be handled properly but for now skip it.
+                # Skip alignment chunks without warning.
+                _skip_unknown_chunk(reader, is_big_endian)
+            else:
+                warnings.warn("Chunk (non-data) not understood, skipping it.",
+                              WavFileWarning, stacklevel=2)
+                _skip_unknown_chunk(reader, is_big_endian)
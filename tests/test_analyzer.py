@@ -340,3 +340,149 @@ def test_species_list_calls():
         )
         recording.analyze()
         assert wrapped_return_predicted_species_list.call_count == 1
+
+
+def test_batch_size():
+    min_conf = 0.25
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+
+    analyzer = Analyzer()
+    recording = Recording(analyzer, input_path, min_conf=min_conf)
+    recording.analyze()
+
+    batch_analyzer = Analyzer(batch_size=8)
+    with patch.object(
+        batch_analyzer.interpreter,
+        "allocate_tensors",
+        wraps=batch_analyzer.interpreter.allocate_tensors,
+    ) as wrapped_allocate_tensors:
+        batch_recording = Recording(batch_analyzer, input_path, min_conf=min_conf)
+        batch_recording.analyze()
+        # 40 chunks in batches of 8 only require a single resize.
+        assert wrapped_allocate_tensors.call_count == 1
+
+    assert len(batch_recording.detections) == len(recording.detections)
+    for detection, batch_detection in zip(
+        recording.detections, batch_recording.detections
+    ):
+        assert detection["label"] == batch_detection["label"]
+        assert detection["start_time"] == batch_detection["start_time"]
+        assert detection["end_time"] == batch_detection["end_time"]
+        # Batched interpreter kernels may differ in the last float32 bits.
+        assert detection["confidence"] == pytest.approx(
+            batch_detection["confidence"], abs=1e-5
+        )
+
+
+def test_interpreter_options():
+    min_conf = 0.25
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+
+    analyzer = Analyzer()
+    recording = Recording(analyzer, input_path, min_conf=min_conf)
+    recording.analyze()
+
+    threaded_analyzer = Analyzer(num_threads=2, use_xnnpack=False)
+    assert threaded_analyzer.num_threads == 2
+    assert threaded_analyzer.species_class.num_threads == 2
+    threaded_recording = Recording(threaded_analyzer, input_path, min_conf=min_conf)
+    threaded_recording.analyze()
+
+    assert len(threaded_recording.detections) == len(recording.detections)
+    for detection, threaded_detection in zip(
+        recording.detections, threaded_recording.detections
+    ):
+        assert detection["label"] == threaded_detection["label"]
+        assert detection["confidence"] == pytest.approx(
+            threaded_detection["confidence"], abs=1e-5
+        )
+
+
+def test_detections_are_cached():
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+    analyzer = Analyzer()
+    recording = Recording(analyzer, input_path, min_conf=0.1)
+    recording.analyze()
+
+    detections = recording.detections
+    assert len(detections) > 0
+    assert recording.detections == detections
+    # Repeated access returns new copies of the filtered detection dicts.
+    assert recording.detections[0] is not detections[0]
+    detections[0]["confidence"] = 99
+    assert recording.detections[0]["confidence"] != 99
+    detections = recording.detections
+
+    # Changing the allow list or config invalidates the cache.
+    label = detections[0]["label"]
+    analyzer.custom_species_list = [label]
+    assert analyzer.custom_species_set == {label}
+    assert {i["label"] for i in recording.detections} == {label}
+
+    # Editing the list in place too.
+    other_label = next(i["label"] for i in detections if i["label"] != label)
+    analyzer.custom_species_list.append(other_label)
+    assert {i["label"] for i in recording.detections} == {label, other_label}
+
+    analyzer.custom_species_list = []
+    recording.minimum_confidence = 0.5
+    assert recording.detections == [i for i in detections if i["confidence"] > 0.5]
+
+    recording.return_all_detections = True
+    assert all(
+        i["is_predicted_for_location_and_date"] is False
+        for i in recording.detections
+    )
+
+
+def test_detection_arrays():
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+    analyzer = Analyzer()
+    recording = Recording(analyzer, input_path, min_conf=0.1)
+    recording.analyze()
+
+    # Results are stored as label indices and float32 confidences.
+    assert analyzer.result_label_indices.dtype == "int32"
+    assert analyzer.result_confidences.dtype == "float32"
+    assert len(analyzer.result_start_times) == 40
+    assert analyzer.label_names[0] == tuple(analyzer.labels[0].split("_"))
+
+    detection_list = recording.detection_list
+    assert len(detection_list) == len(analyzer.result_label_indices)
+    detection = detection_list[0]
+    assert detection.label == analyzer.labels[analyzer.result_label_indices[0]]
+    assert detection.label == f"{detection.scientific_name}_{detection.common_name}"
+    assert detection.confidence == analyzer.result_confidences[0].item()
+
+    # The results dict is rebuilt from the arrays.
+    results = analyzer.results
+    assert len(results) == 40
+    assert list(results)[:3] == ["0-3.0", "3.0-6.0", "6.0-9.0"]
+    assert sum(len(i) for i in results.values()) == len(detection_list)
+
+
+def test_shared_species_list():
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+
+    # The species list model is not loaded for recordings without lat/lon.
+    analyzer = Analyzer()
+    recording = Recording(analyzer, input_path)
+    recording.analyze()
+    assert analyzer._species_class is None
+
+    # Analyzers with the same interpreter options share one species list model.
+    other_analyzer = Analyzer()
+    assert analyzer.species_class is other_analyzer.species_class
+
+    # Location lists are cached in a bounded LRU.
+    analyzer.cached_species_lists.max_size = 2
+    for week_48 in [18, 19, 18, 20, 19]:
+        recording = Recording(
+            analyzer, input_path, lat=35.4244, lon=-120.7463, week_48=week_48
+        )
+        analyzer.set_species_list_for_recording(recording)
+    assert analyzer.cached_species_lists.hits == 1
+    assert analyzer.cached_species_lists.misses == 4
+    assert len(analyzer.cached_species_lists) == 2
+    assert (-120.7463, 35.4244, 18) not in analyzer.cached_species_lists
+    assert len(analyzer.custom_species_list) > 0
@@ -1,5 +1,9 @@
 from birdnetlib.batch import DirectoryAnalyzer
 from birdnetlib.analyzer_lite import LiteAnalyzer
+from birdnetlib.analyzer import Analyzer
+from mock import patch
+import librosa
+import numpy as np
 import tempfile
 import shutil
 import os
@@ -43,3 +47,33 @@ def test_batch_extensions():
         batch = DirectoryAnalyzer(input_dir, analyzers=[analyzer], patterns=["*.wav"])
         batch.process()
         assert len(batch.directory_recordings) == 4
+
+
+def test_batch_decodes_once_for_all_analyzers():
+    # The second analyzer reuses the audio decoded for the first one.
+    analyzer = Analyzer()
+    analyzer_overlap = Analyzer()
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+
+    with tempfile.TemporaryDirectory() as input_dir:
+        shutil.copy2(input_path, input_dir)
+        batch = DirectoryAnalyzer(
+            input_dir, analyzers=[analyzer, analyzer_overlap], patterns=["*.wav"]
+        )
+
+        def recording_preanalyze(recording):
+            if recording.analyzer is analyzer_overlap:
+                recording.overlap = 1.5
+
+        batch.recording_preanalyze = recording_preanalyze
+
+        with patch("birdnetlib.main.librosa.load", wraps=librosa.load) as load:
+            batch.process()
+
+        assert load.call_count == 1
+        first, second = batch.directory_recordings
+        assert second.audio_shared
+        assert np.array_equal(second.ndarray, first.ndarray)
+        # Chunks are rebuilt when the overlap differs.
+        assert len(second.chunks) == 2 * len(first.chunks)
+        assert len(second.detections) > len(first.detections)
@@ -1,5 +1,6 @@
-from birdnetlib import RecordingBuffer
+from birdnetlib import Recording, RecordingBuffer
 from birdnetlib.analyzer import Analyzer, MODEL_PATH, LABEL_PATH
+from birdnetlib.utils import return_float32_audio, return_resampled_audio
 import birdnetlib.wavutils as wavutils
 
 from pprint import pprint
@@ -9,6 +10,10 @@ import tempfile
 import csv
 from unittest.mock import patch
 import io
+import struct
+import numpy as np
+import soundfile as sf
+from scipy.signal import resample_poly
 
 TEST_BN_COMMIT = "98945574c68102ccfac6c3504fcc63e64ed6f9e3"
 
@@ -367,3 +372,97 @@ def test_species_list_calls():
             )
             recording.analyze()
             assert wrapped_return_predicted_species_list.call_count == 1
+
+
+def test_bufferwavs_stream():
+    def wav_bytes(data, rate, subtype):
+        buffer = io.BytesIO()
+        sf.write(buffer, data, rate, subtype=subtype, format="WAV")
+        return buffer.getvalue()
+
+    rng = np.random.default_rng(42)
+    mono = rng.uniform(-1, 1, 48000).astype("float32")
+    stereo = rng.uniform(-1, 1, (3001, 2)).astype("float32")
+    wavs = [
+        wav_bytes(mono, 48000, "PCM_16"),
+        wav_bytes(stereo, 22050, "FLOAT"),
+        wav_bytes(mono[:4001], 16000, "PCM_24"),
+    ]
+
+    # Multiple WAVs, with a gap between them.
+    stream = wavs[0] + b"xyz" * 101 + wavs[1] + wavs[2]
+    results = list(wavutils.bufferwavs(io.BytesIO(stream)))
+    assert [rate for rate, data in results] == [48000, 22050, 16000]
+    assert results[0][1].dtype == "int16"
+    assert np.array_equal(
+        results[0][1], sf.read(io.BytesIO(wavs[0]), dtype="int16")[0]
+    )
+    assert np.array_equal(results[1][1], stereo)
+    # 24-bit samples are returned in the upper bytes of int32.
+    assert np.array_equal(
+        results[2][1] >> 8, sf.read(io.BytesIO(wavs[2]), dtype="int32")[0] >> 8
+    )
+
+    # Streaming headers (e.g. from arecord) are read in blocks until the end of the stream.
+    for size in [0, 0xFFFFFFFF]:
+        wav = bytearray(wavs[0])
+        data_index = wav.find(b"data")
+        wav[data_index + 4 : data_index + 8] = struct.pack("<I", size)
+        results = list(
+            wavutils.bufferwavs(io.BytesIO(wav), stream_block_duration=0.3)
+        )
+        assert [len(data) for rate, data in results] == [14400, 14400, 14400, 4800]
+        assert np.array_equal(
+            np.concatenate([data for rate, data in results]),
+            sf.read(io.BytesIO(wavs[0]), dtype="int16")[0],
+        )
+
+
+def test_buffer_conversion():
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+    analyzer = Analyzer()
+    expected = Recording(analyzer, input_path)
+    expected.analyze()
+    assert len(expected.detections) > 0
+
+    # Integer PCM is scaled and multichannel audio is downmixed.
+    data, rate = sf.read(input_path, dtype="int16")
+    for buffer in [data, np.stack([data, data], axis=1)]:
+        recording = RecordingBuffer(analyzer, buffer, rate)
+        recording.analyze()
+        assert recording.detections == expected.detections
+
+    # Other rates are resampled to 48 kHz.
+    data_44k = resample_poly(data / 32768, 147, 160)
+    recording = RecordingBuffer(analyzer, (data_44k * 32767).astype("int16"), 44100)
+    recording.analyze()
+    assert recording.duration == pytest.approx(expected.duration)
+    assert len(recording.chunks) == len(expected.chunks)
+    assert len(recording.detections) == len(expected.detections)
+    for detection, expected_detection in zip(
+        recording.detections, expected.detections
+    ):
+        assert detection["label"] == expected_detection["label"]
+        assert detection["start_time"] == expected_detection["start_time"]
+        assert detection["confidence"] == pytest.approx(
+            expected_detection["confidence"], abs=0.02
+        )
+
+
+def test_float32_audio():
+    rng = np.random.default_rng(42)
+    stereo = rng.integers(-(2**15), 2**15, (1000, 2)).astype("int16")
+    assert np.allclose(return_float32_audio(stereo), stereo.mean(axis=1) / 2**15)
+    unsigned = np.arange(256, dtype="uint8")
+    assert np.array_equal(
+        return_float32_audio(unsigned), (unsigned.astype(int) - 128) / 128
+    )
+    mono = rng.uniform(-1, 1, 1000).astype("float32")
+    assert return_float32_audio(mono) is mono
+
+    # Blockwise resampling matches resample_poly.
+    resampled = return_resampled_audio(stereo, 44100, 48000, block_size=77)
+    assert resampled.dtype == np.float32
+    assert np.allclose(
+        resampled, resample_poly(stereo.mean(axis=1) / 2**15, 160, 147), atol=1e-6
+    )
@@ -0,0 +1,125 @@
+from birdnetlib import Recording, RecordingBuffer
+from birdnetlib.analyzer import Analyzer
+from birdnetlib.utils import (
+    StreamingResampler,
+    read_audio_blocks,
+    split_audio_blocks,
+)
+from scipy.signal import resample_poly
+import numpy as np
+import os
+import pytest
+
+
+def chunk_with_loop(ndarray, rate, overlap, seconds=3.0, minlen=1.5):
+    # Reference implementation formerly used by RecordingBase.process_audio_data.
+    chunks = []
+    for i in range(0, len(ndarray), int((seconds - overlap) * rate)):
+        split = ndarray[i : i + int(seconds * rate)]
+        if len(split) < int(minlen * rate):
+            break
+        if len(split) < int(rate * seconds):
+            temp = np.zeros((int(rate * seconds)))
+            temp[: len(split)] = split
+            split = temp
+        chunks.append(split)
+    return chunks
+
+
+@pytest.mark.parametrize("overlap", [0.0, 0.5, 1.5, 2.5])
+@pytest.mark.parametrize("duration", [1.0, 2.0, 3.0, 10.2, 11.7])
+def test_strided_chunks(overlap, duration):
+    rate = 48000
+    rng = np.random.default_rng(1)
+    buffer = rng.uniform(-1, 1, int(duration * rate)).astype("float32")
+
+    recording = RecordingBuffer(None, buffer.copy(), rate, overlap=overlap)
+    recording.read_audio_data()
+
+    expected = chunk_with_loop(buffer, rate, overlap)
+    assert len(recording.chunks) == len(expected)
+    assert recording.chunks.dtype == np.float32
+    for chunk, expected_chunk in zip(recording.chunks, expected):
+        assert np.array_equal(chunk, np.array(expected_chunk, dtype="float32"))
+
+    # The unpadded signal is kept for extraction.
+    assert np.array_equal(recording.ndarray, buffer)
+
+
+def test_strided_chunks_are_views():
+    rate = 48000
+    buffer = np.ones(30 * rate, dtype="float32")
+    recording = RecordingBuffer(None, buffer, rate)
+    recording.read_audio_data()
+
+    # Non-overlapping chunks of a float32 signal share memory with the signal.
+    assert np.shares_memory(recording.chunks, buffer)
+    assert recording.chunks[2:6].flags.c_contiguous
+
+
+@pytest.mark.parametrize("overlap", [0.0, 0.5, 1.5, 2.5])
+@pytest.mark.parametrize("block_secs", [0.5, 2.0, 7.0, 60.0])
+def test_split_audio_blocks(overlap, block_secs):
+    rate = 48000
+    rng = np.random.default_rng(1)
+    buffer = rng.uniform(-1, 1, int(20.7 * rate)).astype("float32")
+    block_size = int(block_secs * rate)
+    blocks = [buffer[i : i + block_size] for i in range(0, len(buffer), block_size)]
+
+    expected = chunk_with_loop(buffer, rate, overlap)
+    chunks = list(split_audio_blocks(blocks, rate, overlap=overlap))
+    assert len(chunks) == len(expected)
+    for chunk, expected_chunk in zip(chunks, expected):
+        assert np.array_equal(chunk, np.array(expected_chunk, dtype="float32"))
+
+
+def test_streaming_recording():
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+    analyzer = Analyzer()
+
+    recording = Recording(analyzer, input_path, min_conf=0.25, overlap=1.5)
+    recording.analyze()
+
+    streaming_recording = Recording(
+        analyzer, input_path, min_conf=0.25, overlap=1.5, streaming=True
+    )
+    streaming_recording.analyze()
+
+    # Audio is never held in memory by a streaming recording.
+    assert streaming_recording.ndarray is None
+    assert streaming_recording.chunks is None
+    assert streaming_recording.duration == pytest.approx(recording.duration)
+
+    assert len(streaming_recording.detections) == len(recording.detections)
+    for detection, streaming_detection in zip(
+        recording.detections, streaming_recording.detections
+    ):
+        assert detection["label"] == streaming_detection["label"]
+        assert detection["start_time"] == streaming_detection["start_time"]
+        assert detection["confidence"] == pytest.approx(
+            streaming_detection["confidence"], abs=1e-3
+        )
+
+
+@pytest.mark.parametrize("block_size", [1, 997, 44100, 200000])
+def test_streaming_resampler(block_size):
+    rng = np.random.default_rng(1)
+    signal = rng.standard_normal(44100 * 3).astype("float32")
+    resampler = StreamingResampler(44100, 48000)
+    blocks = [
+        resampler.process(signal[i : i + block_size])
+        for i in range(0, len(signal), block_size)
+    ]
+    blocks.append(resampler.flush())
+    expected = resample_poly(signal, resampler.up, resampler.down, window=resampler.window)
+    assert np.array_equal(np.concatenate(blocks), expected.astype("float32"))
+
+
+def test_read_audio_blocks():
+    input_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "test_files/XC563936 - Soundscape.mp3"
+    )
+    blocks = list(read_audio_blocks(input_path, block_duration=20))
+    assert all(len(block) == 20 * 48000 for block in blocks[:-1])
+    assert all(block.dtype == np.float32 for block in blocks)
+    assert sum(len(block) for block in blocks) == 3455179
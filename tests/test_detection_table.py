@@ -0,0 +1,95 @@
+from birdnetlib import Recording, MultiProcessRecording, DetectionTable
+from birdnetlib.analyzer import Analyzer
+import numpy as np
+import tempfile
+import csv
+import os
+import pytest
+
+
+def return_analyzed_recording():
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+    analyzer = Analyzer()
+    recording = Recording(
+        analyzer, input_path, min_conf=0.1, return_all_detections=True
+    )
+    recording.analyze()
+    return recording
+
+
+def test_detection_table():
+    recording = return_analyzed_recording()
+    table = recording.detection_table
+
+    assert len(table) == len(recording.detections) > 0
+    assert table.as_dicts() == recording.detections
+    assert table.confidences.dtype == np.float32
+    assert table.label_indices.dtype == np.int32
+    # Labels are shared with the analyzer rather than copied.
+    assert table.labels is recording.analyzer.labels
+    assert table.paths == [recording.path]
+
+    with tempfile.TemporaryDirectory() as export_dir:
+        csv_path = os.path.join(export_dir, "detections.csv")
+        table.to_csv(csv_path)
+        with open(csv_path, newline="") as csvfile:
+            rows = list(csv.DictReader(csvfile))
+    assert len(rows) == len(table)
+    assert rows[0]["label"] == recording.detections[0]["label"]
+    assert float(rows[0]["confidence"]) == recording.detections[0]["confidence"]
+
+
+def test_detection_table_from_multiprocess_recording():
+    detections = [
+        {
+            "common_name": "House Wren",
+            "confidence": 0.19981279969215393,
+            "end_time": 15.0,
+            "label": "Troglodytes aedon_House Wren",
+            "scientific_name": "Troglodytes aedon",
+            "start_time": 12.0,
+        },
+        {
+            "common_name": "Spotted Towhee",
+            "confidence": 0.17119209468364716,
+            "end_time": 51.0,
+            "label": "Pipilo maculatus_Spotted Towhee",
+            "scientific_name": "Pipilo maculatus",
+            "start_time": 48.0,
+        },
+    ]
+    recording = MultiProcessRecording(
+        results={
+            "path": "soundscape.wav",
+            "config": {"minimum_confidence": 0.1},
+            "detections": detections,
+        }
+    )
+    assert recording.detections == detections
+
+    analyzed_table = return_analyzed_recording().detection_table
+    table = DetectionTable.concatenate([recording.detection_table, analyzed_table])
+    assert len(table) == 2 + len(analyzed_table)
+    assert table.paths[0] == "soundscape.wav"
+    assert table.as_dicts()[:2] == detections
+    assert set(table.path_indices.tolist()) == {0, 1}
+
+
+def test_detection_table_arrow():
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    table = return_analyzed_recording().detection_table
+    arrow_table = table.to_arrow()
+    assert arrow_table.num_rows == len(table)
+    assert arrow_table.column("label").to_pylist() == [
+        i["label"] for i in table.as_dicts()
+    ]
+    # Numeric columns wrap the NumPy buffers without copying.
+    confidences = arrow_table.column("confidence").chunk(0)
+    assert confidences.buffers()[1].address == table.confidences.ctypes.data
+
+    with tempfile.TemporaryDirectory() as export_dir:
+        parquet_path = os.path.join(export_dir, "detections.parquet")
+        table.to_parquet(parquet_path)
+        assert pq.read_table(parquet_path).num_rows == len(table)
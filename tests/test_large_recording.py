@@ -264,6 +264,25 @@ def test_exceptions():
     )
 
 
+@pytest.mark.parametrize("overlap", [0.0, 1.5, 2.5])
+def test_large_overlap(overlap):
+    # LargeRecording windows must match Recording, including the padded final window.
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+
+    recording = Recording(Analyzer(), input_path, min_conf=0.1, overlap=overlap)
+    recording.analyze()
+
+    large_recording = LargeRecording(
+        LargeRecordingAnalyzer(), input_path, min_conf=0.1, overlap=overlap
+    )
+    # Use small blocks so that windows span block boundaries.
+    large_recording.streaming_block_secs = 7
+    large_recording.analyze()
+
+    assert len(recording.detections) > 0
+    assert large_recording.detections == recording.detections
+
+
 # @pytest.mark.parametrize(
 #     "filepath",
 #     [
@@ -1,6 +1,11 @@
-from birdnetlib.batch import DirectoryMultiProcessingAnalyzer
+from birdnetlib import batch as batch_module
+from birdnetlib.batch import DirectoryMultiProcessingAnalyzer, init_analyzer_worker
 from birdnetlib.analyzer_lite import LiteAnalyzer
 from birdnetlib import MultiProcessRecording
+from birdnetlib.utils import return_threads_per_worker
+from birdnetlib.analyzer import Analyzer
+from unittest import mock
+import soundfile as sf
 import tempfile
 import shutil
 import os
@@ -249,3 +254,110 @@ def test_batch_extensions():
         )
         batch.process()
         assert len(batch.directory_recordings) == 2
+
+
+def test_threads_per_worker():
+    # Default is one single-threaded worker per CPU, minus one for the parent.
+    assert return_threads_per_worker(cpu_count=16) == (15, 1)
+    # Threads are derived from the number of processes, and vice versa.
+    assert return_threads_per_worker(processes=4, cpu_count=16) == (4, 4)
+    assert return_threads_per_worker(num_threads=8, cpu_count=16) == (2, 8)
+    assert return_threads_per_worker(processes=3, num_threads=2, cpu_count=16) == (
+        3,
+        2,
+    )
+    # Threads are reduced when both values would oversubscribe the CPUs.
+    with pytest.warns(RuntimeWarning):
+        assert return_threads_per_worker(processes=16, num_threads=4, cpu_count=16) == (
+            16,
+            1,
+        )
+    with pytest.warns(RuntimeWarning):
+        assert return_threads_per_worker(processes=4, num_threads=8, cpu_count=16) == (
+            4,
+            4,
+        )
+    # Never return less than one process or thread.
+    assert return_threads_per_worker(processes=32, cpu_count=16) == (32, 1)
+    assert return_threads_per_worker(cpu_count=1) == (1, 1)
+
+
+@pytest.mark.omit_during_ghactions
+def test_models_loaded_once_per_worker():
+    input_path = "tests/test_files/soundscape.wav"
+    audio, rate = sf.read(input_path, frames=9 * 48000)
+    load_model = Analyzer.load_model
+
+    with tempfile.TemporaryDirectory() as input_dir, tempfile.TemporaryDirectory() as log_dir:
+        for i in range(8):
+            sf.write(os.path.join(input_dir, f"short_{i}.wav"), audio, rate)
+
+        def counting_load_model(self):
+            # Record each model load with the pid of the worker that made it.
+            with open(os.path.join(log_dir, f"{os.getpid()}-{time.time_ns()}"), "w"):
+                pass
+            load_model(self)
+
+        batch = DirectoryMultiProcessingAnalyzer(input_dir, processes=2)
+        with mock.patch.object(Analyzer, "load_model", counting_load_model):
+            batch.process()
+
+        assert len(batch.directory_recordings) == 8
+        assert not batch.exceptions_raised
+
+        pids = [i.split("-")[0] for i in os.listdir(log_dir)]
+        assert 0 < len(set(pids)) <= 2
+        # Each worker loads the model once, regardless of the number of files it analyzed.
+        assert len(pids) == len(set(pids))
+
+
+def test_worker_analyzers_match_analyzers():
+    # Worker processes load copies of the analyzers, with the same model and options.
+    analyzer = Analyzer(version="2.3", delegates=[], batch_size=4)
+    batch = DirectoryMultiProcessingAnalyzer(
+        "tests/test_files", analyzers=[analyzer], processes=2
+    )
+    with mock.patch("birdnetlib.batch.Pool") as pool:
+        pool.return_value.__enter__.return_value.imap_unordered.return_value = []
+        batch.process()
+    analyzer_args = pool.call_args.kwargs["initargs"][0]
+
+    init_analyzer_worker(analyzer_args)
+    worker_analyzer = batch_module._worker_analyzers[0]
+    batch_module._worker_analyzers = None
+    assert worker_analyzer.version == "2.3"
+    assert worker_analyzer.model_path == analyzer.model_path
+    assert worker_analyzer.labels == analyzer.labels
+    assert worker_analyzer.delegates == []
+    assert worker_analyzer.batch_size == 4
+    # Thread counts are set by DirectoryMultiProcessingAnalyzer.
+    assert worker_analyzer.num_threads == batch.num_threads
+
+
+@pytest.mark.omit_during_ghactions
+def test_file_complete_callbacks():
+    input_path = "tests/test_files/soundscape.wav"
+    audio, rate = sf.read(input_path, frames=9 * 48000)
+
+    with tempfile.TemporaryDirectory() as input_dir:
+        for i in range(5):
+            sf.write(os.path.join(input_dir, f"short_{i}.wav"), audio, rate)
+
+        completed_files = []
+        completed_recordings = []
+
+        batch = DirectoryMultiProcessingAnalyzer(
+            input_dir, processes=2, chunksize=2, store_recordings=False
+        )
+        batch.on_analyze_file_complete = completed_files.append
+        batch.on_analyze_complete = completed_recordings.append
+        batch.process()
+
+        # Callbacks are fired in the parent as each file completes.
+        assert len(completed_files) == 5
+        assert all(len(recordings) == 1 for recordings in completed_files)
+        assert sorted(i.filename for i in completed_recordings) == sorted(
+            os.listdir(input_dir)
+        )
+        assert all(isinstance(i, MultiProcessRecording) for i in completed_recordings)
+        assert batch.directory_recordings == []
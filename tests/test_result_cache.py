@@ -0,0 +1,188 @@
+from birdnetlib import Recording
+from birdnetlib.analyzer import Analyzer
+from birdnetlib.batch import DirectoryAnalyzer
+from birdnetlib.cache import DirectoryResultCache, SQLiteResultCache
+import tempfile
+import shutil
+import os
+import pytest
+
+
+def return_cache(backend, cache_dir, **kwargs):
+    if backend == "sqlite":
+        return SQLiteResultCache(os.path.join(cache_dir, "results.sqlite"), **kwargs)
+    return DirectoryResultCache(os.path.join(cache_dir, "results"), **kwargs)
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "directory"])
+@pytest.mark.parametrize("key_mode", ["content", "stat"])
+def test_cache_hit_skips_analysis(backend, key_mode):
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+    analyzer = Analyzer()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = return_cache(backend, cache_dir, key_mode=key_mode)
+
+        recording = Recording(
+            analyzer,
+            input_path,
+            lat=35.4244,
+            lon=-120.7463,
+            week_48=18,
+            return_all_detections=True,
+            cache=cache,
+        )
+        recording.analyze()
+        assert cache.misses == 1 and cache.hits == 0
+
+        cached = Recording(
+            analyzer,
+            input_path,
+            lat=35.4244,
+            lon=-120.7463,
+            week_48=18,
+            return_all_detections=True,
+            cache=cache,
+        )
+        with pytest.MonkeyPatch.context() as m:
+            m.setattr(cached, "read_audio_data", None)
+            m.setattr(analyzer, "predict_batch", None)
+            cached.analyze()
+        assert cache.hits == 1
+        assert cached.duration == recording.duration
+        assert len(cached.detections) > 0
+        assert cached.detections == recording.detections
+
+        # A different config is a different entry.
+        other = Recording(
+            analyzer,
+            input_path,
+            lat=35.4244,
+            lon=-120.7463,
+            week_48=18,
+            min_conf=0.5,
+            cache=cache,
+        )
+        other.analyze()
+        assert cache.misses == 2
+        other = Recording(
+            analyzer,
+            input_path,
+            lat=35.4244,
+            lon=-120.7463,
+            week_48=18,
+            overlap=1.0,
+            cache=cache,
+        )
+        assert cache.return_key(other) != cache.return_key(recording)
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "directory"])
+def test_cache_eviction(backend):
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+    analyzer = Analyzer()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = return_cache(backend, cache_dir, max_bytes=1)
+
+        # Entries larger than max_bytes are evicted immediately.
+        recording = Recording(analyzer, input_path, cache=cache)
+        recording.analyze()
+        recording = Recording(analyzer, input_path, cache=cache)
+        recording.analyze()
+        assert cache.hits == 0 and cache.misses == 2
+
+        cache.max_bytes = 1024**2
+        for min_conf in [0.25, 0.5, 0.25]:
+            recording = Recording(analyzer, input_path, min_conf=min_conf, cache=cache)
+            recording.analyze()
+        assert cache.hits == 1 and cache.misses == 4
+
+        cache.clear()
+        recording = Recording(analyzer, input_path, min_conf=0.5, cache=cache)
+        recording.analyze()
+        assert cache.misses == 5
+
+
+def test_directory_analyzer_cache():
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+    analyzer = Analyzer()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        audio_dir = os.path.join(cache_dir, "audio")
+        os.makedirs(audio_dir)
+        shutil.copy(input_path, os.path.join(audio_dir, "soundscape.wav"))
+        cache = DirectoryResultCache(os.path.join(cache_dir, "results"))
+
+        batch = DirectoryAnalyzer(audio_dir, analyzers=[analyzer], cache=cache)
+        batch.process()
+        detections = batch.directory_recordings[0].detections
+
+        batch = DirectoryAnalyzer(audio_dir, analyzers=[analyzer], cache=cache)
+        batch.process()
+        assert cache.hits == 1
+        assert batch.directory_recordings[0].detections == detections
+
+
+def test_extract_after_cache_hit():
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+    analyzer = Analyzer()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = SQLiteResultCache(os.path.join(cache_dir, "results.sqlite"))
+        recording = Recording(analyzer, input_path, min_conf=0.4, cache=cache)
+        recording.analyze()
+
+        # The audio was not read on the cache hit; extraction reads the detected spans.
+        cached = Recording(analyzer, input_path, min_conf=0.4, cache=cache)
+        cached.analyze()
+        assert cache.hits == 1
+        assert cached.ndarray is None
+
+        for r, name in [(recording, "analyzed"), (cached, "cached")]:
+            export_dir = os.path.join(cache_dir, name)
+            os.makedirs(export_dir)
+            r.extract_detections_as_audio(directory=export_dir, format="wav")
+            r.extract_detections_as_spectrogram(
+                directory=export_dir, format="png", renderer="image"
+            )
+        assert len(cached.detections) > 0
+        for detection, expected in zip(cached.detections, recording.detections):
+            for key in ["extracted_audio_path", "extracted_spectrogram_path"]:
+                assert os.path.basename(detection[key]) == os.path.basename(
+                    expected[key]
+                )
+                with open(detection[key], "rb") as f, open(expected[key], "rb") as g:
+                    assert f.read() == g.read()
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "directory"])
+def test_cache_total_bytes(backend):
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+    analyzer = Analyzer()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = return_cache(backend, cache_dir)
+
+        # Below max_bytes, saving keeps a running total and doesn't scan or evict.
+        recording = Recording(analyzer, input_path, min_conf=0.1, cache=cache)
+        recording.analyze()
+        with pytest.MonkeyPatch.context() as m:
+            m.setattr(cache, "return_total_bytes", None)
+            m.setattr(cache, "evict", None)
+            for min_conf in [0.2, 0.3, 0.2]:
+                recording = Recording(
+                    analyzer, input_path, min_conf=min_conf, cache=cache
+                )
+                recording.analyze()
+        assert cache.total_bytes == cache.return_total_bytes()
+
+        # Above max_bytes, the least recently used entries are evicted.
+        cache.max_bytes = cache.total_bytes - 1
+        recording = Recording(analyzer, input_path, min_conf=0.4, cache=cache)
+        recording.analyze()
+        assert cache.total_bytes == cache.return_total_bytes()
+        assert 0 < cache.total_bytes <= cache.max_bytes * 0.9
+
+        cache.clear()
+        assert cache.total_bytes == cache.return_total_bytes() == 0
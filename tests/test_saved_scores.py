@@ -0,0 +1,76 @@
+from birdnetlib import Recording
+from birdnetlib.analyzer import Analyzer
+from birdnetlib.utils import load_scores
+import numpy as np
+import tempfile
+import os
+import pytest
+
+
+def test_rebuild_detections_from_scores():
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+    analyzer = Analyzer()
+
+    with tempfile.TemporaryDirectory() as scores_dir:
+        scores_path = os.path.join(scores_dir, "soundscape.scores")
+        recording = Recording(
+            analyzer,
+            input_path,
+            min_conf=0.5,
+            scores_path=scores_path,
+            scores_dtype="float32",
+        )
+        recording.analyze()
+
+        scores, metadata = load_scores(scores_path)
+        assert scores.shape == (40, len(analyzer.labels))
+        assert metadata["start_times"][1] == 3.0
+
+        # Rebuild with a lower threshold, without decoding or inference.
+        rebuilt = Recording(
+            analyzer, input_path, min_conf=0.1, scores_path=scores_path
+        )
+        with pytest.MonkeyPatch.context() as m:
+            m.setattr(rebuilt, "read_audio_data", None)
+            m.setattr(analyzer, "predict_batch", None)
+            rebuilt.analyze_from_scores()
+        assert rebuilt.duration == recording.duration
+
+        expected = Recording(analyzer, input_path, min_conf=0.1)
+        expected.analyze()
+        assert len(rebuilt.detections) > len(recording.detections)
+        assert rebuilt.detections == expected.detections
+
+
+@pytest.mark.parametrize("dtype,tolerance", [("float16", 1e-3), ("uint8", 1 / 255)])
+def test_quantized_scores(dtype, tolerance):
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+    analyzer = Analyzer()
+
+    with tempfile.TemporaryDirectory() as scores_dir:
+        scores_path = os.path.join(scores_dir, "soundscape.scores")
+        recording = Recording(
+            analyzer,
+            input_path,
+            min_conf=0.1,
+            scores_path=scores_path,
+            scores_dtype=dtype,
+        )
+        recording.analyze()
+
+        scores, metadata = load_scores(scores_path)
+        assert scores.dtype == np.dtype(dtype)
+        assert os.path.getsize(scores_path) == scores.nbytes
+
+        rebuilt = Recording(
+            analyzer, input_path, min_conf=0.1, scores_path=scores_path
+        )
+        rebuilt.analyze_from_scores()
+
+        detections = {(i["label"], i["start_time"]): i for i in recording.detections}
+        for detection in rebuilt.detections:
+            key = (detection["label"], detection["start_time"])
+            if key in detections:
+                assert detection["confidence"] == pytest.approx(
+                    detections[key]["confidence"], abs=tolerance
+                )
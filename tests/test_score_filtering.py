@@ -0,0 +1,46 @@
+from birdnetlib.utils import return_scores_above_threshold, return_top_k_scores
+import numpy as np
+import operator
+
+
+def sorted_scores(labels, scores):
+    # Reference implementation formerly used by the analyzers.
+    p_labels = dict(zip(labels, scores))
+    return sorted(p_labels.items(), key=operator.itemgetter(1), reverse=True)
+
+
+def test_scores_above_threshold():
+    rng = np.random.default_rng(42)
+    scores = rng.random((12, 300)).astype("float32")
+    # Add ties to ensure the order matches a stable sort.
+    scores[:, ::7] = 0.5
+    labels = [f"Species {i}_Common {i}" for i in range(scores.shape[1])]
+
+    chunk_indices, label_indices, values = return_scores_above_threshold(scores, 0.4)
+
+    for chunk in range(scores.shape[0]):
+        expected = [i for i in sorted_scores(labels, scores[chunk]) if i[1] >= 0.4]
+        mask = chunk_indices == chunk
+        result = [
+            (labels[i], score) for i, score in zip(label_indices[mask], values[mask])
+        ]
+        assert result == expected
+
+
+def test_top_k_scores():
+    rng = np.random.default_rng(42)
+    scores = rng.random((12, 300)).astype("float32")
+    # Ties across the top-k boundary.
+    scores[:, ::7] = 0.99
+    labels = [f"Species {i}_Common {i}" for i in range(scores.shape[1])]
+
+    label_indices, values = return_top_k_scores(scores, 10)
+    assert label_indices.shape == (12, 10)
+
+    for chunk in range(scores.shape[0]):
+        expected = sorted_scores(labels, scores[chunk])[:10]
+        result = [
+            (labels[i], score)
+            for i, score in zip(label_indices[chunk], values[chunk])
+        ]
+        assert result == expected
@@ -0,0 +1,143 @@
+from birdnetlib import Recording
+from birdnetlib.analyzer import Analyzer
+from birdnetlib.server import AnalysisServer
+from datetime import datetime
+import asyncio
+import json
+import os
+import pytest
+
+
+def key(detection):
+    return (detection["start_time"], detection["label"])
+
+
+def assert_same_detections(detections, expected):
+    detections = sorted(detections, key=key)
+    expected = sorted(expected, key=key)
+    assert [key(d) for d in detections] == [key(d) for d in expected]
+    for detection, expected_detection in zip(detections, expected):
+        # Batches are padded, so scores may differ in the last float32 digits.
+        assert detection["confidence"] == pytest.approx(
+            expected_detection["confidence"], abs=1e-5
+        )
+
+
+async def send_tcp(port, data):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(data)
+    await writer.drain()
+    writer.write_eof()
+    lines = [json.loads(line) for line in (await reader.read()).splitlines()]
+    writer.close()
+    return lines
+
+
+async def send_http(port, data, query=""):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        (
+            f"POST /analyze?{query} HTTP/1.1\r\nHost: localhost\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n"
+        ).encode()
+        + data
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    status = int(response.split(b" ", 2)[1])
+    return status, json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+
+def test_server_concurrent_clients():
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+    analyzer = Analyzer()
+    expected = Recording(analyzer, input_path, min_conf=0.25)
+    expected.analyze()
+    with open(input_path, "rb") as f:
+        data = f.read()
+
+    async def run():
+        server = AnalysisServer([Analyzer(), Analyzer()], port=0, min_conf=0.25)
+        await server.start()
+        try:
+            results = await asyncio.gather(
+                *(send_tcp(server.port, data) for _ in range(4))
+            )
+            return results, server.return_metrics()
+        finally:
+            await server.stop()
+
+    results, metrics = asyncio.run(run())
+    for detections in results:
+        assert_same_detections(detections, expected.detections)
+    assert metrics["clients_served"] == 4
+    assert metrics["windows_analyzed"] == 4 * len(expected.chunks)
+    # Windows of concurrent clients are analyzed together.
+    assert metrics["mean_batch_size"] > 1
+    assert metrics["pending_windows"] == 0
+
+
+def test_server_http():
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+    analyzer = Analyzer()
+    expected = Recording(
+        analyzer,
+        input_path,
+        lat=35.4244,
+        lon=-120.7463,
+        date=datetime(year=2022, month=5, day=10),
+        min_conf=0.25,
+        overlap=1.5,
+    )
+    expected.analyze()
+    with open(input_path, "rb") as f:
+        data = f.read()
+
+    async def run():
+        server = AnalysisServer(Analyzer(), port=0)
+        await server.start()
+        try:
+            return await send_http(
+                server.port,
+                data,
+                "lat=35.4244&lon=-120.7463&date=2022-05-10&min_conf=0.25&overlap=1.5",
+            )
+        finally:
+            await server.stop()
+
+    status, body = asyncio.run(run())
+    assert status == 200
+    assert_same_detections(body["detections"], expected.detections)
+    assert body["metrics"]["windows_analyzed"] == len(expected.chunks)
+
+
+def test_server_admission_and_quota():
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+    with open(input_path, "rb") as f:
+        data = f.read()
+
+    async def run():
+        server = AnalysisServer(
+            Analyzer(), port=0, max_clients=1, client_quota=1.0, client_quota_burst=10
+        )
+        await server.start()
+        try:
+            # The soundscape is longer than the burst, so the quota is exceeded.
+            quota_results = await send_tcp(server.port, data)
+
+            # A second client is refused while the first is connected.
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            writer.write(data[:48000])
+            await writer.drain()
+            await asyncio.sleep(0.2)
+            busy_results = await send_tcp(server.port, data)
+            writer.close()
+            return quota_results, busy_results, server.return_metrics()
+        finally:
+            await server.stop()
+
+    quota_results, busy_results, metrics = asyncio.run(run())
+    assert "quota" in quota_results[-1]["error"]
+    assert busy_results == [{"error": "Server busy."}]
+    assert metrics["clients_refused"] == 1
@@ -1,5 +1,16 @@
-from birdnetlib.species import SpeciesList
+from birdnetlib import Recording
+from birdnetlib.analyzer import (
+    LOCATION_FILTER_THRESHOLD,
+    Analyzer,
+    AnalyzerConfigurationError,
+)
+from birdnetlib.batch import load_analyzers_from_args, return_analyzer_args
+from birdnetlib.species import SpeciesGrid, SpeciesList
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import tempfile
+import os
+import pytest
 
 
 def test_species_list_for_analyzers():
@@ -51,3 +62,133 @@ def test_species_list():
     print(species_list[0])
     assert species_list[0]["scientific_name"] == "Cathartes aura"
     assert species_list[0]["common_name"] == "Turkey Vulture"
+
+
+def test_species_lists_batch():
+    coords = [(35.4244, -120.7463), (42.4534, -76.4735), (-33.8688, 151.2093)]
+    weeks = [18, -1, 30]
+    filter_threshold = 0.03
+
+    species = SpeciesList()
+    mask = species.return_lists_batch(coords, weeks, threshold=filter_threshold)
+    assert mask.shape == (3, len(species.labels))
+    assert mask[0].sum() == 195
+
+    indices = species.return_lists_batch(
+        coords, weeks, threshold=filter_threshold, return_indices=True
+    )
+    for (lat, lon), week_48, row_mask, row_indices in zip(
+        coords, weeks, mask, indices
+    ):
+        species_list = species.return_list_for_analyzer(
+            lon=lon, lat=lat, week_48=week_48, threshold=filter_threshold
+        )
+        assert [species.labels[i] for i in row_indices] == species_list
+        assert set(row_indices) == set(row_mask.nonzero()[0])
+
+    # Queries larger than the maximum batch size are split.
+    species.max_batch_size = 2
+    assert (species.return_lists_batch(coords, weeks, filter_threshold) == mask).all()
+
+
+def test_species_list_threads():
+    # Lists for different locations, requested from several threads at once.
+    queries = [(-120.7463, 35.4244, 18), (-76.4735, 42.4534, 30)]
+    filter_threshold = 0.03
+
+    species = SpeciesList()
+    expected = [
+        species.return_list_for_analyzer(
+            lon=lon, lat=lat, week_48=week_48, threshold=filter_threshold
+        )
+        for lon, lat, week_48 in queries
+    ]
+    assert expected[0] != expected[1]
+
+    def worker(query):
+        lon, lat, week_48 = query
+        return species.return_list_for_analyzer(
+            lon=lon, lat=lat, week_48=week_48, threshold=filter_threshold
+        )
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(worker, queries * 20))
+
+    for i, species_list in enumerate(results):
+        assert species_list == expected[i % 2]
+
+
+def test_species_grid():
+    lon = -120.7463
+    lat = 35.4244
+    week_48 = 18
+    filter_threshold = 0.03
+
+    species = SpeciesList()
+    with tempfile.TemporaryDirectory() as grid_dir:
+        grid_path = os.path.join(grid_dir, "species.grid")
+        grid = SpeciesGrid.create(
+            grid_path,
+            lat_range=(34, 36),
+            lon_range=(-122, -120),
+            step=0.5,
+            dtype="float16",
+            species=species,
+        )
+        assert grid.scores.shape == (49, 5, 5, len(species.labels))
+
+        # Grid points match the model.
+        for week in [week_48, -1]:
+            expected = species.return_list_for_analyzer(
+                lon=-120.5, lat=35.5, week_48=week, threshold=filter_threshold
+            )
+            species_list = grid.return_list_for_analyzer(
+                lon=-120.5, lat=35.5, week_48=week, threshold=filter_threshold
+            )
+            # float16 scores can reorder near-ties.
+            assert set(species_list) == set(expected)
+
+        # Between grid points, interpolated scores are close to the model.
+        expected = species.return_list(
+            lon=lon, lat=lat, week_48=week_48, threshold=filter_threshold
+        )
+        grid = SpeciesGrid(grid_path, mode="interpolate")
+        species_list = grid.return_list(
+            lon=lon, lat=lat, week_48=week_48, threshold=filter_threshold
+        )
+        assert abs(len(species_list) - len(expected)) <= 3
+        assert species_list[0]["scientific_name"] == "Cathartes aura"
+
+        with pytest.raises(ValueError):
+            grid.return_scores(lat=40, lon=lon)
+
+        # Analyzers use the grid instead of the species list model.
+        input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+        analyzer = Analyzer(species_grid_path=grid_path)
+        recording = Recording(
+            analyzer, input_path, lat=35.5, lon=-120.5, week_48=week_48
+        )
+        recording.analyze()
+        assert len(analyzer.custom_species_list) == len(
+            species.return_list_for_analyzer(
+                lon=-120.5, lat=35.5, week_48=week_48, threshold=filter_threshold
+            )
+        )
+
+        # Or interpolate between grid points, also in copies of the analyzer.
+        analyzer = Analyzer(species_grid_path=grid_path, species_grid_mode="interpolate")
+        copies = load_analyzers_from_args(return_analyzer_args([analyzer]))
+        assert copies[0].species_grid_mode == "interpolate"
+        for a in [analyzer, copies[0]]:
+            recording = Recording(a, input_path, lat=lat, lon=lon, week_48=week_48)
+            recording.analyze()
+            assert a.species_class.mode == "interpolate"
+            assert a.custom_species_list == grid.return_list_for_analyzer(
+                lon=lon,
+                lat=lat,
+                week_48=week_48,
+                threshold=LOCATION_FILTER_THRESHOLD,
+            )
+
+        with pytest.raises(AnalyzerConfigurationError):
+            Analyzer(species_grid_path=grid_path, species_grid_mode="nearest")
@@ -0,0 +1,64 @@
+from birdnetlib import Recording
+from birdnetlib.analyzer import Analyzer
+from birdnetlib.spectrogram import SpectrogramEngine
+from matplotlib import mlab
+from PIL import Image
+import numpy as np
+import os
+import tempfile
+
+
+def test_spectrogram_engine():
+    rng = np.random.default_rng(42)
+    segments = [rng.standard_normal(48000 * 3).astype("float32") for _ in range(3)]
+    segments.append(rng.standard_normal(48000 * 7).astype("float32"))
+
+    # Batched spectra match matplotlib's specgram.
+    engine = SpectrogramEngine(top=14000)
+    for segment, db in zip(segments[:3], engine.compute(segments[:3])):
+        spec, freqs, times = mlab.specgram(segment, NFFT=256, Fs=48000, noverlap=128)
+        assert freqs[engine.bins - 1] <= 14000 < freqs[engine.bins]
+        np.testing.assert_allclose(db, 10 * np.log10(spec[: engine.bins]), atol=1e-2)
+        np.testing.assert_allclose(engine.return_times(len(segment)), times)
+
+    with tempfile.TemporaryDirectory() as export_dir:
+        paths = [f"{export_dir}/{i}.png" for i in range(len(segments))]
+        SpectrogramEngine(height=200, workers=2).write(segments, paths)
+        image = Image.open(paths[0])
+        assert image.size == (1124, 200)
+        assert Image.open(paths[3]).size == (2624, 200)
+
+        # Same images without threads.
+        SpectrogramEngine(height=200).write(segments[:1], [f"{export_dir}/single.png"])
+        assert np.array_equal(
+            np.asarray(Image.open(f"{export_dir}/single.png").convert("RGB")),
+            np.asarray(image.convert("RGB")),
+        )
+
+        # Figures with axes and a title.
+        SpectrogramEngine(renderer="figure", dpi=100).write(
+            segments[:1], [f"{export_dir}/figure.jpg"], titles=["title"]
+        )
+        assert Image.open(f"{export_dir}/figure.jpg").size == (640, 480)
+
+
+def test_extract_spectrogram_paths():
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+    analyzer = Analyzer()
+    recording = Recording(analyzer, input_path, min_conf=0.4)
+    recording.analyze()
+
+    with tempfile.TemporaryDirectory() as export_dir:
+        recording.extract_detections_as_spectrogram(
+            directory=export_dir, format="png", renderer="image", workers=2
+        )
+        detections = recording.detections
+        assert len(detections) > 0
+        for detection in detections:
+            path = detection["extracted_spectrogram_path"]
+            start, end = int(detection["start_time"]), int(detection["end_time"])
+            assert path.endswith(f"soundscape_{start}s-{end}s.png")
+            assert Image.open(path).size == (1124, 256)
+        assert sorted(os.listdir(export_dir)) == sorted(
+            {os.path.basename(d["extracted_spectrogram_path"]) for d in detections}
+        )
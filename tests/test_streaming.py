@@ -0,0 +1,103 @@
+from birdnetlib import Recording, RecordingBuffer, RecordingStream
+from birdnetlib.analyzer import Analyzer
+from birdnetlib.streaming import StreamingAnalyzer
+import numpy as np
+import soundfile as sf
+from scipy.signal import resample_poly
+import os
+import pytest
+
+
+@pytest.mark.parametrize("overlap", [0.0, 1.5])
+def test_streaming_analyzer(overlap):
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+    analyzer = Analyzer()
+    expected = Recording(analyzer, input_path, overlap=overlap)
+    expected.analyze()
+
+    # Write blocks of random sizes while the windows are analyzed on another thread.
+    recording = RecordingStream(analyzer, overlap=overlap, buffer_secs=10)
+    streaming_analyzer = StreamingAnalyzer(recording)
+    detections = []
+    streaming_analyzer.on_analyze_complete = lambda recording: detections.extend(
+        recording.detections
+    )
+    streaming_analyzer.start()
+
+    data, rate = sf.read(input_path, dtype="float32")
+    rng = np.random.default_rng(42)
+    position = 0
+    while position < len(data):
+        size = int(rng.integers(1, 48000))
+        recording.write(data[position : position + size])
+        position += size
+    streaming_analyzer.stop()
+
+    def key(detection):
+        return (detection["start_time"], detection["label"])
+
+    assert sorted(detections, key=key) == sorted(expected.detections, key=key)
+    metrics = recording.return_metrics()
+    assert metrics["windows_analyzed"] == len(expected.chunks)
+    assert metrics["windows_dropped"] == 0
+    assert metrics["max_latency"] >= metrics["mean_latency"] > 0
+
+
+def test_stream_backpressure():
+    analyzer = Analyzer()
+    data = np.zeros(48000 * 20, dtype="float32")
+
+    # Without analysis, a full buffer blocks the writer.
+    recording = RecordingStream(analyzer, buffer_secs=9)
+    with pytest.raises(TimeoutError):
+        recording.write(data, timeout=0.1)
+
+    # Or drops the oldest windows.
+    recording = RecordingStream(analyzer, buffer_secs=9, overflow="drop")
+    recording.write(data)
+    assert recording.return_metrics()["windows_dropped"] == 4
+    assert recording.return_metrics()["buffered_secs"] == 8
+    recording.analyze()
+    assert recording.first_window == 4
+    assert recording.return_metrics()["windows_analyzed"] == 2
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_streaming_analyzer_error():
+    # When analysis fails, writers waiting for buffer space are released.
+    analyzer = Analyzer()
+    recording = RecordingStream(analyzer, buffer_secs=9)
+
+    def analyze():
+        raise RuntimeError("Analysis failed.")
+
+    recording.analyze = analyze
+    streaming_analyzer = StreamingAnalyzer(recording)
+    streaming_analyzer.start()
+    with pytest.raises(ValueError):
+        recording.write(np.zeros(48000 * 20, dtype="float32"), timeout=10)
+    streaming_analyzer.thread.join(timeout=10)
+    assert not streaming_analyzer.thread.is_alive()
+    assert recording.closed
+
+
+def test_stream_resampling():
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+    analyzer = Analyzer()
+    data, rate = sf.read(input_path, dtype="int16")
+    data = (resample_poly(data / 32768, 147, 160) * 32767).astype("int16")
+    expected = RecordingBuffer(analyzer, data, 44100, overlap=1.0)
+    expected.analyze()
+
+    # 44.1 kHz int16 blocks are converted and resampled as they are written.
+    recording = RecordingStream(analyzer, rate=44100, overlap=1.0, buffer_secs=200)
+    rng = np.random.default_rng(42)
+    position = 0
+    while position < len(data):
+        size = int(rng.integers(1, 44100))
+        recording.write(data[position : position + size])
+        position += size
+    recording.close()
+    assert recording.samples_written == len(expected.ndarray)
+    recording.analyze()
+    assert recording.detections == expected.detections
@@ -1,9 +1,17 @@
+from birdnetlib import Recording
 from birdnetlib.watcher import DirectoryWatcher
+from birdnetlib.analyzer import Analyzer
 from birdnetlib.analyzer_lite import LiteAnalyzer
+from birdnetlib.batch import load_analyzers_from_args, return_analyzer_args
+from birdnetlib.cache import SQLiteResultCache
 import os
 from collections import namedtuple
 from mock import patch, Mock
 from datetime import datetime
+import numpy as np
+import soundfile as sf
+import tempfile
+import pytest
 
 
 def on_analyze_complete(recording):
@@ -109,3 +117,145 @@ def test_default_analyzer():
     directory = "."
     watcher = DirectoryWatcher(directory)
     assert type(watcher.analyzers[0]).__name__ == "Analyzer"
+
+
+def test_polling_stable_files():
+    with tempfile.TemporaryDirectory() as directory:
+        existing_path = os.path.join(directory, "existing.mp3")
+        with open(existing_path, "wb") as f:
+            f.write(b"\0" * 100)
+
+        watcher = DirectoryWatcher(directory, analyzers=[Mock()], stable_polls=2)
+        watcher.seen_files = set(watcher.return_file_stats())
+
+        # A file that is still being written is not returned until it stops changing.
+        mp3_path = os.path.join(directory, "recording.mp3")
+        with open(mp3_path, "wb") as f:
+            f.write(b"\0" * 100)
+        assert watcher.return_stable_files() == []
+        with open(mp3_path, "ab") as f:
+            f.write(b"\0" * 100)
+        assert watcher.return_stable_files() == []
+        assert watcher.return_stable_files() == []
+        assert watcher.return_stable_files() == [mp3_path]
+        assert watcher.return_stable_files() == []
+
+        # Complete WAV files are returned right away, all from the same scan.
+        wav_paths = [os.path.join(directory, f"{i}.wav") for i in range(3)]
+        for path in wav_paths:
+            sf.write(path, np.zeros(4800, dtype="float32"), 48000)
+        assert watcher.return_stable_files() == wav_paths
+
+        # WAV files with a streaming header wait for the size to settle.
+        streaming_path = os.path.join(directory, "streaming.wav")
+        with open(wav_paths[0], "rb") as f:
+            data = bytearray(f.read())
+        data[4:8] = b"\xff\xff\xff\xff"
+        with open(streaming_path, "wb") as f:
+            f.write(data)
+        assert watcher.return_stable_files() == []
+        assert watcher.return_stable_files() == []
+        assert watcher.return_stable_files() == [streaming_path]
+
+        # Removed files are forgotten.
+        os.remove(existing_path)
+        watcher.return_stable_files()
+        assert existing_path not in watcher.seen_files
+
+
+def run_watcher_workers(use_processes, cache=None, analyzer=None):
+    analyzer = analyzer or Analyzer()
+    input_path = os.path.join(os.path.dirname(__file__), "test_files/soundscape.wav")
+    watcher = DirectoryWatcher(
+        ".", analyzers=[analyzer], workers=2, use_processes=use_processes, cache=cache
+    )
+    watcher.on_analyze_complete = Mock()
+    watcher.on_analyze_file_complete = Mock()
+    watcher.on_error = Mock()
+    watcher.start_workers()
+
+    Event = namedtuple("Event", "src_path")
+    for i in range(3):
+        watcher._on_closed(Event(input_path))
+    watcher.stop_workers()
+
+    assert watcher.on_error.call_count == 0
+    assert watcher.on_analyze_complete.call_count == 3
+    assert watcher.on_analyze_file_complete.call_count == 3
+    expected = Recording(analyzer, input_path, min_conf=0.1)
+    expected.analyze()
+    for call in watcher.on_analyze_complete.call_args_list:
+        assert call.args[0].detections == expected.detections
+
+    metrics = watcher.return_metrics()
+    assert metrics["files_queued"] == 3
+    assert metrics["files_processed"] == 3
+    assert metrics["files_dropped"] == 0
+    assert metrics["queue_depth"] == 0
+    assert metrics["max_latency"] >= metrics["mean_latency"] > 0
+
+
+def test_watcher_workers():
+    run_watcher_workers(use_processes=False)
+
+
+@pytest.mark.omit_during_ghactions
+def test_watcher_worker_processes():
+    run_watcher_workers(use_processes=True)
+
+
+def test_watcher_workers_sqlite_cache():
+    # Worker threads share the cache; each opens its own SQLite connection.
+    with tempfile.TemporaryDirectory() as directory:
+        cache = SQLiteResultCache(os.path.join(directory, "results.sqlite"))
+        run_watcher_workers(use_processes=False, cache=cache)
+        assert cache.misses >= 1
+
+
+def test_watcher_workers_custom_species_list():
+    # Analyzers loaded for the other worker threads keep an in-memory species list.
+    species_list = [
+        "Haemorhous mexicanus_House Finch",
+        "Junco hyemalis_Dark-eyed Junco",
+        "Poecile atricapillus_Black-capped Chickadee",
+    ]
+    analyzer = Analyzer(custom_species_list=species_list)
+    copies = load_analyzers_from_args(return_analyzer_args([analyzer]))
+    assert copies[0].custom_species_list == species_list
+    run_watcher_workers(use_processes=False, analyzer=analyzer)
+
+
+def test_watcher_workers_analyzer_version():
+    # Analyzers loaded for the other worker threads use the same model and options.
+    analyzer = Analyzer(version="2.3", delegates=[], batch_size=4)
+    copies = load_analyzers_from_args(return_analyzer_args([analyzer]))
+    assert copies[0].version == "2.3"
+    assert copies[0].model_path == analyzer.model_path
+    assert copies[0].labels == analyzer.labels
+    assert copies[0].return_init_args() == analyzer.return_init_args()
+    run_watcher_workers(use_processes=False, analyzer=analyzer)
+
+
+@pytest.mark.parametrize(
+    "drop_policy,expected_queue", [("drop_newest", [0, 1]), ("drop_oldest", [1, 2])]
+)
+def test_watcher_drop_policies(drop_policy, expected_queue):
+    watcher = DirectoryWatcher(
+        ".", analyzers=[Mock()], workers=1, queue_size=2, drop_policy=drop_policy
+    )
+    watcher.on_file_dropped = Mock()
+
+    # Workers are not started, so the queue fills up.
+    paths = [f"{i}.wav" for i in range(3)]
+    for path in paths:
+        watcher.queue_file(path)
+
+    assert [watcher.file_queue.get()[0] for _ in range(2)] == [
+        paths[i] for i in expected_queue
+    ]
+    assert watcher.on_file_dropped.call_count == 1
+    assert watcher.return_metrics()["files_dropped"] == 1
+    assert watcher.return_metrics()["max_queue_depth"] == 2
+
+    with pytest.raises(ValueError):
+        DirectoryWatcher(".", analyzers=[Mock()], drop_policy="drop_all")